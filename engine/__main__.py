@@ -1,32 +1,99 @@
 import argparse
 import sys
 
-from importlib.machinery import SourceFileLoader
-
 from engine import *
 from experiment import *
+from estimate import load_latencies
+from experiment import load_experiment
+from instrument.lib.metrics import format_stats
+from profiling import Profiler
 
 # Argument Parsing
 parser = argparse.ArgumentParser()
-parser.add_argument('experiment', type=str, help='Path to an experiment file.')
+parser.add_argument('experiment', type=str, nargs='?', help='Path to an experiment file.')
 parser.add_argument('-p', '--parameter', metavar='NAME=VAL', type=str, action='append', help='Experiment parameter')
+parser.add_argument('-o', '--output', metavar='RUN_DIR', type=str, help='Directory to save run data to.')
+parser.add_argument('--live', action='store_true', help='Plot data live while it is acquired.')
+parser.add_argument('--queue-size', type=int, default=4096, help='Maximum number of points queued to be saved.')
+parser.add_argument('--backpressure', choices=['block', 'drop_oldest', 'spill'], default='block', help='What to do when the save queue is full.')
+parser.add_argument('--checkpoint-interval', metavar='SECONDS', type=float, default=10.0, help='Time between checkpoints of a saved run.')
+parser.add_argument('--no-checkpoints', action='store_true', help="Don't checkpoint a saved run, e.g. to drop points with --backpressure drop_oldest.")
+parser.add_argument('--simulate', action='store_true', help='Run on simulated instruments instead of hardware.')
+parser.add_argument('--simulate-latency', metavar='SECONDS', type=float, default=0.0, help='Latency of each command sent to a simulated instrument.')
+parser.add_argument('--dry-run', action='store_true', help='Estimate how long the experiment takes, without any hardware.')
+parser.add_argument('--latency-table', metavar='FILE', type=str, help='Latencies of each command type, as JSON or a recorded transcript, to estimate dry runs with.')
+parser.add_argument('--record', metavar='FILE', type=str, help='Record a transcript of the commands sent to VISA instruments.')
+parser.add_argument('--replay', metavar='FILE', type=str, help='Replay a recorded transcript instead of connecting to VISA instruments.')
+parser.add_argument('--replay-realtime', action='store_true', help='Replay commands at their recorded speed.')
+parser.add_argument('--trace', metavar='FILE', type=str, help='Save a Chrome trace of the run, viewable in chrome://tracing.')
+parser.add_argument('--profile', action='store_true', help='Profile each phase of the run, and print a report of the top functions and allocations.')
+parser.add_argument('--profile-every', metavar='N', type=int, default=1, help='Only profile every Nth sweep point of the run phase.')
+parser.add_argument('--resume', metavar='RUN_DIR', type=str, help='Resume an interrupted run from its last checkpoint.')
 args = parser.parse_args()
+if (args.experiment is None) == (args.resume is None):
+    parser.error('either an experiment or --resume must be given')
+if args.simulate and args.replay:
+    parser.error('--simulate and --replay cannot be combined')
+if args.profile_every < 1:
+    parser.error('--profile-every must be at least 1')
 
 print(args.parameter)
 
-# Load Experiment
-# We use SourceFileLoader to load an experiment from an arbitrary filepath.
-experiment_module = SourceFileLoader('experiment_src', args.experiment).load_module()
-experiment_cls = experiment_module.__experiment__
+engine = Engine(
+    run_dir=args.output,
+    live_view=args.live,
+    queue_size=args.queue_size,
+    backpressure=args.backpressure,
+    checkpoint_interval=None if args.no_checkpoints else args.checkpoint_interval,
+    simulate=args.simulate,
+    simulate_latency=args.simulate_latency,
+    trace_path=args.trace,
+    record_path=args.record,
+    replay_path=args.replay,
+    replay_realtime=args.replay_realtime,
+    dry_run=args.dry_run,
+    latencies=load_latencies(args.latency_table) if args.latency_table else None,
+    profiler=Profiler(args.profile_every) if args.profile else None,
+)
+
+if args.resume:
+    # Resume experiment
+    engine.resume(args.resume)
+else:
+    # Load Experiment
+    with engine.profile_phase('load'):
+        experiment_cls = load_experiment(args.experiment)
+
+    parameters = {}
+    if args.parameter:
+        for param in args.parameter:
+            name, val = param.split('=')
+            parameters[name] = val
+
+    # Run experiment
+    engine.run_experiment(experiment_cls, **parameters)
+
+if engine.writer is not None:
+    print('Saved {written} points (max queue depth: {max_depth}, '
+          'max lag: {max_lag:.3f}s, dropped: {dropped}, spilled: {spilled})'.format(
+                  **engine.writer.stats()))
 
-parameters = {}
-if args.parameter:
-    for param in args.parameter:
-        name, val = param.split('=')
-        parameters[name] = val
+if engine.clock is not None:
+    print('Sweep clock: {ticks} points at {period}s (mean lateness: '
+          '{mean_lateness:.3f}s, max lateness: {max_lateness:.3f}s, '
+          'missed: {missed})'.format(**engine.clock.stats()))
 
+if engine.logger.path is not None:
+    print('Logged {0} events to {1} (dropped: {2})'.format(
+            engine.logger.num_logged, engine.logger.path,
+            engine.logger.num_dropped))
 
-# Run experiment
-engine = Engine()
-engine.run_experiment(experiment_cls, **parameters)
+if engine.estimate is not None:
+    print(engine.estimate.report())
+elif engine.latency_report['commands']:
+    print('Instrument commands ({0:.3f}s run):'.format(
+            engine.latency_report['elapsed']))
+    print(format_stats(engine.latency_report['commands']))
 
+if engine.profiler is not None:
+    print(engine.profiler.report())
@@ -0,0 +1,6 @@
+"""
+Analysis Module
+
+Utilities for analyzing experiment data, both inline at the end of a run and
+in batch over stored runs.
+"""
@@ -0,0 +1,169 @@
+"""
+Lock-In Analysis Module
+
+Vectorized primitives for analyzing lock-in amplifier data. All functions
+operate on whole columns (or 2D arrays of columns, one column per channel) at
+once, so experiments never need to loop over individual points.
+
+Phases are in degrees, matching the SR830.
+
+Importable:
+  - rotate_phase
+  - best_phase
+  - to_polar
+  - average_scans
+  - subtract_baseline
+  - derivative
+  - normalize
+"""
+
+import numpy as np
+
+__all__ = [
+    'rotate_phase',
+    'best_phase',
+    'to_polar',
+    'average_scans',
+    'subtract_baseline',
+    'derivative',
+    'normalize',
+]
+
+def rotate_phase(x, y, phase):
+    """Rotates X and Y outputs by a phase offset. Equivalent to adding `phase`
+    to the lock-in's reference phase while acquiring.
+
+    Parameters:
+      - x (array-like): In-phase (X) output.
+      - y (array-like): Quadrature (Y) output.
+      - phase (float/array-like): Phase offset in degrees.
+
+    Returns:
+      - tuple(np.ndarray, np.ndarray): Rotated X and Y outputs.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    phase = np.deg2rad(phase)
+    cos, sin = np.cos(phase), np.sin(phase)
+    return x * cos + y * sin, y * cos - x * sin
+
+def best_phase(x, y):
+    """Returns the phase offset that moves as much of the signal as possible
+    into X, to be used with `rotate_phase`.
+
+    The phase is the principal axis of the (X, Y) points, so it is not thrown
+    off by signals that change sign over a sweep.
+
+    Parameters:
+      - x (array-like): In-phase (X) output.
+      - y (array-like): Quadrature (Y) output.
+
+    Returns:
+      - float: Phase offset in degrees, within (-90, 90].
+    """
+    z = np.asarray(x, dtype=float) + 1j * np.asarray(y, dtype=float)
+    return np.rad2deg(np.angle(np.sum(z * z)) / 2)
+
+def to_polar(x, y, degrees=True):
+    """Converts X and Y outputs to magnitude (R) and phase (theta).
+
+    Parameters:
+      - x (array-like): In-phase (X) output.
+      - y (array-like): Quadrature (Y) output.
+      - degrees (bool): Whether theta should be in degrees or radians.
+
+    Returns:
+      - tuple(np.ndarray, np.ndarray): R and theta.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    theta = np.arctan2(y, x)
+    if degrees:
+        theta = np.rad2deg(theta)
+    return np.hypot(x, y), theta
+
+def average_scans(data, num_scans):
+    """Averages repeated scans over the same sweep points.
+
+    The data is expected to be ordered scan by scan, i.e. all the points of the
+    first scan, followed by all the points of the second scan, etc.
+
+    Parameters:
+      - data (array-like): A column, or a (points, columns) array, containing
+        `num_scans` consecutive scans.
+      - num_scans (int): Number of scans.
+
+    Returns:
+      - np.ndarray: The average scan, with `1 / num_scans` as many points.
+    """
+    data = np.asarray(data, dtype=float)
+    if data.shape[0] % num_scans != 0:
+        raise ValueError('{0} points cannot be split into {1} scans.'.format(
+                data.shape[0], num_scans))
+    return data.reshape((num_scans, -1) + data.shape[1:]).mean(axis=0)
+
+def subtract_baseline(x, y, degree=1, edges=0.1, mask=None):
+    """Fits a polynomial baseline and subtracts it.
+
+    By default the baseline is only fit to the points at either edge of the
+    sweep, which are assumed to be off resonance.
+
+    Parameters:
+      - x (array-like): Sweep input, e.g. frequencies.
+      - y (array-like): A column, or a (points, columns) array.
+      - degree (int): Degree of the baseline polynomial.
+      - edges (float): Fraction of points at each edge of the sweep to fit the
+        baseline to. Ignored if `mask` is given.
+      - mask (array-like[bool]): Points to fit the baseline to.
+
+    Returns:
+      - np.ndarray: `y` with the baseline subtracted.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if mask is None:
+        num_edge = max(int(len(x) * edges), degree + 1)
+        mask = np.zeros(len(x), dtype=bool)
+        mask[:num_edge] = True
+        mask[-num_edge:] = True
+    mask = np.asarray(mask, dtype=bool)
+    coeffs = np.polyfit(x[mask], y[mask], degree)
+    # Evaluate the polynomial(s) on every point: (points, degree + 1) @ coeffs.
+    return y - np.vander(x, degree + 1).dot(coeffs)
+
+def derivative(x, y):
+    """Returns the derivative dy/dx, using second order central differences.
+    Handles non-uniformly spaced inputs.
+
+    Parameters:
+      - x (array-like): Sweep input, e.g. frequencies.
+      - y (array-like): A column, or a (points, columns) array.
+
+    Returns:
+      - np.ndarray: Derivative of `y`, with the same shape.
+    """
+    return np.gradient(np.asarray(y, dtype=float), np.asarray(x, dtype=float),
+            axis=0)
+
+def normalize(y, method='max'):
+    """Normalizes a column, or each column of a (points, columns) array.
+
+    Parameters:
+      - y (array-like): A column, or a (points, columns) array.
+      - method (str): One of:
+          - 'max': Divide by the maximum absolute value.
+          - 'range': Scale to the range [0, 1].
+          - 'zscore': Subtract the mean and divide by the standard deviation.
+
+    Returns:
+      - np.ndarray: Normalized `y`.
+    """
+    y = np.asarray(y, dtype=float)
+    if method == 'max':
+        return y / np.abs(y).max(axis=0)
+    if method == 'range':
+        lower = y.min(axis=0)
+        return (y - lower) / (y.max(axis=0) - lower)
+    if method == 'zscore':
+        return (y - y.mean(axis=0)) / y.std(axis=0)
+    raise ValueError("Invalid normalization method: '{0}'".format(method))
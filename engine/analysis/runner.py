@@ -0,0 +1,137 @@
+"""
+Analysis Runner Module
+
+Runs an analysis over a set of stored runs, distributing the runs across a pool
+of worker processes.
+
+Runs are not sent to workers. Each worker is only given the path to a run
+directory, and memory-maps the run's data itself, so large runs are never
+pickled or copied between processes.
+
+Importable:
+  - AnalysisResult
+  - run_analysis
+"""
+
+import hashlib
+import os
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib.machinery import SourceFileLoader
+
+from storage import load_run
+
+__all__ = ['AnalysisResult', 'run_analysis']
+
+class AnalysisResult(object):
+    """The result of analyzing a single run.
+
+    Instance Attributes:
+      - run (str): Path to the run directory.
+      - value (object): Value returned by the analysis. None if it failed.
+      - error (str): Formatted traceback if the analysis failed, else None.
+    """
+
+    def __init__(self, run, value=None, error=None):
+        self.run = run
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __str__(self):
+        if self.ok:
+            return 'AnalysisResult({0}: ok)'.format(self.run)
+        return 'AnalysisResult({0}: failed)'.format(self.run)
+
+def run_analysis(analysis, runs, max_workers=None, progress=None):
+    """Runs an analysis over a set of stored runs in a process pool.
+
+    The analysis is called once per run with the run's (memory-mapped) data
+    array, the same way `Engine.run_experiment` calls `Experiment.analyze`.
+    Failures are reported per run instead of aborting the batch.
+
+    Parameters:
+      - analysis (str/callable): One of:
+          - A path to an experiment file, in which case the `analyze` method
+            of its `__experiment__` class is used.
+          - A 'path:function' string, naming a function in a Python file.
+          - A module-level function. It must be picklable, so it cannot be
+            defined in an experiment file; use the string forms for those.
+      - runs (list[str]): Paths to run directories.
+      - max_workers (int): Number of worker processes. Defaults to the number
+        of CPUs.
+      - progress (callable): Called as `progress(num_done, num_runs, result)`
+        in the calling process each time a run finishes.
+
+    Returns:
+      - list[AnalysisResult]: Results, in the same order as `runs`.
+    """
+    runs = list(runs)
+    results = [None] * len(runs)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_analyze_run, analysis, run): i
+            for i, run in enumerate(runs)
+        }
+        for num_done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                ok, value = future.result()
+            except Exception:
+                # Raised if the worker died, or the result couldn't be pickled.
+                ok, value = False, traceback.format_exc()
+            if ok:
+                result = AnalysisResult(runs[i], value=value)
+            else:
+                result = AnalysisResult(runs[i], error=value)
+            results[i] = result
+            if progress is not None:
+                progress(num_done, len(runs), result)
+    return results
+
+
+#############
+## Private ##
+#############
+
+# Analyses resolved by this worker process, keyed by their string spec, so
+# that experiment files are only loaded once per worker.
+_analyses = {}
+
+def _analyze_run(analysis, run):
+    """Analyzes a single run. Runs in a worker process.
+
+    Returns:
+      - tuple(bool, object): `(True, value)` on success, or `(False,
+        traceback)` if the analysis raised.
+    """
+    try:
+        fn = _resolve_analysis(analysis)
+        return True, fn(load_run(run).data)
+    except Exception:
+        return False, traceback.format_exc()
+
+def _resolve_analysis(analysis):
+    if callable(analysis):
+        return analysis
+    if analysis not in _analyses:
+        path, _, name = analysis.rpartition(':')
+        if not path.endswith('.py'):
+            path, name = analysis, ''
+        module = SourceFileLoader(_module_name(path), path).load_module()
+        if name:
+            _analyses[analysis] = getattr(module, name)
+        else:
+            _analyses[analysis] = module.__experiment__.analyze
+    return _analyses[analysis]
+
+def _module_name(path):
+    """Returns a module name unique to a file, so that loading several
+    analysis files doesn't replace each other's modules in `sys.modules`.
+    """
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return 'analysis_src_{0}'.format(digest[:16])
@@ -0,0 +1,97 @@
+"""
+Statistics Module
+
+Online statistics for averaging repeated scans, without keeping every scan in
+memory.
+
+Importable:
+  - RunningStats
+"""
+
+import numpy as np
+
+__all__ = ['RunningStats']
+
+class RunningStats(object):
+    """Running mean and variance of each point of a repeated scan.
+
+    Uses Welford's algorithm, which stays numerically stable over many updates,
+    unlike accumulating sums and sums of squares. Memory use only depends on
+    the number of points per scan, not on the number of scans.
+
+    Parameters:
+      - num_points (int): Number of points per scan.
+      - num_columns (int): Number of values per point.
+
+    Instance Attributes:
+      - count (np.ndarray): Number of samples of each point, shape (points,).
+      - mean (np.ndarray): Mean of each point, shape (points, columns).
+    """
+
+    def __init__(self, num_points, num_columns):
+        self.count = np.zeros(num_points, dtype=np.int64)
+        self.mean = np.zeros((num_points, num_columns))
+        # Sum of squared differences from the mean.
+        self._m2 = np.zeros((num_points, num_columns))
+
+    @property
+    def num_points(self):
+        return len(self.count)
+
+    def update(self, index, values):
+        """Adds a sample of a single point.
+
+        Parameters:
+          - index (int): Index of the point in the scan.
+          - values (array-like): Values of the point.
+        """
+        values = np.asarray(values, dtype=float)
+        self.count[index] += 1
+        delta = values - self.mean[index]
+        self.mean[index] += delta / self.count[index]
+        self._m2[index] += delta * (values - self.mean[index])
+
+    def update_scan(self, values):
+        """Adds a sample of every point at once, i.e. a whole scan.
+
+        Parameters:
+          - values (array-like): A (points, columns) array.
+        """
+        values = np.asarray(values, dtype=float)
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count[:, np.newaxis]
+        self._m2 += delta * (values - self.mean)
+
+    def merge(self, other):
+        """Merges the samples of another `RunningStats` over the same points,
+        e.g. from a separate run (Chan et al.'s parallel algorithm).
+
+        Parameters:
+          - other (RunningStats): Statistics to merge.
+        """
+        count = self.count + other.count
+        safe_count = np.maximum(count, 1)[:, np.newaxis]
+        delta = other.mean - self.mean
+        self.mean += delta * (other.count[:, np.newaxis] / safe_count)
+        self._m2 += other._m2 + delta ** 2 * (
+                self.count * other.count)[:, np.newaxis] / safe_count
+        self.count = count
+
+    def variance(self):
+        """Returns the sample variance of each point. NaN for points with less
+        than 2 samples.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = self._m2 / (self.count - 1)[:, np.newaxis]
+        variance[self.count < 2] = np.nan
+        return variance
+
+    def std(self):
+        """Returns the sample standard deviation of each point."""
+        return np.sqrt(self.variance())
+
+    def std_error(self):
+        """Returns the standard error of the mean of each point."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sqrt(self.variance() / self.count[:, np.newaxis])
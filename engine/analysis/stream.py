@@ -0,0 +1,315 @@
+"""
+Stream Module
+
+Streaming operators, used to filter and reduce data while it is still being
+acquired, instead of after the whole run is held in memory.
+
+Operators process blocks of samples: either a 1D array of samples, or a 2D
+(samples, columns) array of rows as stored by `ExperimentData`. Each operator
+only keeps as much state as its filter length between blocks, so processing a
+stream block by block gives the same output as processing it all at once.
+
+Operators can be chained with a `Pipeline`, which can in turn be attached to
+an experiment's data with `ExperimentData.add_stream`.
+
+Importable:
+  - Operator
+  - Pipeline
+  - MovingAverage
+  - FIRFilter
+  - BoxcarDecimator
+  - OutlierRejector
+"""
+
+import numpy as np
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+__all__ = [
+    'Operator',
+    'Pipeline',
+    'MovingAverage',
+    'FIRFilter',
+    'BoxcarDecimator',
+    'OutlierRejector',
+]
+
+class Operator(object):
+    """Streaming operator interface.
+
+    Operators transform a block of samples into a (possibly shorter or empty)
+    block of output samples, carrying any state needed between blocks.
+    """
+
+    def process(self, block):
+        """Processes a block of samples.
+
+        Parameters:
+          - block (np.ndarray): A 1D array of samples, or a 2D (samples,
+            columns) array.
+
+        Returns:
+          - np.ndarray: Output samples, with the same number of columns.
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """Returns any output held back by the operator at the end of a stream.
+
+        Returns:
+          - np.ndarray: Output samples, or None if there are none.
+        """
+        return None
+
+    def reset(self):
+        """Clears the operator's state, so that it can process a new stream."""
+        pass
+
+class Pipeline(Operator):
+    """A chain of streaming operators.
+
+    The output of the last operator is collected, and can be retrieved with
+    `to_array`.
+
+    Parameters:
+      - *operators (Operator): Operators, in the order they are applied.
+
+    Instance Attributes:
+      - operators (list[Operator]): Operators in the pipeline.
+      - outputs (list[np.ndarray]): Output blocks of the pipeline.
+    """
+
+    def __init__(self, *operators):
+        self.operators = list(operators)
+        self.outputs = []
+
+    def process(self, block):
+        block = _as_block(block)
+        for operator in self.operators:
+            block = operator.process(block)
+        if len(block):
+            self.outputs.append(block)
+        return block
+
+    def flush(self):
+        # Output flushed by an operator still needs to pass through the
+        # operators after it.
+        flushed = []
+        for i, operator in enumerate(self.operators):
+            block = operator.flush()
+            if block is None:
+                continue
+            for next_operator in self.operators[i + 1:]:
+                block = next_operator.process(block)
+            flushed.append(block)
+        flushed = [block for block in flushed if len(block)]
+        if not flushed:
+            return None
+        block = np.concatenate(flushed)
+        self.outputs.append(block)
+        return block
+
+    def reset(self):
+        for operator in self.operators:
+            operator.reset()
+        self.outputs = []
+
+    def to_array(self):
+        """Returns all output of the pipeline so far, as a single array."""
+        if not self.outputs:
+            return np.empty((0,))
+        return np.concatenate(self.outputs)
+
+class FIRFilter(Operator):
+    """Causal finite impulse response filter.
+
+    Computes `y[n] = sum(taps[k] * x[n - k])`, with the stream assumed to be
+    zero before its first sample. Produces one output sample per input sample.
+
+    Parameters:
+      - taps (array-like): Filter coefficients.
+
+    Instance Attributes:
+      - taps (np.ndarray): Filter coefficients.
+    """
+
+    def __init__(self, taps):
+        self.taps = np.asarray(taps, dtype=float)
+        if self.taps.ndim != 1 or len(self.taps) == 0:
+            raise ValueError('FIR filter taps must be a non-empty 1D array.')
+        self.reset()
+
+    def process(self, block):
+        block = _as_block(block)
+        if self._history is None:
+            self._history = np.zeros((len(self.taps) - 1,) + block.shape[1:])
+        samples = np.concatenate([self._history, block])
+        self._history = _tail(samples, len(self.taps) - 1)
+        windows = sliding_window_view(samples, len(self.taps), axis=0)
+        return windows.dot(self.taps[::-1])
+
+    def reset(self):
+        # Last `len(taps) - 1` input samples.
+        self._history = None
+
+class MovingAverage(Operator):
+    """Moving average over a fixed number of samples.
+
+    The first output sample is emitted once `length` samples have been
+    received, so the stream is never averaged with samples from before it
+    started.
+
+    Parameters:
+      - length (int): Number of samples to average.
+
+    Instance Attributes:
+      - length (int): Number of samples to average.
+    """
+
+    def __init__(self, length):
+        if length < 1:
+            raise ValueError('Moving average length must be positive.')
+        self.length = length
+        self.reset()
+
+    def process(self, block):
+        block = _as_block(block)
+        if self._history is not None:
+            block = np.concatenate([self._history, block])
+        self._history = _tail(block, self.length - 1)
+        if len(block) < self.length:
+            return block[:0]
+        sums = np.cumsum(block, axis=0)
+        totals = sums[self.length - 1:].copy()
+        totals[1:] -= sums[:-self.length]
+        return totals / self.length
+
+    def reset(self):
+        # Last `length - 1` input samples.
+        self._history = None
+
+class BoxcarDecimator(Operator):
+    """Boxcar decimator. Averages consecutive, non-overlapping groups of
+    samples, producing one output sample per group.
+
+    Parameters:
+      - factor (int): Number of samples per group.
+
+    Instance Attributes:
+      - factor (int): Number of samples per group.
+    """
+
+    def __init__(self, factor):
+        if factor < 1:
+            raise ValueError('Decimation factor must be positive.')
+        self.factor = factor
+        self.reset()
+
+    def process(self, block):
+        block = _as_block(block)
+        if self._remainder is not None:
+            block = np.concatenate([self._remainder, block])
+        num_samples = len(block) - len(block) % self.factor
+        self._remainder = block[num_samples:]
+        groups = block[:num_samples].reshape(
+                (-1, self.factor) + block.shape[1:])
+        return groups.mean(axis=1)
+
+    def flush(self):
+        """Returns the average of the last, partial group, if any."""
+        if self._remainder is None or not len(self._remainder):
+            return None
+        block = self._remainder.mean(axis=0, keepdims=True)
+        self._remainder = None
+        return block
+
+    def reset(self):
+        # Samples that don't yet fill a group.
+        self._remainder = None
+
+class OutlierRejector(Operator):
+    """Rejects outliers, i.e. samples which deviate from the median of the
+    preceding samples by more than a number of (MAD-estimated) standard
+    deviations.
+
+    The first `window` samples of a stream are passed through unchecked.
+
+    Parameters:
+      - window (int): Number of preceding samples to compare against.
+      - threshold (float): Number of standard deviations a sample must deviate
+        by to be rejected.
+      - mode (str): 'replace' to replace outliers with the median of the
+        preceding samples, or 'drop' to drop rows containing outliers.
+      - columns (list[int]): For 2D blocks, the columns checked for outliers,
+        e.g. to skip the sweep input in column 0. Defaults to all columns.
+
+    Instance Attributes:
+      - window (int)
+      - threshold (float)
+      - mode (str)
+      - columns (list[int])
+      - num_rejected (int): Number of rejected samples so far.
+    """
+
+    def __init__(self, window, threshold=5.0, mode='replace', columns=None):
+        if mode not in ('replace', 'drop'):
+            raise ValueError("Invalid outlier rejection mode: '{0}'".format(mode))
+        self.window = window
+        self.threshold = threshold
+        self.mode = mode
+        self.columns = columns
+        self.reset()
+
+    def process(self, block):
+        block = _as_block(block)
+        num_history = 0 if self._history is None else len(self._history)
+        samples = block if self._history is None else np.concatenate(
+                [self._history, block])
+        self._history = _tail(samples, self.window)
+
+        # Only samples with a full window of preceding samples are checked.
+        num_checked = max(len(samples) - self.window, 0)
+        num_skipped = len(block) - num_checked
+        if num_checked == 0:
+            return block
+
+        windows = sliding_window_view(samples[:-1], self.window, axis=0)
+        windows = windows[len(windows) - num_checked:]
+        median = np.median(windows, axis=-1)
+        deviation = np.abs(block[num_skipped:] - median)
+        # 1.4826 * MAD estimates the standard deviation of normal noise.
+        sigma = 1.4826 * np.median(
+                np.abs(windows - median[..., np.newaxis]), axis=-1)
+        outliers = deviation > self.threshold * sigma
+        if block.ndim == 2 and self.columns is not None:
+            checked = np.zeros(block.shape[1], dtype=bool)
+            checked[self.columns] = True
+            outliers &= checked
+
+        output = block.copy()
+        if self.mode == 'replace':
+            output[num_skipped:][outliers] = median[outliers]
+            self.num_rejected += int(outliers.sum())
+            return output
+        if outliers.ndim == 2:
+            outliers = outliers.any(axis=1)
+        self.num_rejected += int(outliers.sum())
+        keep = np.concatenate([np.ones(num_skipped, dtype=bool), ~outliers])
+        return output[keep]
+
+    def reset(self):
+        # Last `window` input samples.
+        self._history = None
+        self.num_rejected = 0
+
+
+#############
+## Private ##
+#############
+
+def _as_block(block):
+    return np.asarray(block, dtype=float)
+
+def _tail(samples, length):
+    """Returns a copy of the last `length` samples."""
+    return samples[max(len(samples) - length, 0):].copy()
@@ -0,0 +1,53 @@
+from analysis.lockin import *
+import unittest
+
+import numpy as np
+
+class TestLockInAnalysis(unittest.TestCase):
+    def test_polar_and_phase_rotation(self):
+        x, y = np.array([1.0, 0.0, -2.0]), np.array([1.0, 2.0, 0.0])
+        r, theta = to_polar(x, y)
+        np.testing.assert_allclose(r, [np.sqrt(2), 2, 2])
+        np.testing.assert_allclose(theta, [45, 90, 180])
+
+        x_rot, y_rot = rotate_phase(x, y, 45)
+        np.testing.assert_allclose(to_polar(x_rot, y_rot)[0], r)
+        np.testing.assert_allclose(x_rot[0], np.sqrt(2))
+        np.testing.assert_allclose(y_rot[0], 0, atol=1e-12)
+
+    def test_best_phase(self):
+        signal = np.linspace(-1, 1, 11)
+        x, y = rotate_phase(signal, np.zeros_like(signal), -30)
+        phase = best_phase(x, y)
+        self.assertAlmostEqual(phase, 30)
+        x_rot, y_rot = rotate_phase(x, y, phase)
+        np.testing.assert_allclose(x_rot, signal, atol=1e-12)
+        np.testing.assert_allclose(y_rot, 0, atol=1e-12)
+
+    def test_average_scans(self):
+        scans = np.array([[1.0, 2.0, 3.0], [3.0, 4.0, 5.0]])
+        np.testing.assert_allclose(average_scans(scans.ravel(), 2), [2, 3, 4])
+        columns = np.stack([scans.ravel(), -scans.ravel()], axis=1)
+        np.testing.assert_allclose(average_scans(columns, 2),
+                [[2, -2], [3, -3], [4, -4]])
+        with self.assertRaises(ValueError):
+            average_scans(scans.ravel(), 4)
+
+    def test_subtract_baseline(self):
+        x = np.linspace(0, 10, 101)
+        peak = np.exp(-(x - 5) ** 2)
+        y = peak + 0.5 * x + 2
+        np.testing.assert_allclose(subtract_baseline(x, y), peak, atol=1e-6)
+        columns = np.stack([y, 2 * y], axis=1)
+        np.testing.assert_allclose(subtract_baseline(x, columns),
+                np.stack([peak, 2 * peak], axis=1), atol=1e-6)
+
+    def test_derivative_and_normalize(self):
+        x = np.array([0.0, 1.0, 3.0, 6.0])
+        np.testing.assert_allclose(derivative(x, 2 * x), 2)
+        y = np.array([-4.0, 0.0, 2.0])
+        np.testing.assert_allclose(normalize(y), [-1, 0, 0.5])
+        np.testing.assert_allclose(normalize(y, 'range'), [0, 2 / 3, 1])
+        self.assertAlmostEqual(normalize(y, 'zscore').std(), 1)
+        with self.assertRaises(ValueError):
+            normalize(y, 'area')
@@ -0,0 +1,99 @@
+from analysis.runner import run_analysis, _resolve_analysis
+from storage import RunWriter, load_run, save_run, find_runs
+import unittest
+
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+class TestAnalysisRunner(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.runs = []
+        for i in range(4):
+            path = os.path.join(self.root, 'run{0}'.format(i))
+            save_run(path, np.arange(6, dtype=float).reshape(3, 2) * i,
+                    {'experiment': 'TestExperiment'})
+            self.runs.append(path)
+        self.analysis_path = os.path.join(self.root, 'analysis.py')
+        with open(self.analysis_path, 'w') as f:
+            f.write(ANALYSIS_SRC)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_stored_runs(self):
+        self.assertEqual(find_runs(self.root), self.runs)
+        run = load_run(self.runs[2])
+        self.assertIsInstance(run.data, np.memmap)
+        np.testing.assert_array_equal(run.data, [[0, 2], [4, 6], [8, 10]])
+        self.assertEqual(run.metadata['experiment'], 'TestExperiment')
+
+    def test_run_writer_partial_run(self):
+        path = os.path.join(self.root, 'partial')
+        writer = RunWriter(path)
+        writer.append([1, 2, 3])
+        writer.flush()
+        writer.append([4, 5, 6])
+        self.assertEqual(load_run(path).data.shape, (1, 3))
+        writer.close()
+        self.assertEqual(load_run(path).data.shape, (2, 3))
+
+    def test_run_writer_column_mismatch(self):
+        with RunWriter(os.path.join(self.root, 'mismatch')) as writer:
+            writer.append([1, 2, 3])
+            with self.assertRaises(ValueError):
+                writer.append([1, 2])
+
+    def test_experiment_analyze(self):
+        results = run_analysis(self.analysis_path, self.runs, max_workers=2)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual([result.value for result in results], [0, 15, 30, 45])
+
+    def test_named_analysis_and_progress(self):
+        progress = []
+        results = run_analysis(self.analysis_path + ':column_max', self.runs,
+                max_workers=2, progress=lambda *args: progress.append(args))
+        self.assertEqual([result.value for result in results], [0, 5, 10, 15])
+        self.assertEqual(sorted(done for done, total, _ in progress), [1, 2, 3, 4])
+        self.assertTrue(all(total == 4 for _, total, _ in progress))
+
+    def test_failures_are_reported_per_run(self):
+        runs = self.runs + [os.path.join(self.root, 'missing')]
+        results = run_analysis(self.analysis_path, runs, max_workers=2)
+        self.assertTrue(all(result.ok for result in results[:-1]))
+        self.assertFalse(results[-1].ok)
+        self.assertIn('FileNotFoundError', results[-1].error)
+
+    def test_analysis_files_are_loaded_as_separate_modules(self):
+        other_path = os.path.join(self.root, 'other.py')
+        with open(other_path, 'w') as f:
+            f.write('def column_max(data):\n    return -1\n')
+        column_max = _resolve_analysis(self.analysis_path + ':column_max')
+        other = _resolve_analysis(other_path + ':column_max')
+        self.assertNotEqual(column_max.__module__, other.__module__)
+        data = np.arange(6, dtype=float).reshape(3, 2)
+        self.assertEqual(column_max(data), 5)
+        self.assertEqual(other(data), -1)
+        self.assertIs(sys.modules[column_max.__module__].column_max,
+                column_max)
+
+
+###############
+## Utilities ##
+###############
+
+ANALYSIS_SRC = '''
+class TestExperiment(object):
+    @staticmethod
+    def analyze(data):
+        return int(data.sum())
+
+def column_max(data):
+    return int(data[:, 1].max())
+
+__experiment__ = TestExperiment
+'''
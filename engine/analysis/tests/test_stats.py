@@ -0,0 +1,46 @@
+from analysis.stats import RunningStats
+import unittest
+
+import numpy as np
+
+class TestRunningStats(unittest.TestCase):
+    def setUp(self):
+        # 50 scans of 4 points, with 2 values per point, and a large offset
+        # that would lose precision with a naive sum of squares.
+        self.scans = 1e8 + np.random.RandomState(0).normal(size=(50, 4, 2))
+
+    def assertStatsEqual(self, stats, scans):
+        np.testing.assert_array_equal(stats.count, len(scans))
+        np.testing.assert_allclose(stats.mean, scans.mean(axis=0))
+        np.testing.assert_allclose(stats.variance(), scans.var(axis=0, ddof=1),
+                rtol=1e-6)
+        np.testing.assert_allclose(stats.std_error(),
+                scans.std(axis=0, ddof=1) / np.sqrt(len(scans)), rtol=1e-6)
+
+    def test_update(self):
+        stats = RunningStats(4, 2)
+        for scan in self.scans:
+            for i, values in enumerate(scan):
+                stats.update(i, values)
+        self.assertStatsEqual(stats, self.scans)
+
+    def test_update_scan(self):
+        stats = RunningStats(4, 2)
+        for scan in self.scans:
+            stats.update_scan(scan)
+        self.assertStatsEqual(stats, self.scans)
+
+    def test_merge(self):
+        stats, other = RunningStats(4, 2), RunningStats(4, 2)
+        for scan in self.scans[:20]:
+            stats.update_scan(scan)
+        for scan in self.scans[20:]:
+            other.update_scan(scan)
+        stats.merge(other)
+        self.assertStatsEqual(stats, self.scans)
+
+    def test_too_few_samples(self):
+        stats = RunningStats(2, 1)
+        stats.update(0, [1.0])
+        self.assertTrue(np.all(np.isnan(stats.variance())))
+        self.assertTrue(np.all(np.isnan(stats.std_error())))
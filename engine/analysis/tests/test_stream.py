@@ -0,0 +1,72 @@
+from analysis.stream import *
+import unittest
+
+import numpy as np
+
+class TestStreamOperators(unittest.TestCase):
+    def setUp(self):
+        self.samples = np.random.RandomState(0).normal(size=(250, 2))
+
+    def assertBlockwiseEqual(self, make_operator, samples, block_sizes):
+        """Checks that processing a stream block by block matches processing
+        it all at once.
+        """
+        whole = make_operator()
+        expected = whole.process(samples)
+        for block_size in block_sizes:
+            operator = make_operator()
+            blocks = [operator.process(samples[i:i + block_size])
+                    for i in range(0, len(samples), block_size)]
+            np.testing.assert_allclose(np.concatenate(blocks), expected)
+        return expected
+
+    def test_fir_filter(self):
+        taps = [0.5, 0.3, 0.2]
+        output = self.assertBlockwiseEqual(lambda: FIRFilter(taps),
+                self.samples, [1, 2, 7, 64])
+        for column in range(2):
+            np.testing.assert_allclose(output[:, column],
+                    np.convolve(self.samples[:, column], taps)[:len(self.samples)])
+
+    def test_moving_average(self):
+        output = self.assertBlockwiseEqual(lambda: MovingAverage(5),
+                self.samples[:, 0], [1, 3, 4, 100])
+        self.assertEqual(len(output), len(self.samples) - 4)
+        np.testing.assert_allclose(output[0], self.samples[:5, 0].mean())
+        np.testing.assert_allclose(output[-1], self.samples[-5:, 0].mean())
+
+    def test_boxcar_decimator(self):
+        output = self.assertBlockwiseEqual(lambda: BoxcarDecimator(4),
+                self.samples, [1, 3, 10])
+        self.assertEqual(output.shape, (62, 2))
+        np.testing.assert_allclose(output[1], self.samples[4:8].mean(axis=0))
+
+        decimator = BoxcarDecimator(4)
+        decimator.process(self.samples)
+        np.testing.assert_allclose(decimator.flush(),
+                self.samples[248:].mean(axis=0, keepdims=True))
+        self.assertIsNone(decimator.flush())
+
+    def test_outlier_rejector(self):
+        samples = self.samples.copy()
+        samples[100, 1] = 50
+        samples[200, :] = -50
+        output = self.assertBlockwiseEqual(
+                lambda: OutlierRejector(64, columns=[1]), samples, [1, 5, 32])
+        np.testing.assert_array_equal(output[:, 0], samples[:, 0])
+        self.assertTrue(np.all(np.abs(output[:, 1]) < 10))
+
+        rejector = OutlierRejector(64, mode='drop')
+        output = rejector.process(samples)
+        self.assertEqual(rejector.num_rejected, 2)
+        self.assertEqual(len(output), len(samples) - 2)
+
+    def test_pipeline(self):
+        pipeline = Pipeline(MovingAverage(2), BoxcarDecimator(3))
+        for i in range(0, 11, 4):
+            pipeline.process(np.arange(i, min(i + 4, 11), dtype=float))
+        pipeline.flush()
+        # Averages: 0.5, 1.5, ..., 9.5; decimated in groups of 3.
+        np.testing.assert_allclose(pipeline.to_array(), [1.5, 4.5, 7.5, 9.5])
+        pipeline.reset()
+        self.assertEqual(len(pipeline.to_array()), 0)
@@ -0,0 +1,271 @@
+"""
+Benchmark Module
+
+Throughput benchmarks of the engine's hot paths. Instruments are simulated
+(see `instrument.simulated`), so that benchmarks run without the lab, and
+measure the overhead of the engine and drivers rather than of the hardware.
+
+Benchmarks are run from the command line with `run_benchmarks.py`, which
+writes the results as JSON, so that results of different versions can be
+compared with `compare`.
+
+Each benchmark returns a dict of metrics. Metrics ending in '_per_s' are
+throughputs (higher is better), all others are times (lower is better).
+
+Importable:
+  - BENCHMARKS
+  - run_benchmarks
+  - compare
+"""
+
+from engine import Engine, ExperimentData
+from experiment import Experiment, IntParameter
+from instrument.daq.sr830 import SR830
+from instrument.mwfreqsynth.hp8664a import HP8664A
+from instrument.pulseblaster.pulseblasteresrpro import PulseBlasterESRPRO
+from instrument.simulated import simulate
+from logger import EngineLogger, MESSAGE
+
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+__all__ = ['BENCHMARKS', 'run_benchmarks', 'compare']
+
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Benchmarks by name, in the order they are run.
+BENCHMARKS = {}
+
+def benchmark(fn):
+    """Registers a benchmark. The benchmark is called with a scale factor of
+    its number of iterations, and returns a dict of metrics.
+    """
+    BENCHMARKS[fn.__name__] = fn
+    return fn
+
+def run_benchmarks(names=None, scale=1.0):
+    """Runs benchmarks.
+
+    Parameters:
+      - names (list[str]): Names of the benchmarks to run. Runs all of them
+        if None.
+      - scale (float): Scale factor of the number of iterations of each
+        benchmark. Smaller scales run faster, but are noisier.
+
+    Returns:
+      - dict: Results, with the metrics of each benchmark under
+        'benchmarks', along with the environment they were run in.
+    """
+    results = {
+        'version': _version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.time(),
+        'scale': scale,
+        'benchmarks': {},
+    }
+    for name in names or BENCHMARKS:
+        results['benchmarks'][name] = BENCHMARKS[name](scale)
+    return results
+
+def compare(baseline, results):
+    """Compares results to a baseline.
+
+    Parameters:
+      - baseline (dict): Results returned by `run_benchmarks`.
+      - results (dict): Results returned by `run_benchmarks`.
+
+    Returns:
+      - list[tuple]: A `(benchmark, metric, baseline, value, speedup)` tuple
+        for each metric in both results, where a speedup greater than 1 is an
+        improvement.
+    """
+    comparison = []
+    for name, metrics in results['benchmarks'].items():
+        base_metrics = baseline['benchmarks'].get(name, {})
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if base is None or not base or not value:
+                continue
+            if metric.endswith('_per_s'):
+                speedup = value / base
+            else:
+                speedup = base / value
+            comparison.append((name, metric, base, value, speedup))
+    return comparison
+
+################
+## Benchmarks ##
+################
+
+@benchmark
+def visa_io(scale):
+    """Overhead of `VisaInstrument._read` and `_write`, and of the error
+    check added by `check_error`, on a simulated SR830 with no latency.
+    """
+    number = _iterations(20000, scale)
+    daq = SR830(address='BENCH::8::INSTR')
+    with simulate([daq]):
+        daq._connect()
+        read = _time_per_call(lambda: daq._read('OUTP ? 1'), number)
+        write = _time_per_call(lambda: daq._write('OUTX 1'), number)
+        checked = _time_per_call(lambda: daq.get_value(1), number)
+    return {
+        'read_us': read * 1e6,
+        'write_us': write * 1e6,
+        'checked_read_us': checked * 1e6,
+        'check_error_us': (checked - read) * 1e6,
+    }
+
+@benchmark
+def pulseblaster_upload(scale):
+    """Rate PulseBlaster instructions are uploaded at through
+    `PulseBlasterESRPRO._write_inst`, on a simulated SpinAPI library.
+    """
+    number = _iterations(50000, scale)
+    pb = PulseBlasterESRPRO(clock_freq=100.0, board_num=0)
+    with simulate([pb]):
+        pb._connect()
+        pb.start_programming('PULSE_PROGRAM')
+        per_inst = _time_per_call(lambda: pb.continue_inst(1, 'ON', 100),
+                number)
+        pb.stop_programming()
+    return {
+        'inst_us': per_inst * 1e6,
+        'insts_per_s': 1 / per_inst,
+    }
+
+@benchmark
+def engine_run(scale):
+    """Points per second of `Engine.run_experiment` on a simulated lock-in
+    sweep, with and without saving the run.
+    """
+    num_points = str(_iterations(2000, scale))
+    start = time.perf_counter()
+    Engine(simulate=True).run_experiment(_LockInSweep, num_points=num_points)
+    elapsed = time.perf_counter() - start
+    run_dir = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        Engine(run_dir=os.path.join(run_dir, 'run'), simulate=True,
+                checkpoint_interval=0.1).run_experiment(_LockInSweep,
+                        num_points=num_points)
+        saved_elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(run_dir)
+    return {
+        'points_per_s': int(num_points) / elapsed,
+        'saved_points_per_s': int(num_points) / saved_elapsed,
+    }
+
+@benchmark
+def data_append(scale):
+    """Cost of appending a point to `ExperimentData`, in the default and
+    accumulating modes.
+    """
+    number = _iterations(200000, scale)
+    point = (1.0, [2.0, 3.0])
+    data = ExperimentData()
+    append = _time_per_call(lambda: data.append(point), number)
+    data = ExperimentData()
+    data.accumulate(1000)
+    accumulate = _time_per_call(lambda: data.append(point), number)
+    return {
+        'append_us': append * 1e6,
+        'accumulate_us': accumulate * 1e6,
+        'points_per_s': 1 / append,
+    }
+
+@benchmark
+def event_log(scale):
+    """Cost of logging an event to `EngineLogger`, while it is flushed to a
+    file in the background.
+    """
+    number = _iterations(200000, scale)
+    log_dir = tempfile.mkdtemp()
+    try:
+        logger = EngineLogger(os.path.join(log_dir, 'events.log'))
+        per_event = _time_per_call(lambda: logger.log(MESSAGE, 1, 2, 3.0),
+                number)
+        logger.close()
+    finally:
+        shutil.rmtree(log_dir)
+    return {
+        'log_us': per_event * 1e6,
+        'events_per_s': 1 / per_event,
+        'dropped': logger.num_dropped,
+    }
+
+@benchmark
+def cli_startup(scale):
+    """Time to start the engine's command line interface, up to parsing its
+    arguments.
+    """
+    times = []
+    for _ in range(_iterations(5, scale)):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, ENGINE_DIR, '--help'],
+                stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return {
+        'startup_s': min(times),
+        'mean_startup_s': float(np.mean(times)),
+    }
+
+#############
+## Private ##
+#############
+
+class _LockInSweep(Experiment):
+    """Lock-in sweep measured point by point, as in `LockInExperiment`."""
+    instruments = {
+        'daq': SR830(address='BENCH::8::INSTR'),
+        'mwfs': HP8664A(address='BENCH::19::INSTR'),
+        'pb': PulseBlasterESRPRO(clock_freq=100.0, board_num=0),
+    }
+    parameters = {
+        'num_points': IntParameter('Number of Points', min=1),
+    }
+
+    def setup(self):
+        self.daq.set_trigger_mode(1)
+        self.pb.start_programming('PULSE_PROGRAM')
+        self.pb.continue_inst(1, 'ON', 1e3)
+        self.pb.stop_inst(0, 'OFF', 1e3)
+        self.pb.stop_programming()
+
+    def run(self):
+        for freq in self.sweep(np.linspace(2.8e9, 2.9e9, self.num_points)):
+            self.mwfs.set_freq(freq)
+            self.pb.start()
+            values = self.daq.trigger_pipelined(1, 2).result()
+            self.engine.data.append((freq, values))
+            self.pb.stop()
+
+    @staticmethod
+    def analyze(data):
+        pass
+
+def _iterations(number, scale):
+    return max(int(number * scale), 1)
+
+def _time_per_call(fn, number, repeat=3):
+    """Returns the best time per call of `fn` over `repeat` runs."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+def _version():
+    """Returns the git revision of the engine, or None if unknown."""
+    try:
+        return subprocess.check_output(
+                ['git', 'describe', '--always', '--dirty'], cwd=ENGINE_DIR,
+                stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
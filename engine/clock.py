@@ -0,0 +1,142 @@
+"""
+Clock Module
+
+Paces sweeps at a fixed cadence. Instead of sleeping a fixed time at each
+point, which adds the time spent acquiring the point to every period, points
+are scheduled against absolute deadlines on a monotonic clock, and only the
+time remaining until the next deadline is slept. The period then doesn't
+drift, however long each point takes to acquire, as long as it fits in the
+period.
+
+Importable:
+  - SweepClock
+  - VirtualClock
+"""
+
+import array
+import time
+
+import numpy as np
+
+from tracing import TRACER
+
+__all__ = ['SweepClock', 'VirtualClock']
+
+class SweepClock(object):
+    """Schedules sweep points against absolute monotonic deadlines.
+
+    The clock starts on the first `tick`, and point `n` is due `n + 1` periods
+    after that. If a point is late by more than a period, the deadlines it
+    missed are skipped rather than caught up in a burst, keeping the
+    deadlines aligned to the original schedule.
+
+    Parameters:
+      - period (float): Time between points, in seconds.
+      - clock (callable): Monotonic clock, in seconds.
+      - sleep (callable): Sleeps a number of seconds.
+
+    Instance Attributes:
+      - period (float)
+      - num_ticks (int): Number of points ticked.
+      - num_missed (int): Number of deadlines skipped because a point was late
+        by more than a period.
+      - lateness (array.array): How late each tick was relative to its
+        deadline, in seconds. 0 if on time.
+    """
+
+    def __init__(self, period, clock=time.monotonic, sleep=time.sleep):
+        self.period = period
+        self.num_ticks = 0
+        self.num_missed = 0
+        self.lateness = array.array('d')
+        self._clock = clock
+        self._sleep = sleep
+        self._start = None
+        self._slot = 0
+
+    def start(self):
+        """Starts the clock now. Called by the first `tick` if needed."""
+        self._start = self._clock()
+        self._slot = 0
+
+    @property
+    def deadline(self):
+        """Monotonic time the next point is due at."""
+        return self._start + (self._slot + 1) * self.period
+
+    def tick(self):
+        """Waits until the next point is due.
+
+        Returns:
+          - float: How late the tick was, in seconds. 0 if on time.
+        """
+        if self._start is None:
+            self.start()
+        remaining = self.deadline - self._clock()
+        if remaining > 0:
+            start = time.perf_counter()
+            self._sleep(remaining)
+            TRACER.add('sleep', 'clock', start)
+        lateness = max(self._clock() - self.deadline, 0.0)
+        missed = int(lateness // self.period)
+        self.num_missed += missed
+        self._slot += 1 + missed
+        self.num_ticks += 1
+        self.lateness.append(lateness)
+        return lateness
+
+    def eta(self, num_points):
+        """Returns the expected time until a number of points are done.
+
+        Parameters:
+          - num_points (int): Number of points remaining.
+
+        Returns:
+          - float: Time remaining, in seconds.
+        """
+        if self._start is None:
+            return num_points * self.period
+        return max(self.deadline + (num_points - 1) * self.period
+                - self._clock(), 0.0)
+
+    def stats(self):
+        """Returns clock statistics.
+
+        Returns:
+          - dict: Number of ticks and missed deadlines, and the mean, 95th
+            percentile and maximum lateness in seconds.
+        """
+        lateness = np.array(self.lateness or [0.0])
+        return {
+            'period': self.period,
+            'ticks': self.num_ticks,
+            'missed': self.num_missed,
+            'mean_lateness': float(lateness.mean()),
+            'p95_lateness': float(np.percentile(lateness, 95)),
+            'max_lateness': float(lateness.max()),
+        }
+
+class VirtualClock(object):
+    """Monotonic clock whose sleeps return immediately, skipping the time
+    slept instead, e.g. so that replays run as fast as possible while clocks
+    still see their deadlines pass.
+
+    Parameters:
+      - clock (callable): Monotonic clock the virtual clock runs ahead of, in
+        seconds.
+
+    Instance Attributes:
+      - slept (float): Time skipped by sleeps, in seconds.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.slept = 0.0
+        self._clock = clock
+
+    def time(self):
+        """Virtual time, in seconds."""
+        return self._clock() + self.slept
+
+    def sleep(self, seconds):
+        """Skips a number of seconds."""
+        self.slept += max(seconds, 0.0)
@@ -1,56 +1,702 @@
+import contextlib
+import functools
 import importlib
+import os
+import sys
+import time
 
+import numpy as np
+
+from analysis.stats import RunningStats
+from clock import SweepClock, VirtualClock
+from estimate import DryRun
+from experiment import ExperimentError, load_experiment
 from instrument import Instrument
+from instrument.lib.visainstrument import TriggerGroup
+from instrument.lib.metrics import METRICS
+from liveview import LiveView
+from logger import EngineLogger, RUN_START, RUN_END, POINT, CHECKPOINT
+from storage import DTYPE, RunWriter, load_run, save_checkpoint, load_checkpoint
+from tracing import TRACER
+from writer import DataWriter
 
 class Engine(object):
-    """Experiment Engine"""
+    """Experiment Engine
+
+    Parameters:
+      - run_dir (str): Directory to save the data of each run to. If None, data
+        is not saved.
+      - live_view (bool): Whether data should be plotted live while it is
+        acquired.
+      - queue_size (int): Maximum number of points queued in memory between
+        the experiment and the thread saving them.
+      - backpressure (str): What happens when the queue is full: 'block',
+        'drop_oldest' or 'spill'. See the `writer` module. Saved runs can
+        only drop points if they aren't checkpointed, since a checkpoint
+        can't tell which rows of its completed points were dropped.
+      - checkpoint_interval (float): Time between checkpoints of the run's
+        progress, in seconds. Runs are only checkpointed if they are saved.
+        If None, runs aren't checkpointed, and can't be resumed.
+      - simulate (bool): Whether instruments are connected to simulated
+        backends instead of hardware. See `instrument.simulated`.
+      - simulate_latency (float): Latency of every command sent to a
+        simulated instrument, in seconds.
+      - trace_path (str): File to save a Chrome trace of each run to (see
+        the `tracing` module). If None, runs aren't traced.
+      - profiler (Profiler): Profiler to profile the phases of each run
+        with (see the `profiling` module), if any.
+      - record_path (str): File to record a transcript of the commands sent
+        to VISA instruments in each run to. See `instrument.replay`.
+      - replay_path (str): Transcript to replay to VISA instruments instead
+        of connecting to hardware. PulseBlasters are simulated while
+        replaying.
+      - replay_realtime (bool): Whether replayed commands take as long as
+        they were recorded to, instead of returning immediately. Sweep clocks
+        don't wait for their deadlines either unless replaying in real time.
+      - dry_run (bool): Whether runs only estimate how long the experiment
+        takes. The experiment is set up and run on simulated instruments,
+        with sweep clocks and `time.sleep` on a virtual clock, and isn't
+        analyzed or saved.
+        See the `estimate` module.
+      - latencies (dict[str -> float]): Latency of each command type used to
+        estimate dry runs, overriding `estimate.LATENCIES`.
+
+    Instance Attributes:
+      - logger (EngineLogger): Event log of the current run. Saved to the
+        run's directory if the run is saved.
+      - writer (DataWriter): Writer saving the current run's data, or None if
+        data is not saved. Its `stats` can be queried during a run.
+      - points_done (int): Number of sweep points completed in the current
+        run, including points completed before it was resumed.
+      - clock (SweepClock): Last clock created with `sweep_clock` in the
+        current run, or None.
+      - metrics (Metrics): Latency metrics of the commands sent to
+        instruments in the current run. Can be queried during a run.
+      - estimate (DryRun): Estimate of the current run if it is a dry run,
+        else None.
+      - latency_report (dict): Latency report of the last run, once it
+        ends: its 'elapsed' time in seconds, and the statistics of the
+        'commands' sent to instruments (see `Metrics.stats`).
+    """
 
-    def __init__(self):
+    def __init__(self, run_dir=None, live_view=False, queue_size=4096,
+            backpressure='block', checkpoint_interval=10.0, simulate=False,
+            simulate_latency=0.0, trace_path=None, profiler=None,
+            record_path=None, replay_path=None, replay_realtime=False,
+            dry_run=False, latencies=None):
         self.logger = None
         self.data = None
         self.ui = None
+        self.run_dir = run_dir
+        self.live_view = live_view
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+        self.checkpoint_interval = checkpoint_interval
+        self.simulate = simulate
+        self.simulate_latency = simulate_latency
+        self.trace_path = trace_path
+        self.profiler = profiler
+        self.record_path = record_path
+        self.replay_path = replay_path
+        self.replay_realtime = replay_realtime
+        self.dry_run = dry_run
+        self.latencies = latencies
+        self.writer = None
+        self.points_done = 0
+        self.clock = None
+        self.metrics = METRICS
+        self.estimate = None
+        self.latency_report = None
+        self._trigger_groups = []
+        self._progress = _SweepProgress()
+        self._last_checkpoint = 0.0
 
     def run_experiment(self, experiment, **kwargs):
         """Runs an experiment.
 
         Parameters:
           - experiment (Experiment): An `Experiment` class.
+
+        Returns:
+          - dict: The run's `latency_report`.
+        """
+        self._run(experiment, kwargs)
+        return self.latency_report
+
+    def resume(self, run_dir):
+        """Resumes an interrupted run from its last checkpoint.
+
+        The experiment is reloaded from its file, its instruments are
+        reconnected and its `setup` is replayed. `run` is then called again,
+        and the sweep points completed before the checkpoint are skipped (see
+        `sweep`).
+
+        Parameters:
+          - run_dir (str): Directory of the interrupted run.
+
+        Returns:
+          - dict: The run's `latency_report`.
+        """
+        checkpoint = load_checkpoint(run_dir)
+        if checkpoint['complete']:
+            raise ExperimentError('Run in {0} is already complete.'.format(
+                    run_dir))
+        self.run_dir = run_dir
+        with self.profile_phase('load'):
+            experiment = load_experiment(checkpoint['experiment_path'])
+        self._run(experiment, checkpoint['parameters'], checkpoint)
+        return self.latency_report
+
+    def sweep(self, points):
+        """Iterates over the points of a sweep, recording progress.
+
+        A point is completed once the next point is requested. Progress is
+        checkpointed periodically, and points completed before a resumed run
+        was interrupted are skipped.
+
+        Sweeps can be nested, or run one after another. Progress is recorded
+        at each level of nesting, as the number of sweeps completed and the
+        number of points completed in the current sweep, so that a resumed
+        run skips the sweeps and points completed at each level. Since the
+        point of an outer sweep that was interrupted is run again, any code
+        it runs before its inner sweep is run again too.
+
+        Parameters:
+          - points (iterable): Sweep points.
+        """
+        progress = self._progress
+        depth, skip = progress.start_sweep()
+        completed = False
+        try:
+            for point in points:
+                if skip is None:
+                    # Sweep completed before the run was interrupted.
+                    continue
+                if skip:
+                    skip -= 1
+                    progress.skip_point(depth)
+                    continue
+                start = time.perf_counter()
+                if self.profiler is not None:
+                    self.profiler.start_point(self.points_done)
+                yield point
+                if self.profiler is not None:
+                    self.profiler.stop_point()
+                TRACER.add('point', 'engine', start,
+                        args={'index': self.points_done})
+                progress.complete_point(depth)
+                self.points_done += 1
+                self.logger.log(POINT, arg=self.points_done)
+                self._num_appended_at_point = len(self.data)
+                if (self.writer is not None and
+                        self.checkpoint_interval is not None and
+                        time.monotonic() - self._last_checkpoint >=
+                        self.checkpoint_interval):
+                    self._checkpoint()
+            completed = True
+        finally:
+            progress.end_sweep(depth, completed)
+
+    def sweep_clock(self, period):
+        """Creates a clock pacing sweep points at a fixed period, against
+        absolute deadlines. Experiments call `tick` on it at every point.
+
+        Parameters:
+          - period (float): Time between points, in seconds.
+
+        Returns:
+          - SweepClock: The clock.
+        """
+        if self.estimate is not None:
+            self.clock = SweepClock(period, clock=self.estimate.time,
+                    sleep=self.estimate.sleep)
+        elif self.replay_path is not None and not self.replay_realtime:
+            # Replays run as fast as possible, so points aren't paced.
+            virtual = VirtualClock()
+            self.clock = SweepClock(period, clock=virtual.time,
+                    sleep=virtual.sleep)
+        else:
+            self.clock = SweepClock(period)
+        return self.clock
+
+    def trigger_group(self, *instruments):
+        """Creates a group of instruments on a GPIB bus, triggered all at once
+        with a single Group Execute Trigger. Closed at the end of the run.
+
+            self.triggers = self.engine.trigger_group(self.daq, self.daq2)
+            ...
+            self.triggers.trigger()
+
+        Parameters:
+          - instruments (VisaInstrument): Connected instruments on the same
+            GPIB bus, whose drivers support GET (`supports_get`).
+
+        Returns:
+          - TriggerGroup: The group.
+        """
+        group = TriggerGroup(instruments)
+        self._trigger_groups.append(group)
+        return group
+
+    def profile_phase(self, phase):
+        """Returns a context profiling a phase of the run with the engine's
+        profiler, or doing nothing if not profiling.
+
+        Parameters:
+          - phase (str): Name of the phase, e.g. from `profiling.PHASES`.
         """
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.phase(phase)
+
+    def _run(self, experiment, parameters, checkpoint=None):
+        if self.trace_path is not None:
+            TRACER.start()
+        try:
+            self._run_experiment(experiment, parameters, checkpoint)
+        finally:
+            if self.trace_path is not None:
+                TRACER.stop()
+                TRACER.save(self.trace_path)
+
+    def _run_experiment(self, experiment, parameters, checkpoint):
         # TODO(Jeffrey):
         #  - Error handling
-        #  - Save data to file
+
+        if (self.run_dir is not None and not self.dry_run and
+                self.checkpoint_interval is not None and
+                self.backpressure == 'drop_oldest'):
+            raise ExperimentError("Checkpointed runs cannot drop points "
+                    "with the 'drop_oldest' backpressure policy.")
 
         # Setup Engine
-        self.logger = EngineLogger()
-        #self.data = ExperimentData
-        self.data = [] # Temp
-        self.connect_instruments(experiment)
-        Instrument.num_instruments = 0
+        self.writer = self.logger = self.data = None
+        self.clock = None
+        self._trigger_groups = []
+        self.latency_report = None
+        self.metrics.reset()
+        self.estimate = DryRun(self.latencies) if self.dry_run else None
+        self.points_done = checkpoint['points'] if checkpoint is not None else 0
+        self._progress = _SweepProgress()
+        self._num_appended_at_point = 0
+        self._last_checkpoint = time.monotonic()
+        live_view = None
+        run_writer = None
+        # Backends swapped in for the instruments, closed in reverse order.
+        backends = []
+        complete = False
+        sleep = time.sleep
+        try:
+            if self.estimate is not None:
+                # Experiments and drivers waiting e.g. for an instrument to
+                # settle sleep on the virtual clock too, so that their waits
+                # are estimated instead of taken.
+                time.sleep = self.estimate.sleep
+            live_view = LiveView() if self.live_view else None
+            if self.run_dir is not None and not self.dry_run:
+                # Data is saved on a separate thread, so that slow writes don't
+                # stall the experiment.
+                metadata = {
+                    'experiment': experiment.__name__,
+                    'experiment_path': _experiment_path(experiment),
+                    'parameters': parameters,
+                }
+                if checkpoint is None:
+                    run_writer = RunWriter(self.run_dir, metadata)
+                else:
+                    run_writer = RunWriter(self.run_dir, metadata,
+                            resume_rows=checkpoint['rows'])
+                self._run_writer = run_writer
+                # Resumed runs keep the log of each attempt.
+                log_name = 'events.log' if checkpoint is None else \
+                        'events.{0}.log'.format(checkpoint['points'])
+                self.logger = EngineLogger(os.path.join(self.run_dir, log_name))
+                self.writer = DataWriter(
+                        run_writer.extend,
+                        run_writer.flush,
+                        max_size=self.queue_size,
+                        policy=self.backpressure,
+                )
+                self.writer.start()
+            else:
+                self.logger = EngineLogger()
+            self.data = ExperimentData(live_view=live_view, writer=self.writer)
+            self.logger.log(RUN_START, arg=self.points_done)
 
-        # Run experiment
-        experiment = experiment(**kwargs)
-        experiment.setup()
-        experiment.run()
+            # Run experiment
+            experiment = experiment(**parameters)
+            experiment.engine = self
+            simulate = self.simulate or self.dry_run
+            if simulate or self.replay_path is not None:
+                # Imported here, so that the drivers of every simulated
+                # instrument are only imported when simulating.
+                from instrument import simulated
+            if self.record_path is not None or self.replay_path is not None:
+                from instrument import replay
+            if simulate:
+                backends.append(simulated.simulate(
+                        experiment.instruments.values(),
+                        latency=0.0 if self.dry_run else self.simulate_latency))
+            if self.replay_path is not None:
+                # SpinAPI calls aren't recorded, so PulseBlasters are
+                # simulated.
+                backends.append(simulated.Simulation({},
+                        simulated.SimulatedSpinAPI()))
+                backends.append(replay.replay(self.replay_path,
+                        realtime=self.replay_realtime))
+            if self.record_path is not None:
+                backends.append(replay.record(self.record_path))
+            with self.profile_phase('connect'):
+                self.connect_instruments(experiment)
+            Instrument.num_instruments = 0
+            with TRACER.span('setup', 'experiment'), \
+                    self.profile_phase('setup'):
+                experiment.setup()
+            if checkpoint is not None:
+                # Checkpoints without sweeps were saved by single sweeps.
+                self._progress = _SweepProgress(checkpoint.get('sweeps',
+                        [[0, checkpoint['points']]]))
+                self.data.restore(load_run(self.run_dir).data)
+                self._num_appended_at_point = len(self.data)
+            with TRACER.span('run', 'experiment'), \
+                    self.profile_phase('run'):
+                experiment.run()
+            complete = True
+        finally:
+            time.sleep = sleep
+            self.metrics.stop()
+            self.latency_report = {
+                'elapsed': self.metrics.elapsed,
+                'commands': self.metrics.stats(),
+            }
+            if self.logger is not None:
+                self.logger.log(RUN_END, arg=int(complete))
+                self.logger.close()
+            for group in self._trigger_groups:
+                group.close()
+            for backend in reversed(backends):
+                backend.close()
+            if live_view is not None:
+                live_view.close()
+            try:
+                if self.writer is not None:
+                    self.writer.close()
+                    if self.checkpoint_interval is not None:
+                        # Rows appended by a point that didn't complete are
+                        # dropped, since the point is redone when resuming.
+                        num_incomplete = (len(self.data) -
+                                self._num_appended_at_point)
+                        self._save_checkpoint(self.points_done,
+                                self._progress.snapshot(),
+                                run_writer.rows - num_incomplete, complete)
+            finally:
+                if run_writer is not None:
+                    run_writer.close()
+        self.data.flush_streams()
+        if self.dry_run:
+            return
 
         # Analyze Data
-        experiment.analyze(self.data)
+        with TRACER.span('analyze', 'experiment'), \
+                self.profile_phase('analyze'):
+            experiment.analyze(self.data.to_array())
 
-    def connect_instruments(self, experiment):
-        for instrument in experiment.instruments:
-            instrument = getattr(experiment, instrument)
-            instrument.engine = self
-            instrument._connect()
+    def _checkpoint(self):
+        """Checkpoints the run once the points completed so far are saved."""
+        self._last_checkpoint = time.monotonic()
+        self.logger.log(CHECKPOINT, arg=self.points_done)
+        self.writer.call_when_written(functools.partial(self._save_checkpoint,
+                self.points_done, self._progress.snapshot()))
 
-class EngineLogger(object):
-    """Experiment log.
+    def _save_checkpoint(self, points_done, sweeps, rows=None,
+            complete=False):
+        """Saves a checkpoint. Called on the writer thread while running, so
+        that all rows of the completed points have been written.
+        """
+        self._run_writer.flush()
+        if rows is None:
+            rows = self._run_writer.rows
+        save_checkpoint(self.run_dir, {
+            'experiment_path': self._run_writer.metadata['experiment_path'],
+            'parameters': self._run_writer.metadata['parameters'],
+            'points': points_done,
+            'sweeps': sweeps,
+            'rows': rows,
+            'offset': rows * (self._run_writer.columns or 0) * DTYPE.itemsize,
+            'complete': complete,
+            'time': time.time(),
+        })
 
-    An experiment log, for debugging purposes.
-    """
-    pass
+    def connect_instruments(self, experiment):
+        with TRACER.span('connect_instruments', 'engine'):
+            for instrument in experiment.instruments.values():
+                instrument.engine = self
+                with TRACER.span('connect', 'engine',
+                        instrument=str(instrument)):
+                    instrument._connect()
 
 class ExperimentData(object):
     """Experiment data
 
+    Data points acquired by an experiment. Experiments append each point as an
+    `(input, outputs)` pair, e.g. `(freq, daq.get_values(1, 2))`, which is
+    stored as a single row with the input in the first column, followed by the
+    outputs.
+
+    Experiments that repeat the same scan many times can switch to accumulating
+    mode with `accumulate`. Instead of keeping every row, only the running
+    mean, variance and count of each point of the scan are kept, so memory use
+    doesn't grow with the number of scans.
+
+    Streams (e.g. an `analysis.stream.Pipeline`) can be attached to process
+    points while they are acquired. Points are passed to streams in blocks of
+    rows, to amortize the cost of processing. Streams can also replace the raw
+    rows, which then aren't kept in memory, so that memory use doesn't grow
+    with the length of a streamed run.
+
+    Points are also published to a `LiveView`, and queued on a `DataWriter` to
+    be saved, if either is given.
+
+    Parameters:
+      - block_size (int): Number of points passed to streams at once.
+      - live_view (LiveView): Live view to publish points to.
+      - writer (DataWriter): Writer to queue points on.
+
+    Instance Attributes:
+      - rows (list[list[float]]): Data points, one row per point. Empty in
+        accumulating mode, and missing the points appended once rows stopped
+        being kept.
+      - keep_rows (bool): Whether appended points are kept in `rows`.
+      - stats (RunningStats): Statistics of each point of the scan in
+        accumulating mode, else None.
+      - streams (list[Operator]): Attached streams.
+      - block_size (int): Number of points passed to streams at once.
+      - live_view (LiveView): Live view points are published to, or None.
+      - writer (DataWriter): Writer points are queued on, or None.
     """
-    pass
 
+    def __init__(self, block_size=64, live_view=None, writer=None):
+        self.rows = []
+        self.keep_rows = True
+        self.stats = None
+        self.block_size = block_size
+        self.live_view = live_view
+        self.writer = writer
+        self.streams = []
+        self._num_appended = 0
+        self._scan_size = None
+        self._pending = []
+
+    def accumulate(self, num_points):
+        """Switches to accumulating mode. Appended points are treated as
+        repeated scans of `num_points` points, i.e. the nth point appended is
+        a sample of point `n % num_points` of the scan.
+
+        Must be called before any points are appended.
+
+        Parameters:
+          - num_points (int): Number of points per scan.
+        """
+        if self._num_appended:
+            raise ExperimentError(
+                    'Cannot accumulate data once points have been appended.')
+        self._scan_size = num_points
+
+    def append(self, point):
+        """Appends a data point.
+
+        Parameters:
+          - point (tuple): An `(input, outputs)` pair, where outputs is either
+            a single value or a sequence of values.
+        """
+        row = _point_to_row(point)
+        self._store(row)
+        if self.live_view is not None:
+            self.live_view.publish(row)
+        if self.writer is not None:
+            self.writer.put(row)
+        if self.streams:
+            self._pending.append(row)
+            if len(self._pending) >= self.block_size:
+                self._feed_streams()
+
+    def restore(self, rows):
+        """Restores rows saved by an interrupted run, when it is resumed. The
+        rows are not published, saved again or passed to streams.
+
+        Parameters:
+          - rows (array-like): A (points, columns) array.
+        """
+        for row in np.asarray(rows, dtype=float).tolist():
+            self._store(row)
+
+    def _store(self, row):
+        if self._scan_size is None:
+            if self.keep_rows:
+                self.rows.append(row)
+        else:
+            if self.stats is None:
+                self.stats = RunningStats(self._scan_size, len(row))
+            self.stats.update(self._num_appended % self._scan_size, row)
+        self._num_appended += 1
+
+    @property
+    def num_scans(self):
+        """Number of complete scans in accumulating mode, else 0."""
+        if self._scan_size is None:
+            return 0
+        return self._num_appended // self._scan_size
+
+    def std_error(self):
+        """Returns the standard error of the mean of each point of the scan
+        in accumulating mode, as a (points, columns) array. Can be called at
+        any time during a run. Empty until a point has been appended, and
+        when not accumulating.
+        """
+        if self.stats is None:
+            return np.empty((0, 0))
+        return self.stats.std_error()[:self._num_seen()]
+
+    def add_stream(self, stream, keep_rows=True):
+        """Attaches a stream, which is fed every point appended from now on.
+
+        Parameters:
+          - stream (Operator): A streaming operator or pipeline.
+          - keep_rows (bool): Whether points appended from now on are still
+            kept in `rows`. If False, they are only passed to the streams,
+            and published and saved if the data has a live view or writer.
+        """
+        self._feed_streams()
+        self.streams.append(stream)
+        if not keep_rows:
+            self.keep_rows = False
+
+    def flush_streams(self):
+        """Feeds any buffered points to the streams, and flushes them. Should
+        be called once no more points will be appended.
+        """
+        self._feed_streams()
+        for stream in self.streams:
+            stream.flush()
+
+    def _feed_streams(self):
+        if not self._pending:
+            return
+        block = np.asarray(self._pending, dtype=float)
+        self._pending = []
+        for stream in self.streams:
+            stream.process(block)
+
+    def to_array(self):
+        """Returns the data as a (points, columns) float array. In
+        accumulating mode, returns the mean of each point of the scan.
+        """
+        if self._scan_size is not None and self.stats is not None:
+            return self.stats.mean[:self._num_seen()].copy()
+        if not self.rows:
+            return np.empty((0, 0))
+        return np.asarray(self.rows, dtype=float)
+
+    def _num_seen(self):
+        """Number of points of the scan with at least one sample."""
+        return min(self._num_appended, self._scan_size)
+
+    def __len__(self):
+        return self._num_appended
+
+    def __iter__(self):
+        return iter(self.rows)
+
+class _SweepProgress(object):
+    """Progress of a run through its sweeps.
+
+    The position of a run holds, for each level of nesting of its current
+    sweeps, the number of sweeps completed at that level (within the current
+    point of the level above), and the number of points completed in the
+    current sweep at that level.
+
+    Parameters:
+      - resume (list[list[int]]): Position of an interrupted run, if it is
+        resumed.
+
+    Instance Attributes:
+      - position (list[list[int]]): Number of sweeps and points completed at
+        each level.
+    """
+
+    def __init__(self, resume=None):
+        self.position = []
+        # Position as of the last point or sweep completed.
+        self._completed = []
+        self._depth = 0
+        self._resume = [list(level) for level in resume] if resume else None
+        # Number of levels of the resumed position reached so far.
+        self._resume_depth = 0
+
+    def start_sweep(self):
+        """Starts a sweep, nested in the sweeps currently running.
+
+        Returns:
+          - tuple(int, int): The level of the sweep, and the number of its
+            points to skip when resuming, or None if the whole sweep is
+            skipped.
+        """
+        depth = self._depth
+        self._depth += 1
+        if len(self.position) == depth:
+            self.position.append([0, 0])
+        if self._resume is None or depth != self._resume_depth:
+            return depth, 0
+        sweeps, points = self._resume[depth]
+        if sweeps:
+            self._resume[depth][0] -= 1
+            return depth, None
+        self._resume_depth += 1
+        if self._resume_depth == len(self._resume):
+            self._resume = None
+        return depth, points
+
+    def skip_point(self, depth):
+        """Skips a point completed before the run was interrupted."""
+        self.position[depth][1] += 1
+
+    def complete_point(self, depth):
+        self.position[depth][1] += 1
+        del self.position[depth + 1:]
+        self._completed = [list(level) for level in self.position]
+        self._stop_resuming(depth)
+
+    def end_sweep(self, depth, completed):
+        """Ends a sweep, either because all its points were completed, or
+        because the experiment stopped iterating over it, e.g. by breaking
+        out of the loop or raising.
+        """
+        self._depth = depth
+        self.position[depth] = [self.position[depth][0] + 1, 0]
+        del self.position[depth + 1:]
+        if completed:
+            self._completed = [list(level) for level in self.position]
+        self._stop_resuming(depth)
+
+    def snapshot(self):
+        """Returns the position as of the last point or sweep completed.
+        Sweeps that ended because the experiment raised are still in progress
+        in the snapshot, so that their points are redone when resuming.
+        """
+        return [list(level) for level in self._completed]
+
+    def _stop_resuming(self, depth):
+        # A resumed point that completes without reaching the sweeps it was
+        # interrupted in doesn't skip points of later sweeps.
+        if self._resume is not None and depth < self._resume_depth:
+            self._resume = None
+
+def _experiment_path(experiment):
+    """Returns the path to the file an experiment class was loaded from."""
+    return os.path.abspath(sys.modules[experiment.__module__].__file__)
+
+def _point_to_row(point):
+    inp, outputs = point
+    if np.ndim(outputs) == 0:
+        return [inp, outputs]
+    return [inp] + list(outputs)
@@ -0,0 +1,226 @@
+"""
+Estimate Module
+
+Runtime estimates of experiments, from dry runs. A dry run calls the
+experiment's `setup` and `run` against simulated instruments with no
+latency, while the engine's metrics count every VISA transaction and SpinAPI
+call (see `instrument.lib.metrics`), and sweep clocks and `time.sleep` sleep
+on a virtual clock instead of waiting. The runtime of the experiment is then predicted
+from a table of the latency of each command type:
+
+    python engine experiment.py --dry-run -p num_points=1000
+
+The virtual clock advances by the predicted latency of the commands sent so
+far, and by the time slept, so that sweeps paced by a `SweepClock` are
+estimated to take the longer of their period and the time to acquire each
+point.
+
+Pipelined operations and other service request waits cost the commands they
+send: the serial poll ('STB') that reads the status byte once the instrument
+requests service, and e.g. the `*ESR?` that clears it, a fixed number per
+operation. The time spent waiting for the instrument to request service,
+i.e. the time it takes to execute the operation, isn't counted, just as the
+settling time of other commands isn't.
+
+Latency tables map command types (e.g. 'OUTP?' or 'pb_start', see
+`command_type`) to their latency in seconds. Command types not in the table
+fall back to the 'VISA' or 'SPINAPI' latency, and each byte sent or received
+over VISA adds the 'VISA_BYTE' latency. Tables can be loaded from a JSON file,
+or measured from a transcript recorded in the lab (see `instrument.replay`).
+
+Importable:
+  - DryRun
+  - LATENCIES
+  - load_latencies
+"""
+
+import json
+
+from instrument.lib.metrics import METRICS, command_type
+
+__all__ = ['DryRun', 'LATENCIES', 'load_latencies']
+
+# Default latencies, in seconds. A GPIB round trip typically takes a few
+# milliseconds, while SpinAPI calls go over PCI.
+LATENCIES = {
+    'VISA': 2e-3,
+    'VISA_BYTE': 10e-6,
+    'SPINAPI': 20e-6,
+    # Serial polls don't go through the instrument's parser.
+    'STB': 0.5e-3,
+}
+
+# SpinAPI calls that upload a PulseBlaster program.
+UPLOADS = ('pb_start_programming', 'pb_inst_pbonly', 'pb_stop_programming')
+
+class DryRun(object):
+    """Virtual clock and cost model of a dry run.
+
+    Parameters:
+      - latencies (dict[str -> float]): Latency of each command type, in
+        seconds, overriding `LATENCIES`.
+      - metrics (Metrics): Metrics the commands of the run are counted in.
+
+    Instance Attributes:
+      - latencies (dict[str -> float]): Latency of each command type.
+      - slept (float): Time slept on the virtual clock, in seconds.
+      - num_sleeps (int): Number of sleeps.
+    """
+
+    def __init__(self, latencies=None, metrics=METRICS):
+        self.latencies = dict(LATENCIES)
+        if latencies:
+            self.latencies.update(latencies)
+        self.slept = 0.0
+        self.num_sleeps = 0
+        self._metrics = metrics
+
+    def latency(self, command):
+        """Returns the predicted latency of a command type, in seconds."""
+        if command in self.latencies:
+            return self.latencies[command]
+        if command.startswith('pb_'):
+            return self.latencies['SPINAPI']
+        return self.latencies['VISA']
+
+    def time(self):
+        """Virtual time, i.e. the predicted time elapsed, in seconds."""
+        return self.slept + sum(stat['time']
+                for stat in self._command_stats())
+
+    def sleep(self, seconds):
+        """Sleeps on the virtual clock."""
+        self.slept += seconds
+        self.num_sleeps += 1
+
+    def estimate(self):
+        """Returns the estimated cost of the run.
+
+        Returns:
+          - dict: The predicted 'total', 'commands' and 'sleep' times in
+            seconds, the number of VISA 'transactions', SpinAPI 'calls',
+            PulseBlaster 'uploads' (instructions and programming calls) and
+            'sleeps', and 'cost_centers': the predicted time of each
+            instrument and command type, from the most costly to the least,
+            along with their share of the total.
+        """
+        stats = self._command_stats()
+        commands = sum(stat['time'] for stat in stats)
+        estimate = {
+            'total': commands + self.slept,
+            'commands': commands,
+            'sleep': self.slept,
+            'transactions': 0,
+            'calls': 0,
+            'uploads': 0,
+            'sleeps': self.num_sleeps,
+        }
+        for stat in stats:
+            if not stat['command'].startswith('pb_'):
+                estimate['transactions'] += stat['count']
+                continue
+            estimate['calls'] += stat['count']
+            if stat['command'] in UPLOADS:
+                estimate['uploads'] += stat['count']
+        if self.num_sleeps:
+            stats.append({
+                'instrument': 'SweepClock',
+                'command': 'sleep',
+                'count': self.num_sleeps,
+                'time': self.slept,
+            })
+        for stat in stats:
+            stat['share'] = (stat['time'] / estimate['total']
+                    if estimate['total'] > 0 else 0.0)
+        stats.sort(key=lambda stat: stat['time'], reverse=True)
+        estimate['cost_centers'] = stats
+        return estimate
+
+    def report(self, top=10):
+        """Returns the estimate as text.
+
+        Parameters:
+          - top (int): Number of cost centers listed.
+
+        Returns:
+          - str: The predicted runtime, counts and top cost centers.
+        """
+        estimate = self.estimate()
+        lines = [
+            'Estimated runtime: {0} ({1:.1f}s commands, {2:.1f}s sleeping)'
+                    .format(_format_duration(estimate['total']),
+                            estimate['commands'], estimate['sleep']),
+            '{transactions} VISA transactions, {calls} SpinAPI calls '
+                    '({uploads} PulseBlaster uploads), {sleeps} sleeps'
+                    .format(**estimate),
+            '{0:<32} {1:<20} {2:>8} {3:>10} {4:>7}'.format('Instrument',
+                    'Command', 'Count', 'Time (s)', 'Share'),
+        ]
+        for stat in estimate['cost_centers'][:top]:
+            lines.append('{instrument:<32} {command:<20} {count:>8} '
+                    '{time:>10.2f} {share:>7.1%}'.format(**stat))
+        return '\n'.join(lines)
+
+    #############
+    ## Private ##
+    #############
+
+    def _command_stats(self):
+        stats = []
+        for key, histogram in list(self._metrics.histograms.items()):
+            instrument, command = key
+            time = histogram.count * self.latency(command)
+            if not command.startswith('pb_'):
+                time += self.latencies['VISA_BYTE'] * (
+                        self._metrics.bytes_sent[key] +
+                        self._metrics.bytes_received[key])
+            stats.append({
+                'instrument': instrument,
+                'command': command,
+                'count': histogram.count,
+                'time': time,
+            })
+        return stats
+
+def load_latencies(path):
+    """Loads a latency table.
+
+    Parameters:
+      - path (str): Path to either a JSON object mapping command types to
+        latencies in seconds, or a transcript recorded with
+        `instrument.replay.record`, in which case the mean latency of each
+        command type is used. Recorded latencies already include the time
+        to transfer each command, so 'VISA_BYTE' is then 0.
+
+    Returns:
+      - dict[str -> float]: Latency of each command type.
+    """
+    with open(path) as f:
+        try:
+            return {str(command): float(latency)
+                    for command, latency in json.load(f).items()}
+        except ValueError:
+            # Transcripts hold a JSON object per line.
+            pass
+    # Imported here, so that VISA is only imported for transcripts.
+    from instrument.replay import load_transcript
+    totals = {}
+    for entry in load_transcript(path):
+        if entry['op'] == 'read_stb':
+            command = 'STB'
+        elif entry['op'] in ('write', 'query'):
+            command = command_type(entry['data'])
+        else:
+            # Service request waits aren't commands.
+            continue
+        total, count = totals.get(command, (0.0, 0))
+        totals[command] = (total + entry['dt'], count + 1)
+    latencies = {command: total / count
+            for command, (total, count) in totals.items()}
+    latencies['VISA_BYTE'] = 0.0
+    return latencies
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{0}:{1:02d}:{2:02d}'.format(hours, minutes, seconds)
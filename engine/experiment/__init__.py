@@ -3,18 +3,41 @@
 """
 import re
 
-__all__ = ['Experiment', 'Parameter', 'IntParameter']
+from importlib.machinery import SourceFileLoader
+
+import numpy as np
+
+__all__ = [
+    'Experiment',
+    'Parameter',
+    'IntParameter',
+    'RangeParameter',
+    'GridParameter',
+]
 
 class Experiment(object):
     data_points = []
     instruments = {}
     parameters = {}
+    engine = None
 
     def __init__(self, **kwargs):
         for param_name, param in self.parameters.items():
             setattr(self, param_name, param.parameterize(kwargs[param_name]))
         for instr_name, instr in self.instruments.items():
-            pass
+            setattr(self, instr_name, instr)
+
+    def sweep(self, points):
+        """Iterates over the points of a sweep. Experiments should loop over
+        their sweep points with this method, so that the engine can record
+        progress and resume interrupted runs.
+
+        Parameters:
+          - points (iterable): Sweep points.
+        """
+        if self.engine is None:
+            return iter(points)
+        return self.engine.sweep(points)
 
     def setup(self):
         raise NotImplementedError
@@ -43,7 +66,8 @@ class Parameter(object):
 
     def parameterize(self, param):
         param_val = self.str_to_param_value(param)
-        self.is_valid(param_val)
+        if not self.is_valid(param_val):
+            raise ParameterError('"{0}" parameter value "{1}" is invalid.'.format(self.name, param))
         return param_val
 
     def is_valid(self, param_value):
@@ -154,6 +178,101 @@ class OptionParameter(Parameter):
     def str_to_param_value(self, param):
         return param
 
+class RangeParameter(Parameter):
+    """A sweep range parameter.
+
+    A Parameter which parses a sweep range ('start:stop:num',
+    'start:stop:num:log') or list of points ('a,b,c') into a lazy sweep space
+    (see `experiment.sweep`), which can be iterated over with
+    `Experiment.sweep`. The bounds of the range are checked against a minimum
+    and maximum bound without computing every point.
+
+    Instance Attributes:
+        name: [inherited]
+        min: A numerical value specifying the minimum bound.
+        max: A numerical value specifying the maximum bound.
+    """
+    def __init__(self, name, min=float('-inf'), max=float('inf')):
+        Parameter.__init__(self, name)
+        self.min = min
+        self.max = max
+
+    def is_valid(self, param_value):
+        lower, upper = param_value.bounds()
+        return self.min <= lower and upper <= self.max
+
+    def str_to_param_value(self, param):
+        space = _to_space(self.name, param)
+        if isinstance(space, _sweep().SweepGrid):
+            raise ParameterError('"{0}" parameter value "{1}" has more than one axis.'.format(self.name, param))
+        return space
+
+class GridParameter(Parameter):
+    """A sweep grid parameter.
+
+    A Parameter which parses a grid of sweep ranges or lists, one per axis,
+    separated by ';' (e.g. '2.8e9:2.9e9:101;0:10:11'), into a lazy
+    `experiment.sweep.SweepGrid`. The bounds of each axis are checked against
+    the minimum and maximum bounds without computing every point.
+
+    Instance Attributes:
+        name: [inherited]
+        min: A numerical value, or one per axis, specifying the minimum bound.
+        max: A numerical value, or one per axis, specifying the maximum bound.
+        num_axes: The number of axes of the grid, or None if any number of
+            axes is valid.
+    """
+    def __init__(self, name, min=float('-inf'), max=float('inf'), num_axes=None):
+        Parameter.__init__(self, name)
+        self.min = min
+        self.max = max
+        self.num_axes = num_axes
+
+    def is_valid(self, param_value):
+        if self.num_axes is not None and len(param_value.axes) != self.num_axes:
+            return False
+        lower, upper = param_value.bounds()
+        return bool(np.all(self.min <= lower) and np.all(upper <= self.max))
+
+    def str_to_param_value(self, param):
+        space = _to_space(self.name, param)
+        if not isinstance(space, _sweep().SweepGrid):
+            space = _sweep().SweepGrid([space])
+        return space
+
+def load_experiment(path):
+    """Loads an experiment class from an experiment file.
+
+    We use SourceFileLoader to load an experiment from an arbitrary filepath.
+    The class used to run the experiment is specified by the module's
+    `__experiment__` variable.
+
+    Parameters:
+      - path (str): Path to an experiment file.
+
+    Returns:
+      - type: The `__experiment__` class of the experiment file.
+    """
+    module = SourceFileLoader('experiment_src', path).load_module()
+    return module.__experiment__
+
+def _sweep():
+    # Imported lazily, since the sweep module imports this package.
+    import experiment.sweep
+    return experiment.sweep
+
+def _to_space(name, param):
+    """Converts a parameter value to a sweep space."""
+    sweep = _sweep()
+    if isinstance(param, (sweep.SweepRange, sweep.SweepList, sweep.SweepGrid)):
+        return param
+    if not isinstance(param, str):
+        return sweep.SweepList(param)
+    try:
+        return sweep.parse_space(param)
+    except ExperimentError as e:
+        raise ParameterError('Could not convert "{0}" parameter value "{1}" to a sweep: {2}'.format(name, param, e))
+
 class ParameterError(Exception):
     pass
 
@@ -0,0 +1,33 @@
+import numpy as np
+
+from experiment import *
+from experiment.lock_in import LockInExperiment
+from experiment.sweep import AdaptiveSweep
+
+class AdaptiveLockInExperiment(LockInExperiment):
+    """Lock-in sweep which samples the baseline coarsely, and spends the rest
+    of its `num_samples` budget refining the sweep near resonances.
+    """
+
+    parameters = dict(LockInExperiment.parameters, **{
+        'num_initial': IntParameter('Number of Initial Samples', min=2),
+    })
+
+    def run(self):
+        sweep = AdaptiveSweep(self.lower_freq, self.upper_freq,
+                self.num_samples, self.num_initial)
+        # Points measured before a resumed run was interrupted are fed back,
+        # so that the sweep refines the same intervals again.
+        data = self.engine.data.to_array()
+        if len(data):
+            sweep.record_all(data[:, 0], np.hypot(data[:, 1], data[:, 2]))
+        for freq in self.sweep(sweep):
+            x, y = self.measure(freq)
+            sweep.record(freq, np.hypot(x, y))
+
+    @staticmethod
+    def analyze(data):
+        # Points are measured out of order, so sort them before plotting.
+        LockInExperiment.analyze(data[np.argsort(data[:, 0])])
+
+__experiment__ = AdaptiveLockInExperiment
@@ -1,21 +1,23 @@
 import numpy as np
 import matplotlib.pylab as plt
-import time
 
+from analysis.lockin import to_polar
 from experiment import *
 from instrument.daq.sr830 import SR830
 from instrument.mwfreqsynth.hp8673c import HP8673C
 from instrument.pulseblaster.pulseblasteresrpro import PulseBlasterESRPRO
 
+BUFFER_SIZE = 16383  # Number of points each buffer of the SR830 holds.
+
 class LockInExperiment(Experiment):
     # Bad idea? Only one set of instrument for a class of experiments
     # Why not put in __init__?
     instruments = {
         'daq': SR830(
-            address='',
+            address='GPIB0::8::INSTR',
         ),
-        'mwfs': HP8673(
-            address='',
+        'mwfs': HP8673C(
+            address='GPIB0::19::INSTR',
         ),
         'pb': PulseBlasterESRPRO(
             clock_freq=100.0,
@@ -24,19 +26,32 @@ class LockInExperiment(Experiment):
     }
 
     parameters = {
-        'lower_freq': IntParmeter('Lower Frequency'),
-        'upper_freq': IntParmeter('Upper Frequency'),
-        'num_samples': IntParmeter('Number of Samples')
+        'lower_freq': IntParameter('Lower Frequency'),
+        'upper_freq': IntParameter('Upper Frequency'),
+        'num_samples': IntParameter('Number of Samples')
     }
 
-    def setup(self, engine):
+    def setup(self):
         # SR830 Setup
         self.daq.set_trigger_mode(1)        # TSTR 1
         self.daq.set_output_interface(1)    # OUTX 1
+        # Each trigger stores X and Y in the lock-in's buffers, so that the
+        # next point can be set up and triggered as soon as a point is
+        # stored, and measured while the point is read back.
+        self.daq.set_display(1, 0)          # DDEF 1,0,0
+        self.daq.set_display(2, 0)          # DDEF 2,0,0
+        self.daq.set_sample_rate(14)        # SRAT 14
+        self.daq.set_buffer_mode(0)         # SEND 0
+        self.daq.reset_buffer()             # REST
+        self.daq.start_buffer()             # STRT
+        self.num_stored = 0
+        # Trigger of the next point, pending while the last one is read.
+        self.pending = None
 
         # HP8673C Setup
         self.mwfs.set_amp(1)                # AP {num} DM
         self.mwfs.set_freq(1)               # FR {num} MZ
+        self.freq = 1
 
         # PulseBlaster Setup
         self.pb.start_programming('PULSE_PROGRAM')
@@ -46,27 +61,91 @@ class LockInExperiment(Experiment):
 
         self.pb.stop_programming()
 
-    def run(self, engine):
-        for i, freq in enumerate(np.linspace(self.lower_freq, self.upper_freq, self.num_samples)):
-            # Change Frequency
-            mwfs.set_freq(freq)
-            time.sleep(.2)
+        # Points are paced against absolute deadlines, so that the time spent
+        # measuring each point doesn't add up.
+        self.clock = self.engine.sweep_clock(.2)
+
+    def run(self):
+        # Sweeping with `self.sweep` lets the engine resume an interrupted run.
+        freqs = np.linspace(self.lower_freq, self.upper_freq, self.num_samples)
+        next_freqs = list(freqs[1:]) + [None]
+        for freq, next_freq in self.sweep(zip(freqs, next_freqs)):
+            self.measure(freq, next_freq)
+
+    def measure(self, freq, next_freq=None):
+        """Measures a single point of the sweep.
+
+        Parameters:
+          - freq (float): Frequency of the point.
+          - next_freq (float): Frequency of the next point, if already known.
+            The next point is triggered as soon as this one is stored, and
+            this one is read back while the next is measured.
+
+        Returns:
+          - tuple: The X and Y outputs of the lock-in.
+        """
+        # The previous point may already have triggered this one.
+        if self.pending is None:
+            self.trigger(freq)
+        # The point is stored as soon as the lock-in reports the trigger
+        # complete, without reading the outputs in between.
+        self.pending.result()
+        self.pending = None
+        self.pb.stop()
+        # The buffers stop storing points once full, so the next point is
+        # only triggered once they have been reset.
+        if next_freq is not None and self.num_stored + 1 < BUFFER_SIZE:
+            self.trigger(next_freq)
+        values = self.read_point()
+        # Data is a list of inputs paired with outputs.
+        # ...eventually there will be a cleaner way to do this.
+        self.engine.data.append((freq, values))
+        return values
+
+    def trigger(self, freq):
+        """Triggers a point of the sweep without waiting for it to be stored.
+        Its completion is kept in `pending`.
+
+        Parameters:
+          - freq (float): Frequency of the point.
+        """
+        # Change Frequency, unless the previous point already did.
+        if freq != self.freq:
+            self.mwfs.set_freq(freq)
+            self.freq = freq
+        self.clock.tick()
+
+        # Collect Data
+        self.pb.start()
+        self.pending = self.daq.trigger_pipelined()
+
+    def read_point(self):
+        """Reads back the point last stored in the lock-in's buffers.
 
-            # Collect Data
-            pulseblaster.start()
-            daq.trigger()
-            # Data is a list of inputs paired with outputs.
-            # ...eventually there will be a cleaner way to do this.
-            engine.data.append((freq, daq.get_values(1, 2)))
-            pulseblaster.stop()
+        Returns:
+          - tuple: The X and Y outputs of the lock-in.
+        """
+        values = tuple(self.daq.read_buffer(channel, self.num_stored, 1)[0]
+                for channel in (1, 2))
+        self.num_stored += 1
+        # The buffers stop storing points once full.
+        if self.num_stored == BUFFER_SIZE:
+            self.daq.reset_buffer()
+            self.daq.start_buffer()
+            self.num_stored = 0
+        return values
 
     @staticmethod
     def analyze(data):
-        frequencies = np.asarray([data[0] for data in engine.data])
-        out1 = np.asarray([data[0][0] for data in engine.data])
-        out2 = np.asarray([data[0][1] for data in engine.data])
+        # Data is an array with one row per point: (freq, X, Y).
+        frequencies = data[:, 0]
+        x, y = data[:, 1], data[:, 2]
+        r, theta = to_polar(x, y)
 
-        plt.plot(frequencies, out1, frequencies, out2)
+        plt.subplot(2, 1, 1)
+        plt.plot(frequencies, x, frequencies, y, frequencies, r)
+        plt.subplot(2, 1, 2)
+        plt.plot(frequencies, theta)
         plt.show()
 
 __experiment__ = LockInExperiment
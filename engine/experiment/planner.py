@@ -0,0 +1,190 @@
+"""
+Scan Planner Module
+
+Orders the points of multi-dimensional scans (e.g. frequency x power x pulse
+length) to minimize the time spent changing instrument settings between
+points, instead of scanning them in nested-loop order.
+
+Each axis is given a cost model (`AxisCost`): a fixed cost for every change
+of the axis, such as settling time or reloading a PulseBlaster program, and a
+cost proportional to how far the axis moves, such as synthesizer settling
+after a large frequency jump. The planner then:
+  - Scans each axis in increasing order of its values.
+  - Reverses the direction of each axis on every pass (snake, or
+    boustrophedon, ordering), so axes never jump back to their start.
+  - Reorders the axes, so that the most expensive axes change least often.
+
+Points are still associated with their index in the original grid, so that
+data can be written back to the correct grid positions.
+
+Importable:
+  - AxisCost
+  - ScanPlan
+  - plan_scan
+"""
+
+import itertools
+
+import numpy as np
+
+from experiment import ExperimentError
+from experiment.sweep import CHUNK_SIZE
+
+__all__ = ['AxisCost', 'ScanPlan', 'plan_scan']
+
+class AxisCost(object):
+    """Cost of changing the value of an axis between consecutive points.
+
+    Parameters:
+      - change (float): Cost of any change of the axis, e.g. settling or
+        program reload time, in seconds.
+      - per_unit (float): Additional cost per unit the axis moves, in seconds.
+
+    Instance Attributes:
+      - change (float)
+      - per_unit (float)
+    """
+
+    def __init__(self, change=0.0, per_unit=0.0):
+        self.change = change
+        self.per_unit = per_unit
+
+class ScanPlan(object):
+    """An order of the points of a grid.
+
+    Iterating over a plan yields `(index, point)` pairs, where `index` is the
+    flat index of the point in the grid (in C order), so that experiments can
+    iterate over a plan with `Experiment.sweep` and store each point in its
+    grid position. Points are computed a chunk at a time.
+
+    Parameters:
+      - grid (SweepGrid): Grid to scan.
+      - order (sequence[int]): Axes of the grid, from the slowest to the
+        fastest changing.
+      - snake (bool): Whether axes reverse direction on every pass.
+
+    Instance Attributes:
+      - grid (SweepGrid)
+      - order (tuple[int])
+      - snake (bool)
+    """
+
+    def __init__(self, grid, order, snake=True):
+        if sorted(order) != list(range(len(grid.axes))):
+            raise ExperimentError(
+                    'Invalid scan order {0} for a grid with {1} axes.'.format(
+                            order, len(grid.axes)))
+        self.grid = grid
+        self.order = tuple(order)
+        self.snake = snake
+        # Values of each axis, and their indices sorted in increasing order.
+        self._values = [axis.to_array() for axis in grid.axes]
+        self._sorted = [np.argsort(values, kind='stable')
+                for values in self._values]
+
+    def cost(self, costs):
+        """Returns the total cost of changing axes over the scan.
+
+        Parameters:
+          - costs (sequence[AxisCost]): Cost model of each axis of the grid.
+
+        Returns:
+          - float: Total cost, in seconds.
+        """
+        total = 0.0
+        num_passes = 1
+        for axis in self.order:
+            cost = costs[axis] or AxisCost()
+            values = self._values[axis]
+            size = len(values)
+            span = values.max() - values.min()
+            # The axis is scanned once for every combination of the slower
+            # axes, and moves back to its start between passes unless snaking.
+            num_changes = num_passes * (size - 1)
+            distance = num_passes * span
+            if not self.snake and size > 1:
+                num_changes += num_passes - 1
+                distance += (num_passes - 1) * span
+            total += cost.change * num_changes + cost.per_unit * distance
+            num_passes *= size
+        return total
+
+    def flat_indices(self, begin, end):
+        """Returns the grid indices of the points in `[begin, end)` of the
+        scan, as flat indices.
+        """
+        position = np.arange(begin, min(end, len(self)))
+        shape = tuple(self.grid.shape[axis] for axis in self.order)
+        digits = np.unravel_index(position, shape)
+        grid_digits = [None] * len(shape)
+        num_passes = np.zeros_like(position)
+        for axis, size, digit in zip(self.order, shape, digits):
+            # Number of passes over the axis before this point, i.e. of
+            # changes of the slower axes.
+            passes, num_passes = num_passes, num_passes * size + digit
+            if self.snake:
+                # Reverse the axis on odd passes.
+                digit = np.where(passes % 2, size - 1 - digit, digit)
+            grid_digits[axis] = self._sorted[axis][digit]
+        return np.ravel_multi_index(grid_digits, self.grid.shape)
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """Iterates over the scan in chunks of up to `chunk_size` points.
+
+        Returns:
+          - generator[tuple[np.ndarray]]: Yields arrays of the flat grid
+            indices of the points, and of the points, as (points, axes) arrays.
+        """
+        for begin in range(0, len(self), chunk_size):
+            indices = self.flat_indices(begin, begin + chunk_size)
+            digits = np.unravel_index(indices, self.grid.shape)
+            points = np.column_stack([values[digit]
+                    for values, digit in zip(self._values, digits)])
+            yield indices, points
+
+    def to_grid(self, values):
+        """Places values measured in scan order at their grid positions.
+
+        Parameters:
+          - values (array-like): One value (or row of values) per point, in
+            scan order.
+
+        Returns:
+          - np.ndarray: Values with the shape of the grid (plus the shape of
+            each row of values).
+        """
+        values = np.asarray(values)
+        grid = np.empty((len(self),) + values.shape[1:], dtype=values.dtype)
+        for begin in range(0, len(self), CHUNK_SIZE):
+            end = begin + CHUNK_SIZE
+            grid[self.flat_indices(begin, end)] = values[begin:end]
+        return grid.reshape(self.grid.shape + values.shape[1:])
+
+    def __len__(self):
+        return len(self.grid)
+
+    def __iter__(self):
+        for indices, points in self.chunks():
+            for index, point in zip(indices.tolist(), points.tolist()):
+                yield index, tuple(point)
+
+def plan_scan(grid, costs, snake=True):
+    """Plans the order of a scan over a grid, minimizing the cost of changing
+    axes between points. Every order of the axes is tried, so grids should
+    have few axes.
+
+    Parameters:
+      - grid (SweepGrid): Grid to scan.
+      - costs (sequence[AxisCost]): Cost model of each axis of the grid. None
+        for axes that are free to change.
+      - snake (bool): Whether axes may reverse direction on every pass.
+
+    Returns:
+      - ScanPlan: The cheapest plan.
+    """
+    if len(costs) != len(grid.axes):
+        raise ExperimentError('Expected {0} axis costs, got {1}.'.format(
+                len(grid.axes), len(costs)))
+    plans = [ScanPlan(grid, order, snake)
+            for order in itertools.permutations(range(len(grid.axes)))]
+    return min(plans, key=lambda plan: plan.cost(costs))
@@ -0,0 +1,545 @@
+"""
+Sweep Module
+
+Sweep point generators for experiments, to be iterated over with
+`Experiment.sweep`.
+
+Sweep spaces (`SweepRange`, `SweepList` and `SweepGrid`) are lazy: points are
+computed as they are iterated over, or a chunk at a time as NumPy arrays, so
+that large grids are never materialized in memory. They are usually created
+from experiment parameters, with `parse_space`:
+  - 'start:stop:num': `num` points spaced linearly from `start` to `stop`.
+  - 'start:stop:num:log': `num` points spaced logarithmically.
+  - 'a,b,c': A list of points.
+  - 'space;space;...': A grid over several axes, e.g. '1:2:11;0,5'.
+
+Importable:
+  - AdaptiveSweep
+  - HardwareSweep
+  - SweepRange
+  - SweepList
+  - SweepGrid
+  - parse_space
+"""
+
+import time
+
+import numpy as np
+
+from experiment import ExperimentError
+from instrument import InstrumentError
+
+__all__ = [
+    'AdaptiveSweep',
+    'HardwareSweep',
+    'SweepRange',
+    'SweepList',
+    'SweepGrid',
+    'parse_space',
+]
+
+CHUNK_SIZE = 65536
+
+class SweepRange(object):
+    """Points spaced linearly or logarithmically between two endpoints, both
+    included, like `np.linspace` and `np.geomspace`.
+
+    Parameters:
+      - start (float): First point.
+      - stop (float): Last point.
+      - num (int): Number of points.
+      - log (bool): Whether points are spaced logarithmically.
+
+    Instance Attributes:
+      - start (float)
+      - stop (float)
+      - num (int)
+      - log (bool)
+    """
+
+    def __init__(self, start, stop, num, log=False):
+        if num < 1:
+            raise ExperimentError('A sweep range needs at least 1 point.')
+        if log and (start <= 0 or stop <= 0):
+            raise ExperimentError(
+                    'A logarithmic sweep range must have positive endpoints.')
+        self.start = start
+        self.stop = stop
+        self.num = num
+        self.log = log
+
+    def bounds(self):
+        """Returns the smallest and largest points, without computing every
+        point.
+        """
+        return min(self.start, self.stop), max(self.start, self.stop)
+
+    def chunk(self, begin, end):
+        """Returns the points with indices in `[begin, end)` as an array."""
+        index = np.arange(begin, min(end, self.num), dtype=float)
+        if self.log:
+            start, stop = np.log10(self.start), np.log10(self.stop)
+        else:
+            start, stop = self.start, self.stop
+        step = (stop - start) / (self.num - 1) if self.num > 1 else 0.0
+        points = start + index * step
+        if len(index) and index[-1] == self.num - 1:
+            points[-1] = stop
+        if self.log:
+            points = 10 ** points
+            if len(index) and index[0] == 0:
+                points[0] = self.start
+            if len(index) and index[-1] == self.num - 1:
+                points[-1] = self.stop
+        return points
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        """Iterates over the points in chunks of up to `chunk_size` points.
+        """
+        for begin in range(0, self.num, chunk_size):
+            yield self.chunk(begin, begin + chunk_size)
+
+    def to_array(self):
+        return self.chunk(0, self.num)
+
+    def __len__(self):
+        return self.num
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            for point in chunk.tolist():
+                yield point
+
+class SweepList(object):
+    """An explicit list of points.
+
+    Parameters:
+      - points (sequence[float]): Points of the sweep.
+
+    Instance Attributes:
+      - points (np.ndarray)
+    """
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=float).ravel()
+        if not len(self.points):
+            raise ExperimentError('A sweep list needs at least 1 point.')
+
+    def bounds(self):
+        return self.points.min(), self.points.max()
+
+    def chunk(self, begin, end):
+        return self.points[begin:end]
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        for begin in range(0, len(self.points), chunk_size):
+            yield self.chunk(begin, begin + chunk_size)
+
+    def to_array(self):
+        return self.points
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        return iter(self.points.tolist())
+
+class SweepGrid(object):
+    """The grid of every combination of the points of several axes. The last
+    axis varies fastest.
+
+    Points are computed from their flat index a chunk at a time, so the grid
+    is never materialized in memory.
+
+    Parameters:
+      - axes (sequence[SweepRange/SweepList]): Axes of the grid.
+
+    Instance Attributes:
+      - axes (list): Axes of the grid.
+      - shape (tuple[int]): Number of points along each axis.
+    """
+
+    def __init__(self, axes):
+        self.axes = list(axes)
+        self.shape = tuple(len(axis) for axis in self.axes)
+
+    def bounds(self):
+        """Returns the smallest and largest point of each axis.
+
+        Returns:
+          - tuple[np.ndarray]: Arrays of lower and upper bounds, one value per
+            axis.
+        """
+        bounds = np.array([axis.bounds() for axis in self.axes], dtype=float)
+        return bounds[:, 0], bounds[:, 1]
+
+    def chunk(self, begin, end):
+        """Returns the points with flat indices in `[begin, end)`, as a
+        (points, axes) array.
+        """
+        index = np.arange(begin, min(end, len(self)))
+        columns = []
+        for axis, axis_index in zip(self.axes,
+                np.unravel_index(index, self.shape)):
+            # Only compute the span of the axis covered by the chunk.
+            if len(axis_index):
+                lower, upper = axis_index.min(), axis_index.max() + 1
+                columns.append(axis.chunk(lower, upper)[axis_index - lower])
+            else:
+                columns.append(np.empty(0))
+        return np.column_stack(columns)
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        for begin in range(0, len(self), chunk_size):
+            yield self.chunk(begin, begin + chunk_size)
+
+    def to_array(self):
+        return self.chunk(0, len(self))
+
+    def __len__(self):
+        return int(np.prod(self.shape, dtype=np.int64))
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            for point in chunk.tolist():
+                yield tuple(point)
+
+def parse_space(text):
+    """Parses a sweep space. See the module docstring for the syntax.
+
+    Parameters:
+      - text (str): A sweep space, e.g. '2.8e9:2.9e9:1001'.
+
+    Returns:
+      - SweepRange/SweepList/SweepGrid: The sweep space. A grid is returned
+        if and only if `text` contains a ';'.
+    """
+    if ';' in text:
+        return SweepGrid(parse_space(axis) for axis in text.split(';'))
+    try:
+        if ':' in text:
+            fields = [field.strip() for field in text.split(':')]
+            log = fields[-1].lower() == 'log'
+            if log:
+                fields = fields[:-1]
+            if len(fields) != 3:
+                raise ValueError
+            return SweepRange(float(fields[0]), float(fields[1]),
+                    int(fields[2]), log)
+        return SweepList([float(point) for point in text.split(',')])
+    except ValueError:
+        raise ExperimentError('Invalid sweep space: "{0}"'.format(text))
+
+class AdaptiveSweep(object):
+    """Adaptive 1D sweep, which refines the sweep near spectral features.
+
+    The sweep starts with a coarse, uniform pass. It then repeatedly inserts
+    points in the middle of the intervals where the measured signal changes
+    the most, i.e. where its gradient or curvature is large, until the point
+    budget is used up. Flat baseline is only sampled coarsely.
+
+    The measured signal must be recorded with `record` for every point before
+    the next point is requested:
+
+        sweep = AdaptiveSweep(lower_freq, upper_freq, num_points)
+        for freq in self.sweep(sweep):
+            sweep.record(freq, measure(freq))
+
+    Points are refined in passes. Each pass yields its points in increasing
+    order, to limit how far instruments have to jump between points.
+
+    Parameters:
+      - lower (float): Lower bound of the sweep.
+      - upper (float): Upper bound of the sweep.
+      - num_points (int): Total number of points in the sweep.
+      - num_initial (int): Number of points in the initial, uniform pass.
+        Defaults to a quarter of `num_points`.
+      - batch_size (int): Maximum number of points added per refinement pass.
+        Defaults to a tenth of `num_points`.
+      - min_spacing (float): Intervals narrower than this are never split.
+      - curvature_weight (float): Weight of the curvature of the signal,
+        relative to its gradient, when choosing intervals to refine.
+
+    Instance Attributes:
+      - lower (float)
+      - upper (float)
+      - num_points (int)
+      - num_initial (int)
+      - batch_size (int)
+      - min_spacing (float)
+      - curvature_weight (float)
+    """
+
+    def __init__(self, lower, upper, num_points, num_initial=None,
+            batch_size=None, min_spacing=0.0, curvature_weight=1.0):
+        if num_initial is None:
+            num_initial = max(num_points // 4, 3)
+        if batch_size is None:
+            batch_size = max(num_points // 10, 1)
+        if not 2 <= num_initial <= num_points:
+            raise ExperimentError(
+                    'The initial pass must have between 2 and {0} points.'.format(
+                            num_points))
+        self.lower = lower
+        self.upper = upper
+        self.num_points = num_points
+        self.num_initial = num_initial
+        self.batch_size = batch_size
+        self.min_spacing = min_spacing
+        self.curvature_weight = curvature_weight
+        self._values = {}
+
+    def record(self, point, value):
+        """Records the signal measured at a point.
+
+        Parameters:
+          - point (float): A point yielded by the sweep.
+          - value (float): Signal measured at the point.
+        """
+        self._values[point] = float(value)
+
+    def record_all(self, points, values):
+        """Records the signal at several points at once, e.g. to restore the
+        points measured before a resumed run was interrupted.
+
+        Parameters:
+          - points (array-like): Points yielded by the sweep.
+          - values (array-like): Signal measured at each point.
+        """
+        for point, value in zip(np.asarray(points).tolist(),
+                np.asarray(values).tolist()):
+            self._values[point] = value
+
+    @property
+    def points(self):
+        """Points measured so far, in increasing order."""
+        return np.array(sorted(self._values))
+
+    @property
+    def values(self):
+        """Signal measured at each point of `points`."""
+        return np.array([self._values[point] for point in sorted(self._values)])
+
+    def __iter__(self):
+        batch = np.linspace(self.lower, self.upper, self.num_initial)
+        # Only points yielded so far are used for refining, so that values fed
+        # with `record_all` don't change the order of a resumed sweep.
+        yielded = []
+        while len(batch):
+            for point in batch.tolist():
+                yield point
+                if point not in self._values:
+                    raise ExperimentError(
+                            'No signal recorded for sweep point {0}.'.format(point))
+                yielded.append(point)
+            batch = self._refine(sorted(yielded))
+
+    def _refine(self, points):
+        """Returns the midpoints of the intervals that most need refining."""
+        num_new = min(self.num_points - len(points), self.batch_size)
+        if num_new <= 0:
+            return np.empty(0)
+        x = np.array(points)
+        y = np.array([self._values[point] for point in points])
+        scores = self._scores(x, y)
+        scores[np.diff(x) < 2 * self.min_spacing] = -1
+        num_new = min(num_new, int(np.count_nonzero(scores >= 0)))
+        if num_new == 0:
+            return np.empty(0)
+        intervals = np.argpartition(-scores, num_new - 1)[:num_new]
+        intervals.sort()
+        return (x[intervals] + x[intervals + 1]) / 2
+
+    def _scores(self, x, y):
+        """Scores each interval between neighbouring points by how much the
+        signal changes over it. Both axes are normalized to [0, 1] first, so
+        that the scores don't depend on units.
+        """
+        dx = np.diff(x) / (self.upper - self.lower)
+        y_range = np.ptp(y)
+        dy = np.diff(y) / (y_range if y_range > 0 else 1.0)
+        # Curvature at each interior point, as the change in slope, spread to
+        # the intervals on either side of it.
+        slope = dy / dx
+        curvature = np.zeros(len(dx) + 1)
+        curvature[1:-1] = np.abs(np.diff(slope))
+        curvature = np.maximum(curvature[:-1], curvature[1:])
+        # An interval's width keeps flat regions from being starved entirely.
+        return dx + np.abs(dy) + self.curvature_weight * dx * curvature
+
+class HardwareSweep(object):
+    """Frequency sweep sequenced by hardware instead of Python.
+
+    The PulseBlaster generates the whole trigger train with a LOOP: at each
+    point, it waits for the synthesizer to settle, triggers the lock-in to
+    store a point in its buffers, then triggers the synthesizer to step to
+    the next frequency. Python only arms the instruments, starts the sequence
+    and bulk-reads the lock-in's buffers once it is done, so per-point timing
+    doesn't depend on software jitter or bus latency. While the sequence
+    runs, the lock-in requests service as it stores points, instead of
+    having its buffers polled.
+
+    The lock-in stores X and Y in its two buffers, so a sweep is limited to
+    the size of its buffers (16383 points).
+
+    Synthesizers that can't step through the frequencies on their trigger
+    input (see `MWFreqSynth.supports_freq_steps`), such as the HP8664A and
+    HP8673C, are stepped by Python instead: the sequence is then run a point
+    at a time, and Python sets the next frequency between points, once the
+    lock-in reports the point stored. The dwell and the lock-in's triggers
+    are still timed by the PulseBlaster, but each point also takes a round
+    trip over the bus.
+
+        sweep = HardwareSweep(self.pb, self.daq, self.mwfs, freqs, dwell=10e6,
+                daq_flags=1 << 0, synth_flags=1 << 1)
+        data = sweep.run()
+
+    Parameters:
+      - pb (PulseBlaster): PulseBlaster generating the triggers.
+      - daq (SR830): Lock-in storing a point on each trigger.
+      - synth (MWFreqSynth): Synthesizer stepping through the frequencies on
+        each trigger, or set to each frequency by Python if it doesn't
+        support `arm_freq_steps`.
+      - freqs (sequence[float]): Frequencies of the sweep.
+      - dwell (float): Time the synthesizer settles for at each point before
+        the lock-in is triggered, in nanoseconds.
+      - daq_flags (int): PulseBlaster flags wired to the lock-in's trigger
+        input.
+      - synth_flags (int): PulseBlaster flags wired to the synthesizer's
+        trigger input. Unused if the synthesizer is stepped by Python.
+      - pulse_length (float): Length of the trigger pulses, in nanoseconds.
+      - wait_for_trigger (bool): Whether the sequence waits for a hardware
+        trigger of the PulseBlaster (e.g. line sync) once started, or before
+        each point if the synthesizer is stepped by Python.
+
+    Instance Attributes:
+      - freqs (np.ndarray)
+      - dwell (float)
+      - pulse_length (float)
+      - host_stepped (bool): Whether the synthesizer is stepped by Python.
+    """
+
+    def __init__(self, pb, daq, synth, freqs, dwell, daq_flags, synth_flags,
+            pulse_length=1e3, wait_for_trigger=False):
+        self.pb = pb
+        self.daq = daq
+        self.synth = synth
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.dwell = dwell
+        self.daq_flags = daq_flags
+        self.synth_flags = synth_flags
+        self.pulse_length = pulse_length
+        self.wait_for_trigger = wait_for_trigger
+        self.host_stepped = not synth.supports_freq_steps
+
+    @property
+    def duration(self):
+        """Expected duration of the sweep once triggered, in seconds."""
+        return len(self.freqs) * (self.dwell + 2 * self.pulse_length) * 1e-9
+
+    def run(self, timeout=None):
+        """Arms the instruments, runs the sweep and reads back the results.
+
+        Parameters:
+          - timeout (float): See `wait`.
+
+        Returns:
+          - np.ndarray: See `read`.
+        """
+        self.arm()
+        self.start()
+        self.wait(timeout)
+        return self.read()
+
+    def arm(self):
+        """Programs the PulseBlaster, and arms the lock-in and synthesizer."""
+        if self.host_stepped:
+            self.synth.set_freq(self.freqs[0])
+        else:
+            self.synth.arm_freq_steps(self.freqs)
+
+        # Store X in buffer 1 and Y in buffer 2, a point per trigger.
+        self.daq.set_display(1, 0)
+        self.daq.set_display(2, 0)
+        self.daq.set_sample_rate(14)
+        self.daq.set_buffer_mode(0)
+        self.daq.set_trigger_mode(0)
+        self.daq.reset_buffer()
+        self.daq.enable_data_ready()
+
+        self.pb.stop()
+        self.pb.start_programming('PULSE_PROGRAM')
+        if self.wait_for_trigger:
+            # WAIT cannot be the first instruction of a program.
+            self.pb.continue_inst(0, 'ON', self.pulse_length)
+            self.pb.wait_inst(0, 'ON', self.pulse_length)
+        if self.host_stepped:
+            # A single point, run again for every frequency.
+            self.pb.continue_inst(0, 'ON', self.dwell)
+            self.pb.continue_inst(self.daq_flags, 'ON', self.pulse_length)
+        else:
+            loop = self.pb.loop_inst(0, 'ON', self.dwell, len(self.freqs))
+            self.pb.continue_inst(self.daq_flags, 'ON', self.pulse_length)
+            self.pb.end_loop_inst(self.synth_flags, 'ON', self.pulse_length,
+                    loop)
+        self.pb.stop_inst(0, 'ON', self.pulse_length)
+        self.pb.stop_programming()
+
+        self.daq.start_buffer()
+
+    def start(self):
+        """Starts the sequence."""
+        self.pb.start()
+
+    def wait(self, timeout=None):
+        """Waits for the lock-in to store every point of the sweep.
+
+        Parameters:
+          - timeout (float): Maximum time to wait, in seconds. Defaults to
+            twice the expected duration of the sweep, plus a second. Waits
+            indefinitely for a hardware trigger if `wait_for_trigger` is set
+            and no timeout is given.
+        """
+        if timeout is None and not self.wait_for_trigger:
+            timeout = 2 * self.duration + 1.0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.host_stepped:
+            for num_points, freq in enumerate(self.freqs[1:].tolist(), 1):
+                self._wait_points(num_points, deadline)
+                self.pb.stop()
+                self.synth.set_freq(freq)
+                self.pb.start()
+        self._wait_points(len(self.freqs), deadline)
+        self.daq.pause_buffer()
+        self.pb.stop()
+
+    def read(self):
+        """Reads back the points stored by the lock-in.
+
+        Returns:
+          - np.ndarray: A (points, 3) array of rows `(freq, X, Y)`.
+        """
+        num_points = len(self.freqs)
+        x = self.daq.read_buffer(1, 0, num_points)
+        y = self.daq.read_buffer(2, 0, num_points)
+        return np.column_stack([self.freqs, x, y])
+
+    def _wait_points(self, num_points, deadline):
+        """Waits for the lock-in to have stored a number of points, until a
+        monotonic deadline, if any.
+        """
+        # The number of points stored is only read again once the lock-in
+        # reports a new point. Points stored while it is being read request
+        # service again, so none are missed.
+        while self.daq.get_num_points() < num_points:
+            remaining = None if deadline is None else max(
+                    deadline - time.monotonic(), 0.0)
+            try:
+                self.daq.wait_data_ready(remaining)
+            except InstrumentError:
+                if deadline is None or time.monotonic() < deadline:
+                    raise
+                self.pb.stop()
+                raise InstrumentError(
+                        'Hardware sweep timed out after {0} of {1} points.'.format(
+                                self.daq.get_num_points(), len(self.freqs)))
@@ -0,0 +1,87 @@
+from experiment.sweep import HardwareSweep
+from instrument import InstrumentError
+from instrument.mwfreqsynth import MWFreqSynth
+from instrument.simulated import SimulatedPulseBlaster, SimulatedSR830, SimulatedSynth
+import unittest
+
+import numpy as np
+
+DAQ_FLAGS = 1 << 0
+SYNTH_FLAGS = 1 << 1
+
+class TestHardwareSweep(unittest.TestCase):
+    def setUp(self):
+        self.pb = SimulatedPulseBlaster()
+        self.synth = SimulatedSynth()
+        # The lock-in measures X = freq, Y = -freq, so that each stored point
+        # shows which frequency the synthesizer was at when it was triggered.
+        self.daq = SimulatedSR830(
+                source=lambda: (self.synth.freq, -self.synth.freq))
+        self.daq._connect()
+        self.pb.connect_output(DAQ_FLAGS, self.daq.trigger_input)
+        self.pb.connect_output(SYNTH_FLAGS, self.synth.trigger_input)
+        self.freqs = np.linspace(2.8e9, 2.9e9, 11)
+
+    def sweep(self, **kwargs):
+        return HardwareSweep(self.pb, self.daq, self.synth, self.freqs,
+                dwell=1e6, daq_flags=DAQ_FLAGS, synth_flags=SYNTH_FLAGS,
+                **kwargs)
+
+    def test_run(self):
+        sweep = self.sweep()
+        data = sweep.run()
+        np.testing.assert_array_equal(data[:, 0], self.freqs)
+        np.testing.assert_array_equal(data[:, 1], self.freqs)
+        np.testing.assert_array_equal(data[:, 2], -self.freqs)
+        self.assertAlmostEqual(self.pb.time * 1e-9, sweep.duration, places=5)
+
+    def test_wait_for_trigger(self):
+        sweep = self.sweep(wait_for_trigger=True)
+        sweep.arm()
+        sweep.start()
+        self.assertEqual(self.daq.get_num_points(), 0)
+        # Hardware trigger of the PulseBlaster.
+        self.pb.start()
+        sweep.wait()
+        np.testing.assert_array_equal(sweep.read()[:, 1], self.freqs)
+
+    def test_timeout(self):
+        # Trigger the synthesizer instead of the lock-in.
+        sweep = HardwareSweep(self.pb, self.daq, self.synth, self.freqs,
+                dwell=1e6, daq_flags=SYNTH_FLAGS, synth_flags=SYNTH_FLAGS)
+        with self.assertRaises(InstrumentError):
+            sweep.run(timeout=0.01)
+
+    def test_host_stepped(self):
+        synth = HostSteppedSynth()
+        daq = SimulatedSR830(source=lambda: (synth.freq, -synth.freq))
+        daq._connect()
+        self.pb.connect_output(DAQ_FLAGS, daq.trigger_input)
+        # The synthesizer is only stepped by Python.
+        self.pb.connect_output(SYNTH_FLAGS, self.fail)
+        sweep = HardwareSweep(self.pb, daq, synth, self.freqs, dwell=1e6,
+                daq_flags=DAQ_FLAGS, synth_flags=SYNTH_FLAGS)
+        self.assertTrue(sweep.host_stepped)
+        data = sweep.run()
+        np.testing.assert_array_equal(data[:, 1], self.freqs)
+        np.testing.assert_array_equal(data[:, 2], -self.freqs)
+        self.assertEqual(synth.set_freqs, self.freqs.tolist())
+
+class HostSteppedSynth(SimulatedSynth):
+    """Synthesizer that can only be set to a frequency, like the HP8664A."""
+
+    supports_freq_steps = False
+
+    def __init__(self):
+        SimulatedSynth.__init__(self)
+        self.set_freqs = []
+
+    def set_freq(self, freq, unit=''):
+        SimulatedSynth.set_freq(self, freq, unit)
+        self.set_freqs.append(freq)
+
+    def arm_freq_steps(self, freqs):
+        MWFreqSynth.arm_freq_steps(self, freqs)
+
+if __name__ == '__main__':
+    unittest.main()
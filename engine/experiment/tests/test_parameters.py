@@ -0,0 +1,38 @@
+from experiment import GridParameter, IntParameter, ParameterError, RangeParameter
+from experiment.sweep import SweepGrid, SweepRange
+import unittest
+
+import numpy as np
+
+class TestParameters(unittest.TestCase):
+    def test_bounds(self):
+        param = IntParameter('Number of Samples', min=1)
+        self.assertEqual(param.parameterize('10'), 10)
+        with self.assertRaises(ParameterError):
+            param.parameterize('0')
+
+    def test_range_parameter(self):
+        param = RangeParameter('Frequencies', min=1e9, max=3e9)
+        space = param.parameterize('2.8e9:2.9e9:101')
+        self.assertIsInstance(space, SweepRange)
+        self.assertEqual(len(space), 101)
+        np.testing.assert_array_equal(
+                list(param.parameterize('1e9,2e9,3e9')), [1e9, 2e9, 3e9])
+        for value in ('2.8e9:3.1e9:101', '2e9,4e9', '1:2:3;1:2:3', '1:2'):
+            with self.assertRaises(ParameterError):
+                param.parameterize(value)
+
+    def test_grid_parameter(self):
+        param = GridParameter('Grid', min=[1e9, 0], max=[3e9, 10], num_axes=2)
+        grid = param.parameterize('2.8e9:2.9e9:1001;0:10:1001')
+        self.assertIsInstance(grid, SweepGrid)
+        self.assertEqual(grid.shape, (1001, 1001))
+        for value in ('2.8e9:2.9e9:11;0:11:11', '2.8e9:2.9e9:11'):
+            with self.assertRaises(ParameterError):
+                param.parameterize(value)
+        # Single axis grids are valid if the number of axes isn't fixed.
+        param = GridParameter('Grid', min=0)
+        self.assertEqual(param.parameterize('0:1:11').shape, (11,))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from experiment.planner import AxisCost, ScanPlan, plan_scan
+from experiment.sweep import SweepGrid, SweepList, SweepRange
+import unittest
+
+import numpy as np
+
+class TestScanPlanner(unittest.TestCase):
+    def setUp(self):
+        # Frequency x power x pulse length, with an unsorted list axis.
+        self.grid = SweepGrid([
+            SweepRange(2.8e9, 2.9e9, 5),
+            SweepRange(-10, 0, 3),
+            SweepList([300, 100, 200, 400]),
+        ])
+        self.costs = [
+            AxisCost(change=1e-3, per_unit=1e-9),
+            AxisCost(change=1e-2),
+            AxisCost(change=0.5),   # PulseBlaster program reload.
+        ]
+
+    def scan_cost(self, plan):
+        """Cost of the scan, summed over consecutive points."""
+        points = np.array([point for _, point in plan])
+        total = 0.0
+        for axis, cost in enumerate(self.costs):
+            moves = np.abs(np.diff(points[:, axis]))
+            total += cost.change * np.count_nonzero(moves) + cost.per_unit * moves.sum()
+        return total
+
+    def test_visits_every_point(self):
+        for snake in (True, False):
+            plan = ScanPlan(self.grid, (2, 0, 1), snake)
+            indices = [index for index, _ in plan]
+            self.assertEqual(sorted(indices), list(range(len(self.grid))))
+            grid_points = self.grid.to_array()
+            for index, point in plan:
+                self.assertEqual(tuple(grid_points[index]), point)
+
+    def test_cost(self):
+        for order in [(0, 1, 2), (2, 0, 1), (1, 2, 0)]:
+            for snake in (True, False):
+                plan = ScanPlan(self.grid, order, snake)
+                self.assertAlmostEqual(plan.cost(self.costs), self.scan_cost(plan))
+
+    def test_snake(self):
+        plan = ScanPlan(self.grid, (0, 1, 2))
+        points = np.array([point for _, point in plan])
+        # Only one axis changes between consecutive points, by a single step.
+        num_changed = np.count_nonzero(np.diff(points, axis=0), axis=1)
+        np.testing.assert_array_equal(num_changed, 1)
+
+    def test_plan_scan(self):
+        plan = plan_scan(self.grid, self.costs)
+        # The program is reloaded least often, and the power most often,
+        # since it is cheaper to step than the frequency.
+        self.assertEqual(plan.order, (2, 0, 1))
+        self.assertTrue(plan.snake)
+        naive = ScanPlan(self.grid, (0, 1, 2), snake=False)
+        self.assertLess(plan.cost(self.costs), naive.cost(self.costs))
+
+    def test_to_grid(self):
+        plan = plan_scan(self.grid, self.costs)
+        values = np.array([sum(point) for _, point in plan])
+        np.testing.assert_array_equal(plan.to_grid(values),
+                self.grid.to_array().sum(axis=1).reshape(self.grid.shape))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+from experiment import ExperimentError
+from experiment.sweep import AdaptiveSweep, SweepGrid, SweepList, SweepRange, parse_space
+import unittest
+
+import numpy as np
+
+class TestSweepSpaces(unittest.TestCase):
+    def test_range(self):
+        space = SweepRange(2.8e9, 2.9e9, 1001)
+        self.assertEqual(len(space), 1001)
+        np.testing.assert_array_equal(space.to_array(),
+                np.linspace(2.8e9, 2.9e9, 1001))
+        self.assertEqual(list(space), space.to_array().tolist())
+        self.assertEqual(space.bounds(), (2.8e9, 2.9e9))
+
+    def test_log_range(self):
+        space = SweepRange(1e-3, 1e3, 7, log=True)
+        np.testing.assert_allclose(space.to_array(), np.geomspace(1e-3, 1e3, 7))
+        self.assertEqual(space.to_array()[[0, -1]].tolist(), [1e-3, 1e3])
+
+    def test_chunks(self):
+        space = SweepRange(0, 1, 1000)
+        chunks = list(space.chunks(64))
+        self.assertEqual([len(chunk) for chunk in chunks], [64] * 15 + [40])
+        np.testing.assert_array_equal(np.concatenate(chunks), space.to_array())
+
+    def test_grid(self):
+        grid = SweepGrid([SweepRange(0, 1, 3), SweepList([5, 6])])
+        self.assertEqual(len(grid), 6)
+        self.assertEqual(list(grid),
+                [(0, 5), (0, 6), (0.5, 5), (0.5, 6), (1, 5), (1, 6)])
+        np.testing.assert_array_equal(np.concatenate(list(grid.chunks(4))),
+                grid.to_array())
+
+    def test_large_grid(self):
+        # Computing a chunk of a billion point grid is cheap.
+        grid = parse_space('0:1:1000;0:1:1000;0:1:1000')
+        self.assertEqual(len(grid), 10 ** 9)
+        chunk = next(grid.chunks(1000))
+        np.testing.assert_array_equal(chunk[:, 2], np.linspace(0, 1, 1000))
+        np.testing.assert_array_equal(chunk[:, :2], 0)
+
+    def test_parse_space(self):
+        self.assertIsInstance(parse_space('1:2:3'), SweepRange)
+        self.assertTrue(parse_space('1:100:3:log').log)
+        self.assertEqual(list(parse_space('1, 2.5, 3')), [1, 2.5, 3])
+        self.assertEqual(parse_space('1:2:3;4,5').shape, (3, 2))
+        for text in ('1:2', '1:2:x', 'a,b', '1:2:3:lin'):
+            with self.assertRaises(ExperimentError):
+                parse_space(text)
+
+class TestAdaptiveSweep(unittest.TestCase):
+    def lorentzian(self, x):
+        # Narrow resonance on a flat baseline.
+        return 1 / (1 + ((x - 2.87e9) / 2e6) ** 2)
+
+    def run_sweep(self, sweep, signal):
+        points = []
+        for point in sweep:
+            points.append(point)
+            sweep.record(point, signal(point))
+        return np.array(points)
+
+    def test_point_budget(self):
+        sweep = AdaptiveSweep(2.7e9, 3.0e9, 100, num_initial=20)
+        points = self.run_sweep(sweep, self.lorentzian)
+        self.assertEqual(len(points), 100)
+        self.assertEqual(len(np.unique(points)), 100)
+        np.testing.assert_array_equal(points[:20], np.linspace(2.7e9, 3.0e9, 20))
+        np.testing.assert_array_equal(sweep.points, np.sort(points))
+
+    def test_refines_near_feature(self):
+        sweep = AdaptiveSweep(2.7e9, 3.0e9, 100, num_initial=20)
+        points = self.run_sweep(sweep, self.lorentzian)
+        near = np.abs(points - 2.87e9) < 15e6
+        # The feature covers a tenth of the sweep, but gets most of the points.
+        self.assertGreater(np.count_nonzero(near), 50)
+
+    def test_min_spacing(self):
+        sweep = AdaptiveSweep(0.0, 1.0, 1000, num_initial=11, min_spacing=0.01)
+        points = self.run_sweep(sweep, lambda x: float(x > 0.5))
+        self.assertLess(len(points), 1000)
+        self.assertGreaterEqual(np.diff(sweep.points).min(), 0.01)
+
+    def test_missing_record(self):
+        sweep = AdaptiveSweep(0.0, 1.0, 10, num_initial=5)
+        points = iter(sweep)
+        next(points)
+        with self.assertRaises(ExperimentError):
+            next(points)
+
+    def test_record_all(self):
+        # A sweep fed the points of an interrupted sweep continues the same
+        # way as the original.
+        sweep = AdaptiveSweep(2.7e9, 3.0e9, 60, num_initial=20)
+        points = self.run_sweep(sweep, self.lorentzian)
+        resumed = AdaptiveSweep(2.7e9, 3.0e9, 60, num_initial=20)
+        resumed.record_all(points[:40], self.lorentzian(points[:40]))
+        np.testing.assert_array_equal(
+                self.run_sweep(resumed, self.lorentzian), points)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,9 +24,10 @@ class Instrument(object):
       - _id (int): Instrument ID, for identification.
 
     Class Attributes:
-      - engine (Engine): 
+      - engine (Engine): Engine running the instrument, once connected.
       - num_instruments (int): Number of instruments instantiated.
     """
+    engine = None
     num_instruments = 0
 
     def __init__(self):
@@ -8,9 +8,19 @@ Importable:
 from instrument import *
 from instrument.daq import *
 from instrument.lib.visainstrument import *
-import visa
+from functools import partial
+
+STB_LIA = 1 << 3    # Serial poll status: an enabled LIA status bit is set.
+LIA_TRIG = 1 << 6   # LIA status: a point was stored on a trigger.
 
 class SR830(DAQ, VisaInstrument):
+    # A Group Execute Trigger has the same effect as `TRIG`.
+    supports_get = True
+
+    def _connect(self):
+        VisaInstrument._connect(self)
+        self._data_ready_enabled = False
+
     def _reset(self):
         self.reset_inst()
 
@@ -29,7 +39,7 @@ class SR830(DAQ, VisaInstrument):
         self._write('*RST')
 
     def get_error_status_inst(self):
-        return int(self._write('ERRS?'))
+        return int(self._read('ERRS?'))
 
     @VisaInstrument.check_error
     def set_trigger_mode(self, mode):
@@ -56,3 +66,106 @@ class SR830(DAQ, VisaInstrument):
         vals = self._read('SNAP ? {0},{1}{2}'.format(ch1, ch2, args))
         return [float(val) for val in vals.split(',')]
 
+
+    ###########################
+    ## SR830 Buffer Commands ##
+    ###########################
+
+    # The SR830 can store points in its buffers (one per display channel) at a
+    # fixed rate, or on every trigger, so that a whole sweep can be read back
+    # at once instead of a point at a time.
+
+    @VisaInstrument.check_error
+    def set_display(self, channel, display, ratio=0):
+        self._write('DDEF {0},{1},{2}'.format(channel, display, ratio))
+
+    @VisaInstrument.check_error
+    def set_sample_rate(self, rate):
+        # Rate 14 stores a point on every trigger.
+        self._write('SRAT {0}'.format(rate))
+
+    @VisaInstrument.check_error
+    def set_buffer_mode(self, mode):
+        # Mode 0 stops at the end of the buffer, mode 1 loops.
+        self._write('SEND {0}'.format(mode))
+
+    @VisaInstrument.check_error
+    def start_buffer(self):
+        self._write('STRT')
+
+    @VisaInstrument.check_error
+    def pause_buffer(self):
+        self._write('PAUS')
+
+    @VisaInstrument.check_error
+    def reset_buffer(self):
+        self._write('REST')
+
+    @VisaInstrument.check_error
+    def get_num_points(self):
+        return int(self._read('SPTS?'))
+
+    @VisaInstrument.check_error
+    def read_buffer(self, channel, start, num_points):
+        vals = self._read('TRCA ? {0},{1},{2}'.format(
+                channel, start, num_points))
+        return [float(val) for val in vals.split(',') if val.strip()]
+
+    def trigger_pipelined(self, *channels):
+        """Triggers a measurement without waiting for it to complete.
+
+        Parameters:
+          - channels (int): Channels to read once the measurement completes,
+            as in `get_values`. If none are given, nothing is read.
+
+        Returns:
+          - concurrent.futures.Future: Completes with the values of the
+            channels once the measurement completes.
+        """
+        fetch = partial(self.get_values, *channels) if channels else None
+        return self._write_opc('TRIG', fetch)
+
+    def enable_data_ready(self):
+        """Enables service requests on points stored on a trigger (sample
+        rate 14), and clears any point already reported, so that
+        `wait_data_ready` only returns for points stored from now on.
+        """
+        self._enable_data_ready()
+        self._read('LIAS? 6')
+
+    def wait_data_ready(self, timeout=None):
+        """Waits for the lock-in to store a point on a trigger (sample rate
+        14), by blocking on a service request instead of polling `SPTS?`.
+
+        Parameters:
+          - timeout (float): Maximum time to wait, in seconds. Waits
+            indefinitely if None.
+        """
+        self._enable_data_ready()
+        self._wait_srq(STB_LIA, timeout)
+        # Reading the TRIG bit clears it, and with it the LIA bit.
+        self._read('LIAS? 6')
+
+    def _enable_data_ready(self):
+        if not self._data_ready_enabled:
+            # The TRIG bit of the LIA status register sets the LIA bit of
+            # the status byte, which requests service.
+            self._write('LIAE {0}'.format(LIA_TRIG))
+            self._enable_srq(STB_LIA)
+            self._data_ready_enabled = True
+
+    ##########################
+    ## SR830 Async Commands ##
+    ##########################
+
+    # Coroutine versions of the commands above, which can overlap with I/O on
+    # other buses, e.g. `await asyncio.gather(daq.aget_values(1, 2), ...)`.
+
+    async def atrigger(self):
+        await self._acall(self.trigger)
+
+    async def aget_value(self, channel):
+        return await self._acall(self.get_value, channel)
+
+    async def aget_values(self, ch1, ch2, *args):
+        return await self._acall(self.get_values, ch1, ch2, *args)
@@ -29,8 +29,12 @@ class CInstrument(Instrument):
 
     Class Attributes:
       - _lib (CLibrary):
+      - dll_factory (callable): Called with the path to a DLL file to load
+        it. Defaults to `ctypes.CDLL`. Can be replaced to swap in a simulated
+        library (see `instrument.simulated`).
         ...
     """
+    dll_factory = None
 
     @classmethod
     def loadDLL(cls, libpath, functions):
@@ -44,7 +48,7 @@ class CInstrument(Instrument):
             names mapped to `restype`, `argtypes` pairs
         """
         try:
-            cls._lib = ctypes.CDLL(libpath)
+            cls._lib = (cls.dll_factory or ctypes.CDLL)(libpath)
         except OSError as e:
             raise InstrumentError("cannot load file at '{0}': {1}".format(libpath, e.args[0]))
         # TODO(Jeffrey): It would probably be nice to actually wrap the
@@ -0,0 +1,223 @@
+"""
+Metrics Module
+
+Latency metrics of instrument commands. Every command sent to an instrument
+(a VISA read or write, or a SpinAPI call) is recorded in a histogram per
+instrument and command type, along with the number of round trips and bytes
+sent and received, so that the time spent on each kind of command in a run
+can be broken down, e.g. to see how much of a sweep goes to `ERRS?` checks.
+
+Histograms have fixed, logarithmically spaced buckets, so that recording a
+command is a bisection and a few additions, and memory use doesn't grow with
+the number of commands.
+
+Commands are recorded to `METRICS`, which the engine resets at the start of
+each run. Commands can be recorded from any thread, e.g. by the threads
+waiting on instruments' service requests.
+
+Importable:
+  - LatencyHistogram
+  - Metrics
+  - METRICS
+  - command_type
+  - format_stats
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+__all__ = ['LatencyHistogram', 'Metrics', 'METRICS', 'command_type',
+        'format_stats']
+
+# Upper edges of the histogram buckets, in seconds: 4 per decade from 1us to
+# 10s. The last bucket holds everything slower.
+BUCKET_EDGES = tuple(10 ** (k / 4) for k in range(-24, 5))
+
+class LatencyHistogram(object):
+    """Histogram of latencies, with fixed buckets (`BUCKET_EDGES`).
+
+    Instance Attributes:
+      - counts (list[int]): Number of latencies in each bucket.
+      - count (int): Number of latencies recorded.
+      - total (float): Sum of the latencies recorded, in seconds.
+      - min (float): Smallest latency recorded, in seconds.
+      - max (float): Largest latency recorded, in seconds.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Returns an upper bound of a percentile of the latencies, i.e. the
+        upper edge of the bucket it falls in.
+
+        Parameters:
+          - q (float): Percentile, from 0 to 100.
+
+        Returns:
+          - float: Latency, in seconds.
+        """
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        cumulative = 0
+        for edge, count in zip(BUCKET_EDGES, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(edge, self.max)
+        return self.max
+
+class Metrics(object):
+    """Latency metrics of instrument commands, by instrument and command
+    type. Can be queried at any time, including while commands are being
+    recorded.
+
+    Parameters:
+      - clock (callable): Clock the elapsed time is measured with, in
+        seconds.
+
+    Instance Attributes:
+      - histograms (dict[tuple[str, str] -> LatencyHistogram]): Latencies by
+        `(instrument, command)`.
+      - bytes_sent (dict[tuple[str, str] -> int]): Bytes sent by
+        `(instrument, command)`.
+      - bytes_received (dict[tuple[str, str] -> int]): Bytes received by
+        `(instrument, command)`.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears all metrics, and restarts the elapsed time."""
+        with self._lock:
+            self.histograms = {}
+            self.bytes_sent = {}
+            self.bytes_received = {}
+            self._start = self._clock()
+            self._stop = None
+
+    def stop(self):
+        """Stops the elapsed time, e.g. at the end of a run."""
+        self._stop = self._clock()
+
+    @property
+    def elapsed(self):
+        """Time since the metrics were reset (until they were stopped), in
+        seconds.
+        """
+        return (self._stop or self._clock()) - self._start
+
+    def record(self, instrument, command, seconds, bytes_sent=0,
+            bytes_received=0):
+        """Records a command round trip.
+
+        Parameters:
+          - instrument (str): Name of the instrument.
+          - command (str): Command type, e.g. from `command_type`.
+          - seconds (float): Latency of the command.
+          - bytes_sent (int): Number of bytes sent.
+          - bytes_received (int): Number of bytes received.
+        """
+        key = (instrument, command)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+                self.bytes_sent[key] = 0
+                self.bytes_received[key] = 0
+            histogram.record(seconds)
+            self.bytes_sent[key] += bytes_sent
+            self.bytes_received[key] += bytes_received
+
+    def stats(self):
+        """Returns statistics of each instrument and command type.
+
+        Returns:
+          - list[dict]: Statistics, from the command type that took the most
+            time in total to the least. Times are in seconds. 'share' is the
+            fraction of the elapsed time spent on the command type.
+        """
+        elapsed = self.elapsed
+        stats = []
+        with self._lock:
+            for key, histogram in self.histograms.items():
+                stats.append({
+                    'instrument': key[0],
+                    'command': key[1],
+                    'round_trips': histogram.count,
+                    'total': histogram.total,
+                    'mean': histogram.mean,
+                    'p50': histogram.percentile(50),
+                    'p99': histogram.percentile(99),
+                    'max': histogram.max,
+                    'bytes_sent': self.bytes_sent[key],
+                    'bytes_received': self.bytes_received[key],
+                    'share': histogram.total / elapsed if elapsed > 0 else 0.0,
+                })
+        stats.sort(key=lambda stat: stat['total'], reverse=True)
+        return stats
+
+    def report(self):
+        """Returns the statistics as a table.
+
+        Returns:
+          - str: One line per instrument and command type.
+        """
+        return format_stats(self.stats())
+
+def format_stats(stats):
+    """Formats statistics returned by `Metrics.stats` as a table.
+
+    Returns:
+      - str: One line per instrument and command type.
+    """
+    lines = ['{0:<32} {1:<20} {2:>8} {3:>10} {4:>10} {5:>10} {6:>7}'.format(
+            'Instrument', 'Command', 'Trips', 'Mean (ms)', 'P99 (ms)',
+            'Bytes', 'Share')]
+    for stat in stats:
+        lines.append('{instrument:<32} {command:<20} {round_trips:>8} '
+                '{mean_ms:>10.3f} {p99_ms:>10.3f} {bytes:>10} '
+                '{share:>7.1%}'.format(
+                        mean_ms=stat['mean'] * 1e3,
+                        p99_ms=stat['p99'] * 1e3,
+                        bytes=stat['bytes_sent'] + stat['bytes_received'],
+                        **stat))
+    return '\n'.join(lines)
+
+@functools.lru_cache(maxsize=1024)
+def command_type(instruction):
+    """Returns the type of an instruction: the headers of its commands,
+    followed by '?' for queries, without their arguments. e.g. 'OUTP?' for
+    'OUTP ? 1', or 'FREQ;*OPC' for 'FREQ 2.8 GHZ;*OPC'.
+    """
+    types = []
+    for command in instruction.split(';'):
+        header = command.replace('?', ' ').split(None, 1)
+        if header:
+            types.append(header[0].upper() + ('?' if '?' in command else ''))
+    return ';'.join(types)
+
+# Metrics all instrument commands are recorded to.
+METRICS = Metrics()
@@ -0,0 +1,83 @@
+from instrument.lib.metrics import (LatencyHistogram, Metrics, METRICS,
+        command_type, format_stats)
+from instrument.lib.tests.test_visainstrument import DummyVisaResourceManager, SimpleVisaInstrument
+from instrument.lib.visainstrument import VisaInstrument
+import unittest
+
+import threading
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for _ in range(99):
+            histogram.record(1e-3)
+        histogram.record(0.5)
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.mean, (99e-3 + 0.5) / 100)
+        self.assertAlmostEqual(histogram.percentile(50), 1e-3)
+        self.assertAlmostEqual(histogram.percentile(100), 0.5)
+        # Latencies beyond the last bucket are bounded by the maximum.
+        histogram.record(100.0)
+        self.assertEqual(histogram.percentile(100), 100.0)
+        self.assertEqual(LatencyHistogram().percentile(50), 0.0)
+
+class TestMetrics(unittest.TestCase):
+    def test_command_type(self):
+        self.assertEqual(command_type('OUTP ? 1'), 'OUTP?')
+        self.assertEqual(command_type('SYST:ERR? NUM'), 'SYST:ERR?')
+        self.assertEqual(command_type('freq 2.8 GHZ;*OPC'), 'FREQ;*OPC')
+
+    def test_stats(self):
+        now = [0.0]
+        metrics = Metrics(clock=lambda: now[0])
+        metrics.record('SR830', 'ERRS?', 0.4, 6, 2)
+        metrics.record('SR830', 'SNAP?', 0.1, 10, 20)
+        metrics.record('SR830', 'ERRS?', 0.4, 6, 2)
+        now[0] = 2.0
+        metrics.stop()
+        now[0] = 3.0
+        stats = metrics.stats()
+        self.assertEqual([stat['command'] for stat in stats], ['ERRS?', 'SNAP?'])
+        self.assertEqual(stats[0]['round_trips'], 2)
+        self.assertEqual((stats[0]['bytes_sent'], stats[0]['bytes_received']),
+                (12, 4))
+        self.assertAlmostEqual(stats[0]['share'], 0.4)
+        self.assertIn('ERRS?', metrics.report())
+        self.assertEqual(format_stats(stats), metrics.report())
+        metrics.reset()
+        self.assertEqual(metrics.stats(), [])
+
+    def test_concurrent_record(self):
+        metrics = Metrics()
+        def record():
+            for _ in range(10000):
+                metrics.record('SR830', 'STB', 1e-3, 0, 1)
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = metrics.stats()
+        self.assertEqual(stats[0]['round_trips'], 40000)
+        self.assertEqual(stats[0]['bytes_received'], 40000)
+
+    def test_visa_instrument(self):
+        VisaInstrument.resource_manager_factory = DummyVisaResourceManager
+        try:
+            METRICS.reset()
+            instr = SimpleVisaInstrument(address='GPIB0::3::INSTR')
+            instr._connect()
+            instr._resource.query_vals['test query instruction'] = '1.5'
+            instr.test_query_instruction()
+            instr._write('WRITE 1')
+        finally:
+            VisaInstrument.resource_manager_factory = None
+        stats = {stat['command']: stat for stat in METRICS.stats()}
+        self.assertEqual(stats['WRITE']['round_trips'], 1)
+        self.assertEqual(stats['WRITE']['bytes_sent'], len('WRITE 1'))
+        self.assertEqual(stats['WRITE']['instrument'],
+                'SimpleVisaInstrument(GPIB0::3::INSTR)')
+        self.assertEqual(stats['TEST']['bytes_received'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
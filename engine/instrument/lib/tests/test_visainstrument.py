@@ -1,18 +1,21 @@
-from instrument.lib.visainstrument import VisaInstrument
+from instrument import InstrumentError
+from instrument.lib.visainstrument import STB_ESB, VisaInstrument, visa
 import unittest
 
 from collections import defaultdict
-import importlib
-import visa
+import asyncio
+import threading
+import time
+
+STB_LIA = 1 << 3
 
 class TestVisaInstrumentCommunication(unittest.TestCase):
     def setUp(self):
-        # Modify visa interface so that we don't need actual hardware.
-        visa.ResourceManager = DummyVisaResourceManager
+        # Open dummy resources so that we don't need actual hardware.
+        VisaInstrument.resource_manager_factory = DummyVisaResourceManager
 
     def tearDown(self):
-        # Reload visa library after running tests.
-        importlib.reload(visa)
+        VisaInstrument.resource_manager_factory = None
 
     def test_visa_instrument_communication(self):
         # Initialize a SimpleVisaInstrument
@@ -45,6 +48,168 @@ class TestVisaInstrumentCommunication(unittest.TestCase):
         # Disconnect instrument
         instr._disconnect()
 
+class TestVisaInstrumentAsync(unittest.TestCase):
+    def setUp(self):
+        VisaInstrument.resource_manager_factory = DummyVisaResourceManager
+
+    def tearDown(self):
+        VisaInstrument.resource_manager_factory = None
+
+    def connect(self, address):
+        instr = SimpleVisaInstrument(address=address)
+        instr._connect()
+        instr._resource = SlowResource(address)
+        return instr
+
+    def test_async_communication(self):
+        instr = self.connect('GPIB0::1::INSTR')
+        resource = instr._resource
+
+        asyncio.run(instr._aread('read instruction'))
+        self.assertEqual(resource.get_last_instruction(), 'read instruction')
+        asyncio.run(instr._awrite('write instruction'))
+        self.assertEqual(resource.get_last_instruction(), 'write instruction')
+
+        instr._disconnect()
+
+    def test_separate_buses_overlap(self):
+        lockin = self.connect('GPIB0::8::INSTR')
+        synth = self.connect('GPIB1::19::INSTR')
+
+        async def read_both():
+            await asyncio.gather(lockin._aread('A'), synth._aread('B'))
+
+        start = time.monotonic()
+        asyncio.run(read_both())
+        self.assertLess(time.monotonic() - start, 2 * SlowResource.delay)
+
+    def test_shared_bus_serializes(self):
+        instrs = [self.connect('GPIB0::{0}::INSTR'.format(i)) for i in range(3)]
+        active = []
+        num_active = [0]
+
+        async def read_all():
+            await asyncio.gather(*[instr._aread('A') for instr in instrs])
+
+        # Count the queries in progress across every resource on the bus.
+        for instr in instrs:
+            instr._resource.active = active
+            instr._resource.num_active = num_active
+        # Synchronous calls also wait for the bus.
+        thread = threading.Thread(target=instrs[0]._read, args=('B',))
+        thread.start()
+        asyncio.run(read_all())
+        thread.join()
+        self.assertEqual(max(active), 1)
+
+class TestVisaInstrumentPipelining(unittest.TestCase):
+    def setUp(self):
+        VisaInstrument.resource_manager_factory = DummyVisaResourceManager
+
+    def tearDown(self):
+        VisaInstrument.resource_manager_factory = None
+
+    def connect(self, address):
+        instr = SimpleVisaInstrument(address=address)
+        instr._connect()
+        instr._resource = OPCResource(address)
+        return instr
+
+    def test_write_opc(self):
+        instr = self.connect('GPIB0::1::INSTR')
+        resource = instr._resource
+        resource.query_vals['DATA?'] = '1.5'
+
+        future = instr._write_opc('MEAS', lambda: float(instr._read('DATA?')))
+        # The write returns before the operation completes.
+        self.assertFalse(future.done())
+        self.assertEqual(future.result(timeout=1), 1.5)
+        self.assertIn('MEAS;*OPC', resource.writes)
+
+    def test_one_pending_operation(self):
+        instr = self.connect('GPIB0::1::INSTR')
+        first = instr._write_opc('MEAS')
+        second = instr._write_opc('MEAS')
+        self.assertTrue(first.done())
+        self.assertIsNone(second.result(timeout=1))
+
+    def test_operation_timeout(self):
+        instr = self.connect('GPIB0::1::INSTR')
+        instr.opc_timeout = 0.05
+        instr._resource.delay = 10
+        future = instr._write_opc('MEAS')
+        self.assertIsInstance(future.exception(timeout=1), InstrumentError)
+        # The status registers are cleared before the next operation.
+        instr._resource.delay = 0
+        self.assertIsNone(instr._write_opc('MEAS').result(timeout=1))
+        self.assertEqual(instr._resource.writes[-2:],
+                ['*CLS;*ESE 1', 'MEAS;*OPC'])
+
+    def test_pending_operation_timeout(self):
+        instr = self.connect('GPIB0::1::INSTR')
+        instr.opc_timeout = 0.05
+        instr._resource.delay = 0
+        fetched = threading.Event()
+        first = instr._write_opc('MEAS', fetched.wait)
+        with self.assertRaises(InstrumentError):
+            instr._write_opc('MEAS')
+        self.assertIsInstance(first.exception(timeout=1), InstrumentError)
+        fetched.set()
+        self.assertIsNone(instr._write_opc('MEAS').result(timeout=1))
+        self.assertEqual(instr._resource.writes[-2:],
+                ['*CLS;*ESE 1', 'MEAS;*OPC'])
+
+    def test_single_waiter_thread(self):
+        instr = self.connect('GPIB0::29::INSTR')
+        instr._resource.delay = 0
+        for _ in range(20):
+            instr._write_opc('MEAS').result(timeout=1)
+        self.assertEqual(len([thread for thread in threading.enumerate()
+                if thread.name == 'VisaSrqWaiter-GPIB0::29::INSTR']), 1)
+
+    def test_concurrent_waits(self):
+        instr = SimpleVisaInstrument(address='GPIB0::1::INSTR')
+        instr._connect()
+        resource = instr._resource = SRQResource('GPIB0::1::INSTR')
+        instr._enable_srq(STB_ESB | STB_LIA)
+        results = {}
+
+        def wait(*masks):
+            threads = [threading.Thread(target=lambda mask=mask:
+                    results.__setitem__(mask, instr._wait_srq(mask, 5)))
+                    for mask in masks]
+            for thread in threads:
+                thread.start()
+            while len(instr._srq_waiter._pending) < len(masks):
+                time.sleep(0.001)
+            return threads
+
+        # Both waits complete from a single serial poll.
+        threads = wait(STB_ESB, STB_LIA)
+        resource.set_status(STB_ESB | STB_LIA)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {STB_ESB: 40, STB_LIA: 40})
+        self.assertEqual(resource.num_polls, 1)
+
+        # Requests for bits nobody waits on yet are kept for the next wait.
+        resource.status = 0
+        threads = wait(STB_ESB)
+        resource.set_status(STB_ESB | STB_LIA)
+        threads[0].join()
+        self.assertTrue(instr._wait_srq(STB_LIA, 0.5) & STB_LIA)
+        self.assertEqual(resource.num_polls, 2)
+        instr._disconnect()
+
+    def test_overlapping_instruments(self):
+        lockin = self.connect('GPIB0::8::INSTR')
+        synth = self.connect('GPIB0::19::INSTR')
+        start = time.monotonic()
+        futures = [lockin._write_opc('MEAS'), synth._write_opc('FREQ 1')]
+        for future in futures:
+            future.result(timeout=1)
+        self.assertLess(time.monotonic() - start, 2 * OPCResource.delay)
+
 class SimpleVisaInstrument(VisaInstrument):
     def __init__(self, **kwargs):
         VisaInstrument.__init__(self, **kwargs)
@@ -128,3 +293,104 @@ class DummyResource(object):
         self.last_instruction = None
         return instruction
 
+
+class SlowResource(DummyResource):
+    """Dummy resource that takes a while to answer queries, and records how
+    many queries are in progress at once on its bus.
+    """
+    delay = 0.1
+
+    def __init__(self, addr):
+        DummyResource.__init__(self, addr)
+        self.active = []
+        self.num_active = [0]
+
+    def query(self, instruction):
+        self.num_active[0] += 1
+        self.active.append(self.num_active[0])
+        time.sleep(self.delay)
+        self.num_active[0] -= 1
+        return DummyResource.query(self, instruction)
+
+class OPCResource(DummyResource):
+    """Dummy resource that takes a while to execute operations, and reports
+    their completion in its status byte, requesting service.
+    """
+    delay = 0.1
+
+    def __init__(self, addr):
+        DummyResource.__init__(self, addr)
+        self.writes = []
+        self.complete_time = None
+        self.esr = 0
+
+    def write(self, instruction):
+        self.writes.append(instruction)
+        if instruction.endswith('*OPC'):
+            self.complete_time = time.monotonic() + self.delay
+        return DummyResource.write(self, instruction)
+
+    def read_stb(self):
+        if (self.complete_time is not None and
+                time.monotonic() >= self.complete_time):
+            self.complete_time = None
+            self.esr |= 1
+        return 32 if self.esr else 0
+
+    def enable_event(self, event_type, mechanism):
+        pass
+
+    def wait_on_event(self, event_type, timeout):
+        complete_time = self.complete_time
+        if (complete_time is not None and
+                complete_time - time.monotonic() <= timeout / 1e3):
+            time.sleep(max(complete_time - time.monotonic(), 0))
+            return
+        time.sleep(timeout / 1e3)
+        raise visa.VisaIOError(visa.constants.StatusCode.error_timeout)
+
+    def query(self, instruction):
+        if instruction == '*ESR?':
+            esr, self.esr = self.esr, 0
+            return str(esr)
+        return DummyResource.query(self, instruction)
+
+class SRQResource(DummyResource):
+    """Dummy resource whose status byte is set by the test, and which
+    requests service whenever bits enabled with `*SRE` are set.
+    """
+
+    def __init__(self, addr):
+        DummyResource.__init__(self, addr)
+        self.status = 0
+        self.sre = 0
+        self.num_polls = 0
+        self._requests = 0
+        self._requested = threading.Condition()
+
+    def set_status(self, bits):
+        with self._requested:
+            self.status |= bits
+            if bits & self.sre:
+                self._requests += 1
+                self._requested.notify_all()
+
+    def write(self, instruction):
+        if instruction.startswith('*SRE'):
+            self.sre = int(instruction.split()[1])
+        return DummyResource.write(self, instruction)
+
+    def enable_event(self, event_type, mechanism):
+        pass
+
+    def wait_on_event(self, event_type, timeout):
+        with self._requested:
+            if not self._requested.wait_for(lambda: self._requests,
+                    timeout / 1e3):
+                raise visa.VisaIOError(
+                        visa.constants.StatusCode.error_timeout)
+            self._requests -= 1
+
+    def read_stb(self):
+        self.num_polls += 1
+        return self.status
@@ -5,19 +5,70 @@ VisaInstrument module, which contains the VisaInstrument interface, which is
 used to communicate with instruments than can be connected to using the PyVISA
 library.
 
+Instruments are grouped by bus (e.g. the GPIB card at 'GPIB0'), based on the
+prefix of their address. Communication on a bus is serialized, and the async
+methods of instruments on different buses run concurrently, so that an
+experiment can overlap I/O with e.g. `asyncio.gather`.
+
+The latency of every read and write is recorded in `METRICS` (see
+`instrument.lib.metrics`), by instrument and command type, and logged to the
+engine's `EngineLogger` while running. While tracing, each transaction, and
+any time spent waiting for the bus, is recorded as a span in `TRACER`.
+
+Instructions can also be pipelined with `_write_opc`, which returns as soon as
+the instruction is sent, along with a future that completes once the
+instrument reports the operation complete (IEEE 488.2 `*OPC`).
+
+Instead of polling, instruments are waited on with service requests (SRQ):
+`_enable_srq` enables service requests on bits of the status byte, and
+`_wait_srq` blocks until one of them is set, without sending any commands in
+the meantime. `_wait_opc` waits for an operation to complete this way, and
+pipelined operations are waited on the same way in the background.
+
+Every wait on an instrument goes through a single long-lived thread per
+instrument, which blocks on the VISA service request event, serial polls the
+instrument once per request, and completes every pending wait whose bits are
+set in the status byte. Requests for bits nobody is waiting on yet are kept
+for the next wait on them, so that concurrent waits on different bits (e.g.
+an `*OPC` and a lock-in's data ready bit) never consume each other's
+requests.
+
+Instruments on the same GPIB bus whose drivers support it (`supports_get`)
+can be triggered simultaneously by a `TriggerGroup`, with a single GPIB Group
+Execute Trigger (GET) instead of a trigger command to each instrument.
+
 Documentation for the PyVISA library can be found here:
 https://pyvisa.readthedocs.org/en/stable/
 
 Importable:
   - VisaInstrument
+  - TriggerGroup
 """
 
-import visa
+try:
+    import visa
+except ImportError:
+    # PyVISA 1.11+ only provides the `pyvisa` module.
+    import pyvisa as visa
 from instrument import *
+from instrument.lib.metrics import METRICS, command_type
+from logger import READ, WRITE
+from tracing import TRACER
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import concurrent.futures
+from functools import partial, wraps
+import asyncio
+import math
+import threading
+import time
 
-from functools import wraps
+__all__ = ['VisaInstrument', 'TriggerGroup']
 
-__all__ = ['VisaInstrument']
+STB_ESB = 1 << 5  # Event status bit of the IEEE 488.2 status byte.
+STB_RQS = 1 << 6  # Request service bit of the IEEE 488.2 status byte.
+SERVICE_REQUEST = visa.constants.EventType.service_request
+BUS_WAIT_THRESHOLD = 10e-6  # Shortest bus wait traced, in seconds.
 
 class VisaInstrument(Instrument):
     """Visa Instrument Interface.
@@ -39,29 +90,55 @@ class VisaInstrument(Instrument):
     Instance Attributes:
       - address (str):
       - _resource (visa.resource.Resource):
+      - _bus (_Bus): Bus the instrument is connected to. Set on connection.
       ...
 
     Class Attributes:
-      - _visamodule (module): Visa module used for communicating with
-        instuments. Defined to facilitate testing. Do not modify otherwise.
+      - resource_manager_factory (callable): Called with no arguments to
+        create the resource manager instruments are opened with. Defaults to
+        `visa.ResourceManager`. Can be replaced, on the class or on a single
+        instrument, to swap in simulated instruments (see
+        `instrument.simulated`).
+      - supports_get (bool): Whether the instrument triggers on a GPIB Group
+        Execute Trigger, e.g. from a `TriggerGroup`. Set by drivers.
+      - opc_timeout (float): Maximum time to wait for a pipelined operation
+        to complete, in seconds.
       ...
     """
+    resource_manager_factory = None
+    supports_get = False
+    opc_timeout = 10.0
 
     def __init__(self, address, **kwargs):
         Instrument.__init__(self, **kwargs)
         self.address = address
+        self._metrics_name = '{0}({1})'.format(type(self).__name__, address)
         self._resource = None
+        self._bus = None
+        self._opc_enabled = False
+        self._opc_pending = None
+        self._srq_mask = 0
+        self._srq_waiter = None
 
     #######################
     ## Overriden Methods ##
     #######################
 
     def _connect(self):
-        rm = visa.ResourceManager()
+        factory = self.resource_manager_factory or visa.ResourceManager
+        rm = factory()
         # What error does this raise for an invalid address?
         self._resource = rm.open_resource(self.address)
+        self._bus = _Bus.get(self.address)
+        self._opc_enabled = False
+        self._opc_pending = None
+        self._srq_mask = 0
+        self._srq_waiter = _SrqWaiter(self)
 
     def _disconnect(self):
+        if self._srq_waiter is not None:
+            self._srq_waiter.close()
+            self._srq_waiter = None
         self._resource.close()
         self._resource = None
 
@@ -86,10 +163,15 @@ class VisaInstrument(Instrument):
             raise InstrumentError('{0} is not connected.'.format(
                     self))
         try:
-            return str(self._resource.query(instruction))
+            queued = time.perf_counter()
+            with self._bus.lock:
+                start = time.perf_counter()
+                output = str(self._resource.query(instruction))
+                self._record(READ, instruction, queued, start, len(output))
+                return output
         except visa.VisaIOError as e:
             raise InstrumentError('Error reading {0} instruction ({1}): {2}'.format(
-                    self, instruction, e.message))
+                    self, instruction, e))
 
     def _write(self, instruction):
         """Writes a instruction to an instrument.
@@ -101,10 +183,246 @@ class VisaInstrument(Instrument):
             raise InstrumentError('{0} is not connected.'.format(
                     self))
         try:
-            self._resource.write(instruction)
+            queued = time.perf_counter()
+            with self._bus.lock:
+                start = time.perf_counter()
+                self._resource.write(instruction)
+                self._record(WRITE, instruction, queued, start)
         except visa.VisaIOError as e:
             raise InstrumentError('Error writing {0} instruction ({1}): {2}'.format(
-                self, instruction, e.message))
+                self, instruction, e))
+
+    def _write_opc(self, instruction, fetch=None):
+        """Writes an instruction without waiting for the instrument to execute
+        it. The instrument is asked to request service when the operation
+        completes with `*OPC`, which is waited on in the background.
+
+        Only one pipelined operation per instrument can be pending, since the
+        instrument reports the completion of all of them with a single status
+        bit. Writing another one waits for the previous operation to complete,
+        for at most `opc_timeout` seconds.
+
+        Parameters:
+          - instruction (str): instruction sequence sent to the instrument.
+          - fetch (callable): Called on the bus once the operation completes,
+            e.g. to read the measured values. Its return value is the result
+            of the returned future.
+
+        Returns:
+          - concurrent.futures.Future: Completes once the instrument has
+            executed the instruction, or fails with an `InstrumentError` if
+            it doesn't within `opc_timeout` seconds. Can be wrapped with
+            `asyncio.wrap_future`.
+        """
+        if self._resource is None:
+            raise InstrumentError('{0} is not connected.'.format(
+                    self))
+        self._prepare_opc()
+        self._enable_srq(STB_ESB)
+        with self._bus.lock:
+            future = self._srq_waiter.watch(STB_ESB, self.opc_timeout,
+                    partial(self._complete_opc, fetch))
+            self._opc_pending = future
+            self._write('{0};*OPC'.format(instruction))
+        return future
+
+    def _wait_opc(self, instruction, timeout=None):
+        """Writes an instruction, and waits for the instrument to execute
+        it, blocking on a service request rather than polling.
+
+        Parameters:
+          - instruction (str): instruction sequence sent to the instrument.
+          - timeout (float): Maximum time to wait, in seconds. Waits
+            indefinitely if None.
+        """
+        self._prepare_opc()
+        self._enable_srq(STB_ESB)
+        self._write('{0};*OPC'.format(instruction))
+        self._wait_srq(STB_ESB, timeout)
+        self._read('*ESR?')
+
+    def _enable_srq(self, mask):
+        """Enables service requests on bits of the status byte, in addition
+        to those already enabled, so that they can be waited on with
+        `_wait_srq`.
+
+        Parameters:
+          - mask (int): Bits of the status byte (IEEE 488.2 `*SRE`).
+        """
+        if self._resource is None:
+            raise InstrumentError('{0} is not connected.'.format(
+                    self))
+        if self._srq_mask | mask == self._srq_mask:
+            return
+        if not self._srq_mask:
+            try:
+                self._resource.enable_event(SERVICE_REQUEST,
+                        visa.constants.EventMechanism.queue)
+            except visa.VisaIOError as e:
+                raise InstrumentError(
+                        'Error enabling service requests of {0}: {1}'.format(
+                                self, e))
+        self._srq_mask |= mask
+        self._write('*SRE {0}'.format(self._srq_mask))
+
+    def _wait_srq(self, mask, timeout=None):
+        """Blocks until the instrument requests service with any of the bits
+        of `mask` set in its status byte. The bus isn't held while waiting,
+        so other instruments on the bus can be used meanwhile. Service
+        requests must have been enabled on the bits with `_enable_srq`.
+
+        Parameters:
+          - mask (int): Bits of the status byte to wait for.
+          - timeout (float): Maximum time to wait, in seconds. Waits
+            indefinitely if None.
+
+        Returns:
+          - int: The status byte, read by serial poll, which clears the
+            service request.
+        """
+        if self._resource is None:
+            raise InstrumentError('{0} is not connected.'.format(
+                    self))
+        future = self._srq_waiter.watch(mask, timeout)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # The waiter may be blocked on a later deadline of another wait.
+            self._srq_waiter.unwatch(future)
+            raise InstrumentError(SRQ_TIMEOUT.format(instrument=self,
+                    mask=mask, timeout=timeout))
+
+    def _prepare_opc(self):
+        """Prepares the instrument to report completed operations."""
+        if self._opc_pending is not None:
+            # Errors of the previous operation are raised by its own future.
+            try:
+                error = self._opc_pending.exception(self.opc_timeout)
+            except concurrent.futures.TimeoutError:
+                self._abandon_opc()
+                raise InstrumentError(OPC_TIMEOUT.format(instrument=self,
+                        timeout=self.opc_timeout))
+            if error is not None:
+                # The operation may still complete, so the status registers
+                # are cleared before the next one.
+                self._opc_enabled = False
+        if not self._opc_enabled:
+            # Clear the status registers, and set the event status bit (ESB)
+            # of the status byte whenever an operation completes.
+            self._write('*CLS;*ESE 1')
+            self._srq_waiter.discard(STB_ESB)
+            self._opc_enabled = True
+
+    def _abandon_opc(self):
+        """Stops waiting for the pending pipelined operation, which fails
+        with an `InstrumentError`. The status registers are cleared again
+        before the next operation, since the abandoned one may still complete.
+        """
+        future, self._opc_pending = self._opc_pending, None
+        self._opc_enabled = False
+        self._srq_waiter.unwatch(future)
+        try:
+            future.set_exception(InstrumentError(OPC_ABANDONED.format(
+                    instrument=self)))
+        except concurrent.futures.InvalidStateError:
+            # Completed in the meantime.
+            pass
+
+    def _complete_opc(self, fetch):
+        """Clears the event status bit of a completed pipelined operation,
+        and fetches its result. Called on the service request thread.
+        """
+        with self._bus.lock:
+            # Clears the event status bit, and with it the request.
+            self._read('*ESR?')
+            return fetch() if fetch is not None else None
+
+    def _read_stb(self):
+        """Reads the status byte by serial poll. Called with the bus held.
+
+        Returns:
+          - int: The status byte.
+        """
+        try:
+            start = time.perf_counter()
+            status = self._resource.read_stb()
+            end = time.perf_counter()
+            METRICS.record(self._metrics_name, 'STB', end - start,
+                    bytes_received=1)
+            TRACER.add('STB', 'visa', start, end, self._trace_args())
+        except visa.VisaIOError as e:
+            raise InstrumentError('Error polling {0}: {1}'.format(self, e))
+        return status
+
+    def _record(self, event, instruction, queued, start, bytes_received=0):
+        """Records a command in the metrics, logs it to the engine's log, and
+        traces it.
+
+        Parameters:
+          - event (int): `READ` or `WRITE`.
+          - instruction (str): instruction sequence sent to the instrument.
+          - queued (float): Time the bus was requested at.
+          - start (float): Time the bus was acquired and the command sent at.
+          - bytes_received (int): Length of the output.
+        """
+        end = time.perf_counter()
+        seconds = end - start
+        METRICS.record(self._metrics_name, command_type(instruction), seconds,
+                len(instruction), bytes_received)
+        if self.engine is not None and self.engine.logger is not None:
+            self.engine.logger.log(event, self._id,
+                    bytes_received if event == READ else len(instruction),
+                    seconds)
+        if TRACER.enabled:
+            args = self._trace_args()
+            if start - queued >= BUS_WAIT_THRESHOLD:
+                TRACER.add('bus wait', 'bus', queued, start, args)
+            args['instruction'] = instruction
+            TRACER.add(command_type(instruction), 'visa', start, end, args)
+
+    def _trace_args(self):
+        return {'instrument': self._metrics_name, 'bus': self._bus.name}
+
+    async def _aread(self, instruction):
+        """Coroutine version of `_read`, which runs on the instrument's bus
+        without blocking the event loop.
+
+        Parameters:
+          - instruction (str): instruction sequence sent to the instrument.
+
+        Output:
+          - str: Resulting output from instruction.
+        """
+        return await self._acall(self._read, instruction)
+
+    async def _awrite(self, instruction):
+        """Coroutine version of `_write`, which runs on the instrument's bus
+        without blocking the event loop.
+
+        Parameters:
+          - instruction (str): instruction sequence sent to the instrument.
+        """
+        await self._acall(self._write, instruction)
+
+    async def _acall(self, fn, *args):
+        """Calls a method of the instrument on its bus, without blocking the
+        event loop. The bus is held for the whole call, so that e.g. a command
+        and the error check of `check_error` aren't interleaved with other
+        instructions on the bus.
+
+        Parameters:
+          - fn (callable): A method of the instrument.
+          - args: Arguments passed to `fn`.
+
+        Returns:
+          - The return value of `fn`.
+        """
+        if self._resource is None:
+            raise InstrumentError('{0} is not connected.'.format(
+                    self))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._bus.executor,
+                partial(self._bus.call, fn, *args))
 
     @staticmethod
     def check_error(fn):
@@ -125,8 +443,8 @@ class VisaInstrument(Instrument):
                 fn(self, *args)
                 raise InstrumentError(NONZERO_ERROR_NO.format(
                         cls_name = type(self).__name__,
-                        fn_name = fn.__name,
-                        fn_args = ', '.join(args),
+                        fn_name = fn.__name__,
+                        fn_args = ', '.join(str(arg) for arg in args),
                         err_no = err_no,
                         err_msg = self._get_error_msg(),
                 ))
@@ -157,9 +475,337 @@ class VisaInstrument(Instrument):
         """
         raise NotImplementedError
 
+class TriggerGroup(object):
+    """Group of instruments on a GPIB bus, triggered simultaneously with a
+    single Group Execute Trigger (GET), in one bus operation, instead of a
+    trigger command to each instrument in turn.
+
+    The GET is sent through the GPIB interface of the bus (e.g.
+    'GPIB0::INTFC'), which is opened with the first instrument's resource
+    manager factory on the first trigger.
+
+    Parameters:
+      - instruments (iterable[VisaInstrument]): Connected instruments on the
+        same GPIB bus, whose drivers support GET.
+
+    Instance Attributes:
+      - instruments (tuple[VisaInstrument])
+      - address (str): Address of the interface of the bus.
+    """
+
+    def __init__(self, instruments):
+        self.instruments = tuple(instruments)
+        if not self.instruments:
+            raise InstrumentError('A trigger group needs instruments.')
+        for instrument in self.instruments:
+            if not isinstance(instrument, VisaInstrument):
+                raise InstrumentError('{0} is not a VISA instrument.'.format(
+                        instrument))
+            if not instrument.supports_get:
+                raise InstrumentError(
+                        '{0} does not support Group Execute Trigger.'.format(
+                                instrument))
+            if instrument._resource is None:
+                raise InstrumentError('{0} is not connected.'.format(
+                        instrument))
+        buses = set(instrument._bus for instrument in self.instruments)
+        if len(buses) > 1:
+            raise InstrumentError(
+                    'Instruments of a trigger group must share a bus.')
+        self._bus = buses.pop()
+        if not self._bus.name.startswith('GPIB'):
+            raise InstrumentError(
+                    'Group Execute Trigger needs a GPIB bus, not {0}.'.format(
+                            self._bus.name))
+        self.address = '{0}::INTFC'.format(self._bus.name)
+        self._metrics_name = 'TriggerGroup({0})'.format(self.address)
+        self._interface = None
+
+    def trigger(self):
+        """Triggers every instrument of the group at once."""
+        queued = time.perf_counter()
+        with self._bus.lock:
+            start = time.perf_counter()
+            try:
+                if self._interface is None:
+                    instrument = self.instruments[0]
+                    factory = (instrument.resource_manager_factory or
+                            visa.ResourceManager)
+                    self._interface = factory().open_resource(self.address)
+                self._interface.group_execute_trigger(*(instrument._resource
+                        for instrument in self.instruments))
+            except (visa.VisaIOError, ValueError) as e:
+                raise InstrumentError('Error triggering {0}: {1}'.format(
+                        self._metrics_name, e))
+            end = time.perf_counter()
+        METRICS.record(self._metrics_name, 'GET', end - start)
+        if TRACER.enabled:
+            args = {'instrument': self._metrics_name, 'bus': self._bus.name}
+            if start - queued >= BUS_WAIT_THRESHOLD:
+                TRACER.add('bus wait', 'bus', queued, start, args)
+            args['instruments'] = [str(instrument)
+                    for instrument in self.instruments]
+            TRACER.add('GET', 'visa', start, end, args)
+
+    def close(self):
+        """Closes the interface of the bus, if opened."""
+        if self._interface is not None:
+            self._interface.close()
+            self._interface = None
+
+#############
+## Private ##
+#############
+
+class _Bus(object):
+    """A bus shared by several instruments, e.g. a GPIB card.
+
+    Async calls on a bus run in order on its own thread, and every call
+    (synchronous or not) holds the bus lock, so instructions sent to
+    instruments on the same bus are never interleaved.
+
+    Instance Attributes:
+      - name (str): Name of the bus, e.g. 'GPIB0'.
+      - lock (threading.RLock): Held while communicating on the bus.
+      - executor (ThreadPoolExecutor): Single thread running async calls.
+    """
+    _buses = {}
+    _buses_lock = threading.Lock()
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.RLock()
+        self.executor = ThreadPoolExecutor(max_workers=1,
+                thread_name_prefix='VisaBus-{0}'.format(name))
+
+    @classmethod
+    def get(cls, address):
+        """Returns the bus of an instrument address, e.g. the 'GPIB0' bus for
+        'GPIB0::12::INSTR'.
+        """
+        name = address.split('::', 1)[0].upper()
+        with cls._buses_lock:
+            if name not in cls._buses:
+                cls._buses[name] = cls(name)
+            return cls._buses[name]
+
+    def call(self, fn, *args):
+        with self.lock:
+            return fn(*args)
+
+class _SrqWait(object):
+    """A pending wait on the service requests of an instrument."""
+
+    def __init__(self, mask, deadline, future, callback):
+        self.mask = mask
+        self.deadline = deadline
+        self.future = future
+        self.callback = callback
+        self.start = time.perf_counter()
+
+class _SrqWaiter(object):
+    """Waits on the service requests of an instrument on a single long-lived
+    thread, started on the first wait.
+
+    Each request is serial polled once, and the status byte is dispatched to
+    every pending wait with any of its bits set. Enabled bits that no wait
+    is pending for are kept, and complete the next wait on them, since the
+    instrument won't request service for them again until they are cleared.
+
+    Parameters:
+      - instrument (VisaInstrument): Connected instrument waited on.
+    """
+
+    def __init__(self, instrument):
+        self.instrument = instrument
+        self._pending = []
+        self._ready = []
+        self._unclaimed = 0
+        self._closed = False
+        self._changed = threading.Condition()
+        self._thread = None
+
+    def watch(self, mask, timeout=None, callback=None):
+        """Starts waiting for the instrument to request service with any of
+        the bits of `mask` set.
+
+        Parameters:
+          - mask (int): Bits of the status byte to wait for.
+          - timeout (float): Maximum time to wait, in seconds. Waits
+            indefinitely if None.
+          - callback (callable): Called with no arguments on the waiter's
+            thread once the bits are set. Its return value is the result of
+            the returned future, instead of the status byte.
+
+        Returns:
+          - concurrent.futures.Future: Completes with the status byte, or
+            the result of `callback`, or fails with an `InstrumentError` if
+            the instrument doesn't request service within `timeout`.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        wait = _SrqWait(mask, deadline, Future(), callback)
+        with self._changed:
+            if self._closed:
+                raise InstrumentError('{0} is not connected.'.format(
+                        self.instrument))
+            if self._unclaimed & mask:
+                # Completed on the waiter's thread, like any other wait.
+                self._ready.append((wait, self._unclaimed))
+                self._unclaimed &= ~mask
+            else:
+                self._pending.append(wait)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                        name='VisaSrqWaiter-{0}'.format(
+                                self.instrument.address))
+                # Waits that never complete don't keep the interpreter
+                # alive.
+                self._thread.daemon = True
+                self._thread.start()
+            self._changed.notify()
+        return wait.future
+
+    def unwatch(self, future):
+        """Stops waiting for a future returned by `watch`."""
+        with self._changed:
+            self._pending = [wait for wait in self._pending
+                    if wait.future is not future]
+
+    def discard(self, mask):
+        """Forgets requests for bits that have been cleared, e.g. by
+        `*CLS`.
+        """
+        with self._changed:
+            self._unclaimed &= ~mask
+
+    def close(self):
+        """Stops the waiter's thread. Pending waits fail."""
+        with self._changed:
+            self._closed = True
+            pending, self._pending = self._pending, []
+            self._changed.notify()
+        error = InstrumentError('{0} was disconnected.'.format(
+                self.instrument))
+        for wait in pending:
+            _set_future(wait.future, exception=error)
+
+    #############
+    ## Private ##
+    #############
+
+    def _run(self):
+        _srq_thread.active = True
+        while True:
+            with self._changed:
+                while not (self._pending or self._ready or self._closed):
+                    self._changed.wait()
+                if self._closed:
+                    return
+                ready, self._ready = self._ready, []
+                deadlines = [wait.deadline for wait in self._pending]
+            for wait, status in ready:
+                self._complete(wait, status)
+            if not deadlines:
+                continue
+            deadline = None if None in deadlines else min(deadlines)
+            try:
+                status = self._wait(deadline)
+            except InstrumentError as e:
+                with self._changed:
+                    failed, self._pending = self._pending, []
+                for wait in failed:
+                    _set_future(wait.future, exception=e)
+                continue
+            with self._changed:
+                if status is None:
+                    # Waits up to the deadline waited for have expired. An
+                    # infinite wait only times out on simulated instruments,
+                    # when nothing is left to request service.
+                    now = time.perf_counter()
+                    done = [wait for wait in self._pending
+                            if deadline is None or (wait.deadline is not None
+                                    and wait.deadline <= max(deadline, now))]
+                else:
+                    done = [wait for wait in self._pending
+                            if status & wait.mask]
+                    claimed = 0
+                    for wait in done:
+                        claimed |= wait.mask
+                    self._unclaimed |= (status & self.instrument._srq_mask &
+                            ~claimed)
+                self._pending = [wait for wait in self._pending
+                        if wait not in done]
+            for wait in done:
+                if status is None:
+                    _set_future(wait.future, exception=InstrumentError(
+                            SRQ_TIMEOUT.format(instrument=self.instrument,
+                                    mask=wait.mask,
+                                    timeout=wait.deadline - wait.start
+                                    if wait.deadline is not None else None)))
+                else:
+                    self._complete(wait, status)
+
+    def _wait(self, deadline):
+        """Waits for a service request, and serial polls the instrument.
+
+        Returns:
+          - int: The status byte, or None if no service was requested before
+            the deadline.
+        """
+        instrument = self.instrument
+        if deadline is None:
+            timeout_ms = visa.constants.VI_TMO_INFINITE
+        else:
+            timeout_ms = max(int(math.ceil(
+                    (deadline - time.perf_counter()) * 1e3)), 0)
+        try:
+            instrument._resource.wait_on_event(SERVICE_REQUEST, timeout_ms)
+        except visa.VisaIOError as e:
+            if e.error_code == visa.constants.StatusCode.error_timeout:
+                return None
+            raise InstrumentError('Error waiting on {0}: {1}'.format(
+                    instrument, e))
+        with instrument._bus.lock:
+            return instrument._read_stb()
+
+    def _complete(self, wait, status):
+        if wait.future.done():
+            # Abandoned.
+            return
+        TRACER.add('srq wait', 'visa', wait.start,
+                args=self.instrument._trace_args())
+        try:
+            result = wait.callback() if wait.callback is not None else status
+        except Exception as e:
+            _set_future(wait.future, exception=e)
+        else:
+            _set_future(wait.future, result)
+
+def _set_future(future, result=None, exception=None):
+    """Completes a future, unless it has been abandoned in the meantime."""
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except concurrent.futures.InvalidStateError:
+        pass
+
+def _on_srq_thread():
+    """Returns whether the current thread waits on service requests, e.g.
+    so that transcripts can record its commands separately.
+    """
+    return getattr(_srq_thread, 'active', False)
+
+# Marks the threads of `_SrqWaiter`s.
+_srq_thread = threading.local()
+
 ##########################
 ## Error String Formats ##
 ##########################
 
 NONZERO_ERROR_NO = '{fn_name}({fn_args}) resulted in {cls_name} error ({err_no}): {err_msg}'
+SRQ_TIMEOUT = '{instrument} did not request service on status bits {mask:#x} within {timeout}s.'
+OPC_TIMEOUT = 'The pending operation of {instrument} did not complete within {timeout}s.'
+OPC_ABANDONED = 'The pending operation of {instrument} was abandoned.'
 
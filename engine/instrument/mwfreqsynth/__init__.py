@@ -11,6 +11,9 @@ from instrument import *
 __all__ = ['MWFreqSynth']
 
 class MWFreqSynth(Instrument):
+    # Whether the synthesizer supports `arm_freq_steps`.
+    supports_freq_steps = False
+
     def get_power(self):
         raise NotImplemented()
 
@@ -23,3 +26,19 @@ class MWFreqSynth(Instrument):
     def set_freq(self, freq, unit):
         raise NotImplemented()
 
+    def arm_freq_steps(self, freqs):
+        """Arms the synthesizer to step through a list of frequencies, moving
+        to the next frequency on every external trigger. The synthesizer
+        starts at the first frequency.
+
+        Only supported if `supports_freq_steps` is set. Neither the HP8664A
+        nor the HP8673C can step through a list of frequencies on its trigger
+        input.
+
+        Parameters:
+          - freqs (sequence[float]): Frequencies of the sweep.
+        """
+        raise NotImplementedError(
+                '{0} cannot step through frequencies on a trigger.'.format(
+                        type(self).__name__))
+
@@ -12,7 +12,7 @@ Importable:
 from instrument import *
 from instrument.mwfreqsynth import *
 from instrument.lib.visainstrument import *
-import visa
+from instrument.lib.visainstrument import NONZERO_ERROR_NO
 
 __all__ = ['HP8664A']
 
@@ -34,7 +34,7 @@ class HP8664A(MWFreqSynth, VisaInstrument):
     #######################
 
     def _reset(self):
-        set_presets_inst(self)
+        self.set_presets_inst()
 
     def get_power(self):
         return self.get_amp_inst()
@@ -48,6 +48,18 @@ class HP8664A(MWFreqSynth, VisaInstrument):
     def set_freq(self, freq, unit=''):
         self.set_freq_inst(freq, unit)
 
+    async def aget_freq(self):
+        return await self._acall(self.get_freq)
+
+    async def aset_freq(self, freq, unit=''):
+        await self._acall(self.set_freq, freq, unit)
+
+    async def aget_power(self):
+        return await self._acall(self.get_power)
+
+    async def aset_power(self, power, unit=''):
+        await self._acall(self.set_power, power, unit)
+
     def _get_error_no(self):
         return int(self.get_error_inst())
 
@@ -391,5 +403,98 @@ class HP8664A(MWFreqSynth, VisaInstrument):
         """
         if unit != '':
             unit = ' ' + unit
-        return self._read('FREQ {0}{1}'.format(freq, unit))
+        self._write('FREQ {0}{1}'.format(freq, unit))
+
+    @VisaInstrument.check_error
+    def get_freq_step_inst(self):
+        """Returns the frequency step size.
+
+        Returns:
+          - float: Frequency step size.
+        """
+        return self._read('FREQ:STEP:INCR?')
+
+    @VisaInstrument.check_error
+    def set_freq_step_inst(self, val, unit=''):
+        """Sets the frequency step size, used by `step_freq_up_inst` and
+        `step_freq_down_inst`.
+
+        Parameters:
+          - val (float/str): Frequency step size.
+          - unit (str): Frequency unit ('HZ', 'KHZ', 'MHZ', 'MAHZ', 'GHZ').
+        """
+        if unit != '':
+            unit = ' ' + unit
+        self._write('FREQ:STEP:INCR {0}{1}'.format(val, unit))
+
+    def step_freq_up_inst(self):
+        """Increments the frequency by the frequency step size.
+
+        Not error checked, so that a step costs a single short command.
+        """
+        self._write('FREQ UP')
+
+    def step_freq_down_inst(self):
+        """Decrements the frequency by the frequency step size.
+
+        Not error checked, so that a step costs a single short command.
+        """
+        self._write('FREQ DOWN')
+
+    ########################
+    ## Step Sweep Methods ##
+    ########################
+
+    def step_sweep(self, start, step, num_points, unit=''):
+        """Sweeps the frequency in equal steps. The start frequency and step
+        size are programmed (and error checked) once, after which each point
+        only costs a `FREQ UP` or `FREQ DOWN` command. The steps are error
+        checked at once, after the last step, before its point is yielded.
+
+        Can be iterated over with `Experiment.sweep`:
+
+            for freq in self.sweep(self.mwfs.step_sweep(2.8e9, 1e6, 101)):
+                ...
+
+        Parameters:
+          - start (float): Start frequency.
+          - step (float): Frequency step. Negative steps sweep down.
+          - num_points (int): Number of points, including the start.
+          - unit (str): Frequency unit of `start` and `step`.
+
+        Returns:
+          - generator[float]: Yields the frequency of each point, once the
+            synthesizer has been set to it.
+
+        Raises:
+          - InstrumentError: If any step failed, e.g. out of range.
+        """
+        self.set_freq_inst(start, unit)
+        self.set_freq_step_inst(abs(step), unit)
+        step_freq = self.step_freq_up_inst if step >= 0 else self.step_freq_down_inst
+        for i in range(num_points):
+            if i:
+                step_freq()
+                if i == num_points - 1:
+                    self._check_step_error(start, step, num_points, unit)
+            yield start + i * step
+
+    def _check_step_error(self, *args):
+        """Raises an `InstrumentError` if the steps of `step_sweep` queued an
+        error. The error is read as a string, since reading its number alone
+        clears it, and steps can't be resent to reprocure it like
+        `VisaInstrument.check_error` does.
+        """
+        err_no, err_msg = self.get_error_inst('STR').split(',', 1)
+        if int(err_no) != 0:
+            # Each failed step queues an error. Only the first is reported.
+            while int(self.get_error_inst()) != 0:
+                pass
+            raise InstrumentError(NONZERO_ERROR_NO.format(
+                    cls_name = type(self).__name__,
+                    fn_name = 'step_sweep',
+                    fn_args = ', '.join(str(arg) for arg in args),
+                    err_no = int(err_no),
+                    err_msg = err_msg.strip(),
+            ))
 
@@ -1,7 +1,6 @@
 from instrument import *
 from instrument.mwfreqsynth import *
 from instrument.lib.visainstrument import *
-import visa
 
 class HP8673C(MWFreqSynth, VisaInstrument):
     def _reset(self):
@@ -0,0 +1,67 @@
+from instrument import InstrumentError
+from instrument.lib.tests.test_visainstrument import DummyResource, DummyVisaResourceManager
+from instrument.lib.visainstrument import VisaInstrument
+from instrument.mwfreqsynth.hp8664a import HP8664A
+from instrument.simulated import simulate
+import unittest
+
+class TestHP8664AStepSweep(unittest.TestCase):
+    def setUp(self):
+        VisaInstrument.resource_manager_factory = DummyVisaResourceManager
+        self.synth = HP8664A(address='GPIB0::19::INSTR')
+        self.synth._connect()
+        self.synth._resource = self.resource = RecordingResource('GPIB0::19::INSTR')
+
+    def tearDown(self):
+        VisaInstrument.resource_manager_factory = None
+
+    def test_step_sweep(self):
+        freqs = list(self.synth.step_sweep(2.8e9, 1e6, 4))
+        self.assertEqual(freqs, [2.8e9, 2.801e9, 2.802e9, 2.803e9])
+        writes = self.resource.writes
+        self.assertEqual(writes[:2], ['FREQ 2800000000.0', 'FREQ:STEP:INCR 1000000.0'])
+        # Each point after the first costs a single step command.
+        self.assertEqual(writes[2:], ['FREQ UP'] * 3)
+
+    def test_step_sweep_down(self):
+        freqs = list(self.synth.step_sweep(10, -2, 3, 'MHZ'))
+        self.assertEqual(freqs, [10, 8, 6])
+        self.assertEqual(self.resource.writes,
+                ['FREQ 10 MHZ', 'FREQ:STEP:INCR 2 MHZ', 'FREQ DOWN', 'FREQ DOWN'])
+
+    def test_step_sweep_error(self):
+        self.resource.query_vals['SYST:ERR? STR'] = \
+                '-222,"Data out of range; frequency"'
+        freqs = []
+        with self.assertRaisesRegex(InstrumentError, 'Data out of range'):
+            for freq in self.synth.step_sweep(2.8e9, 1e6, 3):
+                freqs.append(freq)
+        # The last point isn't yielded.
+        self.assertEqual(freqs, [2.8e9, 2.801e9])
+
+    def test_step_sweep_error_simulated(self):
+        synth = HP8664A(address='GPIB0::19::INSTR')
+        with simulate([synth]):
+            synth._connect()
+            with self.assertRaises(InstrumentError):
+                list(synth.step_sweep(3e9, 1e9, 3))
+            # The other errors queued by the sweep were cleared.
+            self.assertEqual(synth._get_error_no(), 0)
+
+
+###############
+## Utilities ##
+###############
+
+class RecordingResource(DummyResource):
+    """Dummy resource recording every instruction written to it."""
+
+    def __init__(self, addr):
+        DummyResource.__init__(self, addr)
+        self.writes = []
+        self.query_vals['SYST:ERR? NUM'] = '0'
+        self.query_vals['SYST:ERR? STR'] = '+0,"No error"'
+
+    def write(self, instruction):
+        self.writes.append(instruction)
+        return DummyResource.write(self, instruction)
@@ -13,9 +13,13 @@ Importable:
 
 from instrument import *
 from instrument.lib.cinstrument import CInstrument
+from instrument.lib.metrics import METRICS
 from settings import PULSEBLASTER_LIB_PATH as libpath
+from tracing import TRACER
 
 from ctypes import *
+from functools import wraps
+import time
 
 __all__ = ['PulseBlaster']
 
@@ -168,14 +172,14 @@ class PulseBlaster(CInstrument):
                     "Invalid PulseBlaster programming target: '{0}'".format(
                             device))
         if pb_start_programming(PulseBlaster.devices[device]) < 0:
-            raise InstrumentError(self.get_error())
+            raise InstrumentError(pb_get_error())
 
     def stop_programming(self):
         """Finishes programming for a specific onboard device which was started by
         `start_programming`.
         """
         if pb_stop_programming() < 0:
-            raise InstrumentError(self.get_error())
+            raise InstrumentError(pb_get_error())
     
     def start(self):
         """Send a software trigger to the board to start execution of a pulse
@@ -184,7 +188,7 @@ class PulseBlaster(CInstrument):
         """
         self.select_board()
         if pb_start() < 0:
-            raise InstrumentError(self.get_error())
+            raise InstrumentError(pb_get_error())
 
     def stop(self):
         """Stops output of board. Analog output will return to ground, and TTL
@@ -196,7 +200,7 @@ class PulseBlaster(CInstrument):
         """
         self.select_board()
         if pb_stop() < 0:
-            raise InstrumentError(self.get_error())
+            raise InstrumentError(pb_get_error())
 
     def reset(self):
         """Stops output of board and resets the PulseBlaster Core. Analog
@@ -210,7 +214,7 @@ class PulseBlaster(CInstrument):
         """
         self.select_board()
         if pb_reset() < 0:
-            raise InstrumentError(self.get_error())
+            raise InstrumentError(pb_get_error())
 
     ######################
     ## Abstract Methods ##
@@ -406,8 +410,26 @@ class PulseBlaster(CInstrument):
 ############################
 
 # SpinCore API functions, adapted for Python. Should avoid calling directly
-# outside from this class, unless it is needed explicitly.
+# outside from this class, unless it is needed explicitly. The latency of every
+# call is recorded in `METRICS`, and traced in `TRACER`.
 
+def _timed(fn):
+    """Records the latency of a SpinCore API function in `METRICS` and
+    `TRACER`.
+    """
+    @wraps(fn)
+    def timed_fn(*args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            end = time.perf_counter()
+            METRICS.record('PulseBlaster', fn.__name__, end - start)
+            TRACER.add(fn.__name__, 'spinapi', start, end,
+                    {'instrument': 'PulseBlaster'})
+    return timed_fn
+
+@_timed
 def pb_count_boards():
     """Return the number of SpinCore boards present in your system.
 
@@ -416,6 +438,7 @@ def pb_count_boards():
     """
     return PulseBlaster._lib.pb_count_boards()
 
+@_timed
 def pb_select_board(board):
     """If multiple boards from SpinCore Technologies are present in your
     system, this function allows you to select which board to talk to.  Once
@@ -433,6 +456,7 @@ def pb_select_board(board):
     """
     return PulseBlaster._lib.pb_select_board(board)
 
+@_timed
 def pb_init():
     """Initializes the board. This must be called before any other functions
     are used which communicate with the board. If you have multiple boards
@@ -444,6 +468,7 @@ def pb_init():
     """
     return PulseBlaster._lib.pb_init()
 
+@_timed
 def pb_core_clock(clock_freq):
     """Tell the library which clock frequency the board uses. This should be
     called at the beginning of each program, right after you initialize the
@@ -461,6 +486,7 @@ def pb_core_clock(clock_freq):
     """
     PulseBlaster._lib.pb_core_clock(clock_freq)
 
+@_timed
 def pb_close():
     """End communication with the board. This is generally called as the last
     line in the program. Once this is called, no further communication can take
@@ -473,6 +499,7 @@ def pb_close():
     """
     return PulseBlaster._lib.pb_close()
 
+@_timed
 def pb_start_programming(device):
     """This function tells the board to start programming one of the onboard
     devices. Only one device can be programmed at a time.
@@ -485,6 +512,7 @@ def pb_start_programming(device):
     """
     return PulseBlaster._lib.pb_start_programming(device)
 
+@_timed
 def pb_stop_programming():
     """Finishes programming for a specific onboard device which was started by
     `pb_start_programming()`.
@@ -494,6 +522,7 @@ def pb_stop_programming():
     """
     return PulseBlaster._lib.pb_stop_programming()
 
+@_timed
 def pb_start():
     """Send a software trigger to the board. THis will start execution of a
     pulse program. It will also trigger a program which is currently paused due
@@ -506,6 +535,7 @@ def pb_start():
     """
     return PulseBlaster._lib.pb_start()
 
+@_timed
 def pb_stop():
     """Stops output of board. Analog output will return to ground, and TTL
     outputs will either remain in the same state they were in when the reset
@@ -518,6 +548,7 @@ def pb_stop():
     """
     return PulseBlaster._lib.pb_stop()
 
+@_timed
 def pb_reset():
     """Stops the output of board and resets the PulseBlaster Core. Analog
     output will return to ground, and TTL outputs will either remain in the
@@ -532,6 +563,7 @@ def pb_reset():
     """
     return PulseBlaster._lib.pb_reset()
 
+@_timed
 def pb_inst_pbonly(flags, inst, inst_data, length):
     """This is the instruction programming function for boards without a DDS.
     (for example PulseBlaster and PulseBlasterESR boards). Syntax is identical
@@ -556,6 +588,7 @@ def pb_inst_pbonly(flags, inst, inst_data, length):
             c_double(length),
     )
 
+@_timed
 def pb_get_error():
     """Return the most recent error string. Anytime a function (such as
     `pb_init()`, `pb_start_programming()`, etc.) encounters an error, this
@@ -223,7 +223,7 @@ class PulseBlasterESRPRO(PulseBlaster):
 ## Private ##
 #############
 
-from instrument.pulseblaster import pb_inst_pbonly
+from instrument.pulseblaster import pb_inst_pbonly, pb_get_error
 
 def _write_inst(flags, pulse, inst, inst_data, length):
     """Writes an instruction to a PulseBlasterESR-PRO board. Raises an
@@ -263,6 +263,6 @@ def _write_inst(flags, pulse, inst, inst_data, length):
 
     if addr < 0:
         raise InstrumentError('could not write {0} instruction: {1}'.format(
-                inst, PulseBlasterESRPRO.pb_get_error()))
+                inst, pb_get_error()))
     return addr
 
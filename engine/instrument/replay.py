@@ -0,0 +1,418 @@
+"""
+Replay Instrument Module
+
+Records the VISA sessions of a run to a transcript, and replays them, so that
+issues seen in the lab can be reproduced, and experiments can be run through
+their real drivers, deterministically and as fast as possible, in tests.
+
+While recording, every command sent to a VISA instrument (`write`, `query`
+and `read_stb`, service request waits, and Group Execute Triggers sent
+through the interface of its bus), its response or error, and its timing are
+appended to a transcript file. Resources are recorded through
+`VisaInstrument.resource_manager_factory`, so that runs on simulated
+instruments can be recorded too:
+
+    recording = record('transcript.jsonl')
+    ...
+    recording.close()
+
+While replaying, each instrument is opened as a resource that serves the
+recorded responses of its address back in order, either as fast as possible
+or at the recorded speed. Replays check that the same commands are sent in
+the same order as when recorded, and raise an `InstrumentError` as soon as
+they diverge. Commands sent by the thread waiting on an instrument's service
+requests (see `instrument.lib.visainstrument`) are recorded and replayed in
+order on a channel of their own, since they interleave with the commands of
+other threads in an order that depends on thread timing. Since replayed service requests are read from the transcript,
+pipelined operations complete without any delay when replaying as fast as
+possible:
+
+    with replay('transcript.jsonl'):
+        ...
+
+Transcripts are JSON Lines files: a header line, followed by a line per
+command with its start time (relative to the start of the recording) and
+duration in seconds, the address of its instrument, the operation, its data
+and its response, or the code of the `VisaIOError` it raised. Commands sent
+by service request waiters have their 'channel' set to 'srq'.
+
+Importable:
+  - Transcript
+  - RecordingResource
+  - RecordingResourceManager
+  - ReplayResource
+  - ReplayResourceManager
+  - Recording
+  - load_transcript
+  - record
+  - replay
+"""
+
+from instrument import *
+from instrument.lib.visainstrument import VisaInstrument, _on_srq_thread, visa
+
+from collections import defaultdict, deque
+from functools import partial
+import json
+import threading
+import time
+
+__all__ = [
+    'Transcript',
+    'RecordingResource',
+    'RecordingResourceManager',
+    'ReplayResource',
+    'ReplayResourceManager',
+    'Recording',
+    'load_transcript',
+    'record',
+    'replay',
+]
+
+VERSION = 1
+
+class Transcript(object):
+    """Transcript file commands are recorded to.
+
+    Parameters:
+      - path (str): Path to the transcript file. Overwritten if it exists.
+
+    Instance Attributes:
+      - path (str)
+      - num_commands (int): Number of commands recorded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.num_commands = 0
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._file = open(path, 'w')
+        self._file.write(json.dumps({'version': VERSION,
+                'time': time.time()}) + '\n')
+
+    def record(self, address, op, data, response, start, end, error=None,
+            channel=None):
+        """Records a command.
+
+        Parameters:
+          - address (str): Address of the instrument.
+          - op (str): 'write', 'query', 'read_stb', 'enable_event',
+            'wait_on_event' or 'group_execute_trigger'.
+          - data (str): Instruction sent, if any.
+          - response: Response to the command, if any.
+          - start (float): Time the command was sent at, from
+            `time.perf_counter`.
+          - end (float): Time the command completed at.
+          - error (int): Code of the `VisaIOError` raised, if any.
+          - channel (str): 'srq' if sent by a service request waiter.
+        """
+        entry = {
+            't': start - self._start,
+            'dt': end - start,
+            'address': address,
+            'op': op,
+            'data': data,
+            'response': response,
+        }
+        if error is not None:
+            entry['error'] = error
+        if channel is not None:
+            entry['channel'] = channel
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self.num_commands += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+class RecordingResource(object):
+    """VISA resource, which records the commands sent to another resource to
+    a transcript.
+
+    Parameters:
+      - resource (visa.resource.Resource): Resource commands are sent to.
+      - address (str): Address of the resource.
+      - transcript (Transcript): Transcript commands are recorded to.
+    """
+
+    def __init__(self, resource, address, transcript):
+        self._resource = resource
+        self._address = address
+        self._transcript = transcript
+
+    def write(self, instruction):
+        return self._call('write', instruction, instruction)
+
+    def query(self, instruction):
+        return self._call('query', instruction, instruction)
+
+    def read_stb(self):
+        return self._call('read_stb', None)
+
+    def enable_event(self, event_type, mechanism):
+        self._call('enable_event', None, event_type, mechanism)
+
+    def wait_on_event(self, event_type, timeout):
+        # The response holds the event, which isn't recorded.
+        self._call('wait_on_event', None, event_type, timeout)
+
+    def group_execute_trigger(self, *resources):
+        # Triggered devices are recorded by address.
+        return self._call('group_execute_trigger',
+                ','.join(resource._address for resource in resources),
+                *(resource._resource for resource in resources))
+
+    def close(self):
+        self._resource.close()
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+    #############
+    ## Private ##
+    #############
+
+    def _call(self, op, data, *args):
+        method = getattr(self._resource, op)
+        channel = 'srq' if _on_srq_thread() else None
+        start = time.perf_counter()
+        try:
+            response = method(*args)
+        except visa.VisaIOError as e:
+            self._transcript.record(self._address, op, data, None, start,
+                    time.perf_counter(), error=e.error_code, channel=channel)
+            raise
+        if op == 'query':
+            response = str(response)
+        self._transcript.record(self._address, op, data,
+                response if op != 'wait_on_event' else None, start,
+                time.perf_counter(), channel=channel)
+        return response
+
+class RecordingResourceManager(object):
+    """VISA resource manager, which opens resources with another resource
+    manager, and records their commands to a transcript.
+
+    `VisaInstrument.resource_manager_factory` can be set to e.g.
+    `partial(RecordingResourceManager, transcript, visa.ResourceManager)`.
+
+    Parameters:
+      - transcript (Transcript): Transcript commands are recorded to.
+      - factory (callable): Creates the resource manager resources are
+        opened with.
+    """
+
+    def __init__(self, transcript, factory):
+        self._transcript = transcript
+        self._rm = factory()
+
+    def list_resources(self):
+        return self._rm.list_resources()
+
+    def open_resource(self, address):
+        return RecordingResource(self._rm.open_resource(address), address,
+                self._transcript)
+
+    def close(self):
+        self._rm.close()
+
+class ReplayResource(object):
+    """VISA resource, which serves the recorded responses of an instrument
+    back in order.
+
+    Parameters:
+      - address (str): Address of the instrument.
+      - entries (collections.deque[dict]): Recorded commands of the
+        instrument, in order. Consumed as they are replayed.
+      - realtime (bool): Whether each command takes as long as it was
+        recorded to, instead of returning immediately.
+      - sleep (callable): Sleeps a number of seconds.
+      - srq_entries (collections.deque[dict]): Recorded commands sent by the
+        instrument's service request waiter, in order, replayed to it
+        separately from `entries`.
+
+    Instance Attributes:
+      - address (str)
+      - entries (collections.deque[dict])
+      - srq_entries (collections.deque[dict])
+      - realtime (bool)
+      - closed (bool): Whether the resource has been closed.
+    """
+
+    def __init__(self, address, entries, realtime=False, sleep=time.sleep,
+            srq_entries=None):
+        self.address = address
+        self.entries = entries
+        self.srq_entries = srq_entries if srq_entries is not None else deque()
+        self.realtime = realtime
+        self.closed = False
+        self._sleep = sleep
+
+    def write(self, instruction):
+        self._replay('write', instruction)
+        return len(instruction)
+
+    def query(self, instruction):
+        return self._replay('query', instruction)
+
+    def read_stb(self):
+        return self._replay('read_stb', None)
+
+    def enable_event(self, event_type, mechanism):
+        self._replay('enable_event', None)
+
+    def wait_on_event(self, event_type, timeout):
+        self._replay('wait_on_event', None)
+
+    def group_execute_trigger(self, *resources):
+        return self._replay('group_execute_trigger',
+                ','.join(resource.address for resource in resources))
+
+    def close(self):
+        self.closed = True
+
+    #############
+    ## Private ##
+    #############
+
+    def _replay(self, op, data):
+        entries = self.srq_entries if _on_srq_thread() else self.entries
+        if not entries:
+            raise InstrumentError(REPLAY_ENDED.format(address=self.address,
+                    op=op, data=data))
+        entry = entries[0]
+        if entry['op'] != op or entry['data'] != data:
+            raise InstrumentError(REPLAY_DIVERGED.format(address=self.address,
+                    op=op, data=data, expected_op=entry['op'],
+                    expected_data=entry['data']))
+        entries.popleft()
+        if self.realtime:
+            self._sleep(entry['dt'])
+        if 'error' in entry:
+            raise visa.VisaIOError(entry['error'])
+        return entry['response']
+
+class ReplayResourceManager(object):
+    """VISA resource manager, which opens replayed resources.
+
+    Parameters:
+      - resources (dict[str -> ReplayResource]): Replayed resources by
+        address.
+    """
+
+    def __init__(self, resources):
+        self.resources = resources
+
+    def list_resources(self):
+        return tuple(self.resources)
+
+    def open_resource(self, address):
+        if address not in self.resources:
+            raise InstrumentError(
+                    "No recorded instrument at address '{0}'.".format(address))
+        resource = self.resources[address]
+        resource.closed = False
+        return resource
+
+    def close(self):
+        pass
+
+class Recording(object):
+    """Recording or replay of VISA sessions. Returned by `record` and
+    `replay`, and restores the previous resource manager factory when
+    closed. Can be used as a context manager.
+
+    Parameters:
+      - factory (callable): Resource manager factory swapped in.
+      - transcript (Transcript): Transcript being recorded, if recording.
+      - resources (dict[str -> ReplayResource]): Replayed resources by
+        address, if replaying.
+
+    Instance Attributes:
+      - transcript (Transcript): Transcript being recorded, if recording.
+      - resources (dict[str -> ReplayResource]): Replayed resources by
+        address, if replaying.
+    """
+
+    def __init__(self, factory, transcript=None, resources=None):
+        self.transcript = transcript
+        self.resources = resources
+        self._saved = VisaInstrument.resource_manager_factory
+        VisaInstrument.resource_manager_factory = factory
+
+    def close(self):
+        """Restores the previous resource manager factory, and closes the
+        transcript if recording.
+        """
+        VisaInstrument.resource_manager_factory = self._saved
+        if self.transcript is not None:
+            self.transcript.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def load_transcript(path):
+    """Reads the recorded commands of a transcript.
+
+    Parameters:
+      - path (str): Path to a transcript file written by `Transcript`.
+
+    Returns:
+      - list[dict]: Recorded commands, in order.
+    """
+    with open(path) as f:
+        header = json.loads(f.readline() or 'null')
+        if not isinstance(header, dict) or header.get('version') != VERSION:
+            raise ValueError("'{0}' is not a VISA transcript.".format(path))
+        return [json.loads(line) for line in f if line.strip()]
+
+def record(path):
+    """Records the commands sent to every VISA instrument connected from now
+    on, through the current resource manager factory (e.g. a simulation's),
+    to a transcript.
+
+    Parameters:
+      - path (str): Path to the transcript file.
+
+    Returns:
+      - Recording: The recording. Should be closed once done.
+    """
+    transcript = Transcript(path)
+    factory = VisaInstrument.resource_manager_factory or visa.ResourceManager
+    return Recording(partial(RecordingResourceManager, transcript, factory),
+            transcript=transcript)
+
+def replay(path, realtime=False):
+    """Replays a transcript to every VISA instrument connected from now on.
+
+    Parameters:
+      - path (str): Path to a transcript file.
+      - realtime (bool): Whether commands take as long as they were recorded
+        to, instead of returning immediately.
+
+    Returns:
+      - Recording: The replay. Should be closed once done.
+    """
+    entries = defaultdict(deque)
+    for entry in load_transcript(path):
+        entries[entry['address'], entry.get('channel')].append(entry)
+    resources = {address: ReplayResource(address, entries[address, None],
+                    realtime, srq_entries=entries[address, 'srq'])
+            for address, channel in list(entries)}
+    return Recording(partial(ReplayResourceManager, resources),
+            resources=resources)
+
+##########################
+## Error String Formats ##
+##########################
+
+REPLAY_DIVERGED = "Replay of '{address}' diverged: got {op}({data!r}), " \
+        "recorded {expected_op}({expected_data!r})."
+REPLAY_ENDED = "Replay of '{address}' ended before {op}({data!r})."
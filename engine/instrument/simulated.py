@@ -0,0 +1,1224 @@
+"""
+Simulated Instrument Module
+
+Simulated instruments, which stand in for hardware so that experiments can be
+run end to end, tested and benchmarked without any instruments connected.
+
+Instruments are simulated at the transport level, so that the real drivers
+are exercised: simulated VISA resources interpret the commands sent by the
+`SR830`, `HP8664A` and `HP8673C` drivers, and a simulated SpinAPI library
+interprets the calls of the `PulseBlaster` drivers. They are swapped in
+through `VisaInstrument.resource_manager_factory` and
+`CInstrument.dll_factory`, usually with `simulate`:
+
+    simulation = simulate(experiment.instruments.values(), latency=1e-3)
+    ...
+    simulation.close()
+
+Simulated devices model:
+  - Latency: every VISA read or write, and every library call, takes
+    `latency` seconds.
+  - Settling: commands that change the state of a device (e.g. the frequency
+    of a synthesizer, or a lock-in measurement) keep it busy for `settle`
+    seconds. Further commands are held off until it is done, and `*OPC`
+    reports the operation complete once it is.
+  - Error queues: undefined commands, invalid parameters and out of range
+    values queue errors, which are read back with the device's error query.
+  - Service requests: bits of the status byte enabled with `*SRE` request
+    service, which is waited on with `wait_on_event`.
+  - Group Execute Triggers: sent to devices through a `SimulatedInterface`,
+    opened at the interface address of their bus (e.g. 'GPIB0::INTFC').
+
+Trigger outputs of the PulseBlaster are wired to trigger inputs in software,
+e.g.:
+
+    api.connect_output(1 << 0, sr830_resource.trigger_input)
+
+PulseBlaster time is simulated: a program runs to completion (or to its next
+WAIT instruction) as soon as it is started.
+
+`SimulatedPulseBlaster`, `SimulatedSR830` and `SimulatedSynth` are simulated
+instruments that don't need any factories to be replaced, for tests of
+sequencing logic.
+
+Importable:
+  - SimulatedResource
+  - SimulatedSR830Resource
+  - SimulatedHP8664AResource
+  - SimulatedHP8673CResource
+  - SimulatedInterface
+  - SimulatedResourceManager
+  - SimulatedSpinAPI
+  - Simulation
+  - simulate
+  - resonance
+  - SimulatedPulseBlaster
+  - SimulatedSR830
+  - SimulatedSynth
+"""
+
+from instrument import *
+from instrument.daq.sr830 import SR830, LIA_TRIG, STB_LIA
+from instrument.lib.visainstrument import (VisaInstrument, STB_ESB,
+        STB_RQS, visa)
+from instrument.mwfreqsynth import MWFreqSynth
+from instrument.mwfreqsynth.hp8664a import HP8664A
+from instrument.mwfreqsynth.hp8673c import HP8673C
+from instrument.pulseblaster import PulseBlaster
+from instrument.pulseblaster.pulseblasteresrpro import PulseBlasterESRPRO
+import instrument.pulseblaster as pulseblaster
+
+from collections import deque
+from functools import partial
+import math
+import time
+
+__all__ = [
+    'SimulatedResource',
+    'SimulatedSR830Resource',
+    'SimulatedHP8664AResource',
+    'SimulatedHP8673CResource',
+    'SimulatedInterface',
+    'SimulatedResourceManager',
+    'SimulatedSpinAPI',
+    'Simulation',
+    'simulate',
+    'resonance',
+    'SimulatedPulseBlaster',
+    'SimulatedSR830',
+    'SimulatedSynth',
+]
+
+# Bits of the IEEE 488.2 standard event status register.
+ESR_OPC = 1 << 0  # Operation complete.
+ESR_EXE = 1 << 4  # Execution error.
+ESR_CME = 1 << 5  # Command error.
+
+############################
+## Simulated VISA Devices ##
+############################
+
+class SimulatedResource(object):
+    """Simulated VISA resource.
+
+    Has the interface of the `visa.resource.Resource`s used by
+    `VisaInstrument` (`write`, `query`, `read_stb`, `enable_event`,
+    `wait_on_event`, `assert_trigger`, `close`). Instructions are
+    split into commands on ';', and each command is dispatched to a
+    `_command_<name>(query, *args)` method, where the name is the command
+    header in lower case, without a leading '*' and with ':' replaced by '_'
+    (e.g. `_command_freq_step_incr` for 'FREQ:STEP:INCR 1 MHZ'). `query` is
+    True if the command is a query, i.e. contains a '?'. Queries return their
+    output.
+
+    The IEEE 488.2 common commands used by `VisaInstrument` (`*RST`, `*CLS`,
+    `*ESE`, `*ESR?`, `*SRE`, `*OPC`, `*OPC?`) are defined for every device.
+
+    Simulated time only passes while the device is being waited on, so
+    waiting on a service request that nothing is pending for times out
+    immediately if the timeout is infinite.
+
+    Parameters:
+      - latency (float): Time every read or write takes, in seconds.
+      - settle (float): Time the device is busy for after a command that
+        changes its state, in seconds.
+      - clock (callable): Monotonic clock, in seconds.
+      - sleep (callable): Sleeps a number of seconds.
+
+    Instance Attributes:
+      - latency (float)
+      - settle (float)
+      - errors (collections.deque): Queued `(code, message)` errors.
+      - num_commands (int): Number of reads and writes received.
+      - closed (bool): Whether the resource has been closed.
+
+    Class Attributes:
+      - error_queue_size (int): Maximum number of queued errors. Once full,
+        the last error is replaced with a queue overflow error.
+      - command_error, data_type_error, undefined_error, range_error,
+        overflow_error (tuple[int, str]): `(code, message)` errors queued by
+        the device.
+    """
+    error_queue_size = 30
+    command_error = (-100, 'Command error')
+    data_type_error = (-104, 'Data type error')
+    undefined_error = (-113, 'Undefined header')
+    range_error = (-222, 'Data out of range')
+    overflow_error = (-350, 'Queue overflow')
+
+    def __init__(self, latency=0.0, settle=0.0, clock=time.monotonic,
+            sleep=time.sleep):
+        self.latency = latency
+        self.settle = settle
+        self.errors = deque()
+        self.num_commands = 0
+        self.closed = False
+        self._clock = clock
+        self._sleep = sleep
+        self._busy_until = 0.0
+        self._opc_at = None
+        self._esr = 0
+        self._ese = 0
+        self._sre = 0
+        self._events_enabled = False
+
+    def write(self, instruction):
+        self._execute(instruction)
+        return len(instruction)
+
+    def query(self, instruction):
+        return self._execute(instruction)
+
+    def read_stb(self):
+        self._check_open()
+        self._wait(self.latency)
+        status = self._status()
+        return status | STB_RQS if status & self._sre else status
+
+    def enable_event(self, event_type, mechanism):
+        self._check_open()
+        self._events_enabled = True
+
+    def wait_on_event(self, event_type, timeout):
+        """Waits until the device requests service.
+
+        Parameters:
+          - event_type: Ignored, only service requests are simulated.
+          - timeout (int): Maximum time to wait, in milliseconds.
+        """
+        self._check_open()
+        if not self._events_enabled:
+            raise visa.VisaIOError(visa.constants.StatusCode.error_not_enabled)
+        infinite = timeout == visa.constants.VI_TMO_INFINITE
+        if (not self._status() & self._sre and self._opc_at is not None and
+                self._sre & STB_ESB and self._ese & ESR_OPC):
+            # A pending operation requests service once it completes.
+            wait = self._opc_at - self._clock()
+            if infinite or wait <= timeout / 1e3:
+                self._wait(wait)
+        if self._status() & self._sre:
+            return
+        if not infinite:
+            self._wait(timeout / 1e3)
+        raise visa.VisaIOError(visa.constants.StatusCode.error_timeout)
+
+    def assert_trigger(self):
+        """Receives a GPIB device trigger."""
+        self._check_open()
+        self._trigger()
+
+    def close(self):
+        self.closed = True
+
+    #############
+    ## Private ##
+    #############
+
+    def _check_open(self):
+        if self.closed:
+            raise InstrumentError('{0} is closed.'.format(
+                    type(self).__name__))
+
+    def _wait(self, seconds):
+        if seconds > 0:
+            self._sleep(seconds)
+
+    def _wait_ready(self):
+        """Waits until the device is done settling."""
+        self._wait(self._busy_until - self._clock())
+
+    def _busy(self, seconds=None):
+        """Keeps the device busy, e.g. while a setting settles."""
+        if seconds is None:
+            seconds = self.settle
+        self._busy_until = max(self._busy_until, self._clock() + seconds)
+
+    def _error(self, error):
+        code, message = error
+        if len(self.errors) >= self.error_queue_size:
+            self.errors.pop()
+            error = self.overflow_error
+        self.errors.append(error)
+        self._esr |= ESR_EXE if code <= -200 else ESR_CME
+
+    def _pop_error(self):
+        return self.errors.popleft() if self.errors else (0, 'No error')
+
+    def _execute(self, instruction):
+        self._check_open()
+        # Commands are held off until the device is done settling.
+        self._wait_ready()
+        self._wait(self.latency)
+        self.num_commands += 1
+        output = None
+        for command in instruction.split(';'):
+            if command.strip():
+                output = self._dispatch(command.strip())
+        return '' if output is None else str(output)
+
+    def _dispatch(self, command):
+        query = '?' in command
+        header, _, args = command.replace('?', ' ').partition(' ')
+        args = [arg.strip() for arg in args.split(',')] if args.strip() else []
+        name = header.lstrip('*').lower().replace(':', '_')
+        handler = getattr(self, '_command_' + name, None)
+        if handler is None:
+            self._error(self.undefined_error)
+            return None
+        try:
+            return handler(query, *args)
+        except ValueError:
+            self._error(self.data_type_error)
+        except (TypeError, IndexError):
+            self._error(self.command_error)
+        return None
+
+    def _reset(self):
+        """Resets the state of the device. Overriden by devices."""
+        pass
+
+    def _trigger(self):
+        """Executes a device trigger. Ignored unless overriden by devices."""
+        pass
+
+    def _status(self):
+        """Returns the status byte, without the request service bit.
+        Extended by devices with their own status bits.
+        """
+        if self._opc_at is not None and self._clock() >= self._opc_at:
+            self._opc_at = None
+            self._esr |= ESR_OPC
+        return STB_ESB if self._esr & self._ese else 0
+
+    ##########################
+    ## IEEE 488.2 Commands ##
+    ##########################
+
+    def _command_rst(self, query):
+        self._reset()
+
+    def _command_cls(self, query):
+        self.errors.clear()
+        self._esr = 0
+        self._opc_at = None
+
+    def _command_ese(self, query, value=None):
+        if query:
+            return self._ese
+        self._ese = int(value)
+
+    def _command_sre(self, query, value=None):
+        if query:
+            return self._sre
+        self._sre = int(value)
+
+    def _command_esr(self, query):
+        esr, self._esr = self._esr, 0
+        return esr
+
+    def _command_opc(self, query):
+        if query:
+            self._wait_ready()
+            return 1
+        # The operation completes once the device is done settling.
+        self._opc_at = self._busy_until
+
+class SimulatedSR830Resource(SimulatedResource):
+    """Simulated SR830 lock-in amplifier.
+
+    Measured values are read from a source function. Each triggered
+    measurement keeps the lock-in busy for `settle` seconds, modelling its
+    time constant.
+
+    `ERRS?` pops the error queue, returning the error code, or 0 if it is
+    empty.
+
+    Parameters:
+      - source (callable): Called with no arguments, returns the `(X, Y)`
+        signal currently measured.
+      - latency, settle, clock, sleep: See `SimulatedResource`.
+
+    Instance Attributes:
+      - source (callable)
+      - buffers (tuple[list[float]]): Points stored in each buffer.
+
+    Class Attributes:
+      - buffer_size (int): Number of points each buffer holds.
+    """
+    buffer_size = 16383
+
+    def __init__(self, source=None, **kwargs):
+        SimulatedResource.__init__(self, **kwargs)
+        self.source = source or (lambda: (0.0, 0.0))
+        self._reset()
+
+    def trigger_input(self):
+        """Receives a hardware trigger."""
+        if self._running:
+            if self._sample_rate == 14:
+                self._store()
+                self._lias |= LIA_TRIG
+        elif self._trigger_start:
+            self._running = True
+
+    #############
+    ## Private ##
+    #############
+
+    def _reset(self):
+        self.buffers = ([], [])
+        self._displays = [0, 0]
+        self._sample_rate = 0
+        self._buffer_mode = 0
+        self._trigger_start = 0
+        self._interface = 1
+        self._running = False
+        self._lias = 0
+        self._liae = 0
+
+    def _trigger(self):
+        self._command_trig(False)
+
+    def _status(self):
+        status = SimulatedResource._status(self)
+        return status | STB_LIA if self._lias & self._liae else status
+
+    def _output(self, output):
+        x, y = self.source()
+        return (x, y, math.hypot(x, y), math.degrees(math.atan2(y, x)))[output - 1]
+
+    def _store(self):
+        if len(self.buffers[0]) >= self.buffer_size:
+            if self._buffer_mode == 0:
+                self._running = False
+                return
+            for buf in self.buffers:
+                del buf[0]
+        for channel, buf in enumerate(self.buffers):
+            # Channel 1 displays X or R, channel 2 displays Y or theta.
+            buf.append(self._output(1 + channel + 2 * self._displays[channel]))
+
+    def _command_errs(self, query):
+        return self._pop_error()[0]
+
+    def _command_liae(self, query, value=None):
+        if query:
+            return self._liae
+        self._liae = int(value)
+
+    def _command_lias(self, query, bit=None):
+        # Reading the register, or one of its bits, clears it.
+        if bit is None:
+            lias, self._lias = self._lias, 0
+            return lias
+        mask = 1 << int(bit)
+        lias = self._lias & mask
+        self._lias &= ~mask
+        return int(bool(lias))
+
+    def _command_outx(self, query, interface):
+        self._interface = int(interface)
+
+    def _command_tstr(self, query, mode):
+        self._trigger_start = int(mode)
+
+    def _command_trig(self, query):
+        self._busy()
+        self.trigger_input()
+
+    def _command_outp(self, query, output):
+        return self._output(int(output))
+
+    def _command_snap(self, query, *outputs):
+        return ','.join(str(self._output(int(output))) for output in outputs)
+
+    def _command_ddef(self, query, channel, display, ratio='0'):
+        self._displays[int(channel) - 1] = int(display)
+
+    def _command_srat(self, query, rate):
+        if not 0 <= int(rate) <= 14:
+            raise IndexError(rate)
+        self._sample_rate = int(rate)
+
+    def _command_send(self, query, mode):
+        self._buffer_mode = int(mode)
+
+    def _command_strt(self, query):
+        self._running = True
+
+    def _command_paus(self, query):
+        self._running = False
+
+    def _command_rest(self, query):
+        self._running = False
+        self.buffers = ([], [])
+
+    def _command_spts(self, query):
+        return len(self.buffers[0])
+
+    def _command_trca(self, query, channel, start, num_points):
+        start = int(start)
+        values = self.buffers[int(channel) - 1][start:start + int(num_points)]
+        return ''.join('{0},'.format(value) for value in values)
+
+class SimulatedHP8664AResource(SimulatedResource):
+    """Simulated HP8664A synthesizer.
+
+    Frequency changes keep the synthesizer busy for `settle` seconds, and
+    out of range frequencies and amplitudes queue errors, read with
+    `SYST:ERR?`.
+
+    Parameters:
+      - latency, settle, clock, sleep: See `SimulatedResource`.
+
+    Instance Attributes:
+      - freq (float): Frequency, in Hz.
+      - step (float): Frequency step size, in Hz.
+      - power (float): Amplitude, in dBm.
+      - output (bool): Whether the RF output is on.
+
+    Class Attributes:
+      - freq_range (tuple[float]): Frequency range, in Hz.
+      - power_range (tuple[float]): Amplitude range, in dBm.
+    """
+    freq_range = (100e3, 3e9)
+    power_range = (-140.0, 13.0)
+    units = {'HZ': 1.0, 'KHZ': 1e3, 'MHZ': 1e6, 'MAHZ': 1e6, 'GHZ': 1e9}
+
+    def __init__(self, **kwargs):
+        SimulatedResource.__init__(self, **kwargs)
+        self._reset()
+
+    #############
+    ## Private ##
+    #############
+
+    def _reset(self):
+        self.freq = 1500e6
+        self.step = 1e6
+        self.power = -140.0
+        self.output = False
+
+    def _parse_freq(self, value):
+        value = value.split()
+        scale = self.units[value[1].upper()] if len(value) > 1 else 1.0
+        return float(value[0]) * scale
+
+    def _set_freq(self, freq):
+        if not self.freq_range[0] <= freq <= self.freq_range[1]:
+            self._error(self.range_error)
+            return
+        self.freq = freq
+        self._busy()
+
+    def _command_freq(self, query, value=None):
+        if query:
+            return repr(self.freq)
+        if value.upper() == 'UP':
+            self._set_freq(self.freq + self.step)
+        elif value.upper() == 'DOWN':
+            self._set_freq(self.freq - self.step)
+        else:
+            self._set_freq(self._parse_freq(value))
+
+    def _command_freq_step_incr(self, query, value=None):
+        if query:
+            return repr(self.step)
+        self.step = self._parse_freq(value)
+
+    def _command_ampl_sour_lev(self, query, value=None):
+        if query:
+            return repr(self.power)
+        power = float(value.split()[0])
+        if not self.power_range[0] <= power <= self.power_range[1]:
+            self._error(self.range_error)
+            return
+        self.power = power
+
+    def _command_ampl_stat(self, query, value=None):
+        if query:
+            return int(self.output)
+        self.output = value.upper() in ('1', 'ON')
+
+    def _command_syst_err(self, query, error_format='NUM'):
+        code, message = self._pop_error()
+        if error_format.upper() == 'STR':
+            return '{0},"{1}"'.format(code, message)
+        return code
+
+class SimulatedHP8673CResource(SimulatedResource):
+    """Simulated HP8673C synthesizer.
+
+    Frequency changes keep the synthesizer busy for `settle` seconds. `MG`
+    pops the error queue, returning the error code, or 0 if it is empty.
+
+    Parameters:
+      - latency, settle, clock, sleep: See `SimulatedResource`.
+
+    Instance Attributes:
+      - freq (float): Frequency, in Hz.
+      - power (float): Amplitude, in dBm.
+      - output (bool): Whether the RF output is on.
+    """
+
+    def __init__(self, **kwargs):
+        SimulatedResource.__init__(self, **kwargs)
+        self._reset()
+
+    #############
+    ## Private ##
+    #############
+
+    def _reset(self):
+        self.freq = 2000e6
+        self.power = -10.0
+        self.output = False
+
+    def _command_fr(self, query, value):
+        self.freq = float(value.split()[0]) * 1e6
+        self._busy()
+
+    def _command_ap(self, query, value):
+        self.power = float(value.split()[0])
+
+    def _command_rf1(self, query):
+        self.output = True
+
+    def _command_rf0(self, query):
+        self.output = False
+
+    def _command_mg(self, query):
+        return self._pop_error()[0]
+
+class SimulatedInterface(object):
+    """Simulated GPIB interface, which sends Group Execute Triggers to
+    simulated devices.
+
+    Parameters:
+      - latency (float): Time sending a trigger takes, in seconds.
+      - sleep (callable): Sleeps a number of seconds.
+
+    Instance Attributes:
+      - num_triggers (int): Number of Group Execute Triggers sent.
+      - closed (bool): Whether the interface has been closed.
+    """
+
+    def __init__(self, latency=0.0, sleep=time.sleep):
+        self.latency = latency
+        self.num_triggers = 0
+        self.closed = False
+        self._sleep = sleep
+
+    def group_execute_trigger(self, *resources):
+        if self.closed:
+            raise InstrumentError('SimulatedInterface is closed.')
+        if self.latency > 0:
+            self._sleep(self.latency)
+        # Every device is triggered by the same bus operation.
+        for resource in resources:
+            resource.assert_trigger()
+        self.num_triggers += 1
+        return (0, visa.constants.StatusCode.success)
+
+    def close(self):
+        self.closed = True
+
+class SimulatedResourceManager(object):
+    """Simulated VISA resource manager, which opens simulated resources.
+
+    `VisaInstrument.resource_manager_factory` can be set to e.g.
+    `partial(SimulatedResourceManager, devices)`.
+
+    Parameters:
+      - devices (dict[str -> SimulatedResource]): Simulated devices by
+        address.
+
+    Instance Attributes:
+      - devices (dict[str -> SimulatedResource])
+    """
+
+    def __init__(self, devices):
+        self.devices = devices
+
+    def list_resources(self):
+        return tuple(self.devices)
+
+    def open_resource(self, address):
+        if address.upper().endswith('::INTFC'):
+            devices = list(self.devices.values())
+            return SimulatedInterface(
+                    devices[0].latency if devices else 0.0)
+        if address not in self.devices:
+            raise InstrumentError(
+                    "No simulated instrument at address '{0}'.".format(address))
+        device = self.devices[address]
+        device.closed = False
+        return device
+
+    def close(self):
+        pass
+
+###############################
+## Simulated SpinAPI Library ##
+###############################
+
+class SimulatedSpinAPI(object):
+    """Simulated SpinAPI library, loaded by `PulseBlaster.loadDLL` in place
+    of the SpinCore DLL (see `CInstrument.dll_factory`).
+
+    Implements the `pb_*` functions used by the PulseBlaster drivers, which
+    return negative numbers on failure and set the error returned by
+    `pb_get_error`, as SpinAPI does. Programs are interpreted when the board
+    is started.
+
+    Parameters:
+      - latency (float): Time every call takes, in seconds.
+      - num_boards (int): Number of boards present.
+      - sleep (callable): Sleeps a number of seconds.
+
+    Instance Attributes:
+      - latency (float)
+      - num_calls (int): Number of library calls.
+      - clock_freq (float): Core clock frequency, in MHz.
+      - initialized (bool): Whether the board is initialized.
+      - program (list[tuple]): Programmed `(inst, flags, inst_data, length)`
+        instructions.
+    """
+
+    def __init__(self, latency=0.0, num_boards=1, sleep=time.sleep):
+        self.latency = latency
+        self.num_boards = num_boards
+        self.num_calls = 0
+        self.clock_freq = None
+        self.initialized = False
+        self._sleep = sleep
+        self._program = _PulseProgram()
+        self._programming = None
+        self._error = 'No Error'
+        for name in pulseblaster._FUNCTIONS:
+            setattr(self, name, _Function(self, getattr(self, '_' + name)))
+
+    @property
+    def program(self):
+        return self._program.program
+
+    @property
+    def time(self):
+        """Simulated time the board has been running, in nanoseconds."""
+        return self._program.time
+
+    def connect_output(self, flags, trigger):
+        """Wires flag outputs to a trigger input.
+
+        Parameters:
+          - flags (int): Bit field of the flags wired to the input.
+          - trigger (callable): Called on every rising edge of the flags.
+        """
+        self._program.connect_output(flags, trigger)
+
+    def load(self, libpath):
+        """Returns the library, for use as `CInstrument.dll_factory`."""
+        return self
+
+    #############
+    ## Private ##
+    #############
+
+    def _fail(self, message):
+        self._error = message
+        return -1
+
+    def _pb_count_boards(self):
+        return self.num_boards
+
+    def _pb_select_board(self, board):
+        if not 0 <= board < self.num_boards:
+            return self._fail('Board {0} is not present'.format(board))
+        return 0
+
+    def _pb_init(self):
+        self.initialized = True
+        return 0
+
+    def _pb_core_clock(self, clock_freq):
+        self.clock_freq = clock_freq
+
+    def _pb_close(self):
+        self.initialized = False
+        return 0
+
+    def _pb_start_programming(self, device):
+        if not self.initialized:
+            return self._fail('Board is not initialized')
+        if device == PulseBlaster.devices['PULSE_PROGRAM']:
+            self._program.program = []
+        self._programming = device
+        return 0
+
+    def _pb_stop_programming(self):
+        if self._programming is None:
+            return self._fail('Board is not being programmed')
+        self._programming = None
+        return 0
+
+    def _pb_start(self):
+        if not self.initialized:
+            return self._fail('Board is not initialized')
+        try:
+            self._program.start()
+        except (IndexError, KeyError, InstrumentError) as e:
+            return self._fail(str(e))
+        return 0
+
+    def _pb_stop(self):
+        self._program.stop()
+        return 0
+
+    def _pb_reset(self):
+        self._program.stop()
+        return 0
+
+    def _pb_inst_pbonly(self, flags, inst, inst_data, length):
+        if self._programming != PulseBlaster.devices['PULSE_PROGRAM']:
+            return self._fail('Board is not being programmed')
+        if inst not in _OPCODE_NAMES:
+            return self._fail('Invalid opcode {0}'.format(inst))
+        if inst == PulseBlaster.opcodes['WAIT'] and not self._program.program:
+            return self._fail('WAIT cannot be the first instruction')
+        # Without a pulse period (bits 21-23), the flags are off.
+        if not flags >> 21:
+            flags = 0
+        self._program.program.append((_OPCODE_NAMES[inst],
+                flags & ((1 << 21) - 1), inst_data, length))
+        return len(self._program.program) - 1
+
+    def _pb_get_error(self):
+        return self._error.encode('utf-8')
+
+##########################
+## Simulation Utilities ##
+##########################
+
+def resonance(freq, center=2.87e9, width=5e6, amplitude=1e-3):
+    """Lock-in signal of a Lorentzian resonance.
+
+    Parameters:
+      - freq (float): Frequency, in Hz.
+      - center (float): Resonance frequency, in Hz.
+      - width (float): Half width at half maximum, in Hz.
+      - amplitude (float): Peak amplitude, in V.
+
+    Returns:
+      - tuple[float]: The `(X, Y)` signal.
+    """
+    detuning = (freq - center) / width
+    scale = amplitude / (1 + detuning ** 2)
+    return scale, scale * detuning
+
+class Simulation(object):
+    """Simulated backends swapped in for a set of instruments. Returned by
+    `simulate`, and restores the real backends when closed. Can be used as a
+    context manager.
+
+    Instance Attributes:
+      - devices (dict[str -> SimulatedResource]): Simulated VISA devices by
+        address.
+      - api (SimulatedSpinAPI): Simulated SpinAPI library.
+    """
+
+    def __init__(self, devices, api):
+        self.devices = devices
+        self.api = api
+        self._saved = (VisaInstrument.resource_manager_factory,
+                PulseBlaster.dll_factory, PulseBlaster.__dict__.get('_lib'))
+        VisaInstrument.resource_manager_factory = partial(
+                SimulatedResourceManager, devices)
+        PulseBlaster.dll_factory = api.load
+        PulseBlaster.loadDLL(pulseblaster.libpath, pulseblaster._FUNCTIONS)
+
+    def close(self):
+        """Restores the real backends."""
+        (VisaInstrument.resource_manager_factory, PulseBlaster.dll_factory,
+                lib) = self._saved
+        if lib is None:
+            del PulseBlaster._lib
+        else:
+            PulseBlaster._lib = lib
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def simulate(instruments, latency=0.0, settle=0.0, signal=resonance):
+    """Swaps in simulated backends for a set of instruments. Must be called
+    before the instruments are connected.
+
+    The SR830 measures `signal` at the frequency of the synthesizer.
+
+    Parameters:
+      - instruments (iterable[Instrument]): Instruments to simulate. SR830,
+        HP8664A, HP8673C and PulseBlaster instruments are supported.
+      - latency (float): Time every command or library call takes, in
+        seconds.
+      - settle (float): Settling time of frequency changes and lock-in
+        measurements, in seconds.
+      - signal (callable): Called with a frequency in Hz, returns the `(X, Y)`
+        signal at that frequency.
+
+    Returns:
+      - Simulation: The simulation. Should be closed once done.
+    """
+    devices = {}
+    synths = []
+    lockins = []
+    for instrument in instruments:
+        if isinstance(instrument, PulseBlaster):
+            continue
+        for driver, resource in _RESOURCES:
+            if isinstance(instrument, driver):
+                break
+        else:
+            raise InstrumentError('{0} cannot be simulated.'.format(
+                    type(instrument).__name__))
+        if instrument.address in devices:
+            raise InstrumentError(
+                    "Several instruments simulated at address '{0}'.".format(
+                            instrument.address))
+        device = resource(latency=latency, settle=settle)
+        devices[instrument.address] = device
+        if isinstance(device, SimulatedSR830Resource):
+            lockins.append(device)
+        else:
+            synths.append(device)
+    for lockin in lockins:
+        if synths:
+            lockin.source = partial(_measure, signal, synths[0])
+    return Simulation(devices, SimulatedSpinAPI(latency))
+
+################################
+## Self-Contained Instruments ##
+################################
+
+class SimulatedPulseBlaster(PulseBlasterESRPRO):
+    """Simulated PulseBlasterESR-PRO.
+
+    Instructions are recorded instead of being written to a board, and the
+    program is interpreted when the board is started. Rising edges of its
+    flags trigger the inputs connected with `connect_output`.
+
+    Parameters:
+      - clock_freq (float):
+      - board_num (int):
+
+    Instance Attributes:
+      - program (list[tuple]): Programmed `(inst, flags, inst_data, length)`
+        instructions.
+      - time (float): Simulated time the board has been running, in
+        nanoseconds.
+    """
+
+    def __init__(self, clock_freq=100.0, board_num=0, **kwargs):
+        PulseBlasterESRPRO.__init__(self, clock_freq, board_num, **kwargs)
+        self._program = _PulseProgram()
+        self._programming = False
+
+    @property
+    def program(self):
+        return self._program.program
+
+    @property
+    def time(self):
+        return self._program.time
+
+    def connect_output(self, flags, trigger):
+        """Wires flag outputs to a trigger input.
+
+        Parameters:
+          - flags (int): Bit field of the flags wired to the input.
+          - trigger (callable): Called on every rising edge of the flags.
+        """
+        self._program.connect_output(flags, trigger)
+
+    #######################
+    ## Overriden Methods ##
+    #######################
+
+    def _connect(self):
+        pass
+
+    def _disconnect(self):
+        self.stop()
+
+    def _reset(self):
+        self.reset()
+
+    def start_programming(self, device):
+        if device not in PulseBlasterESRPRO.devices:
+            raise InstrumentError(
+                    "Invalid PulseBlaster programming target: '{0}'".format(
+                            device))
+        self._program.program = []
+        self._programming = True
+
+    def stop_programming(self):
+        self._programming = False
+
+    def start(self):
+        self._program.start()
+
+    def stop(self):
+        self._program.stop()
+
+    def reset(self):
+        self.stop()
+
+    def continue_inst(self, flags, pulse, length):
+        return self._write_inst(flags, pulse, 'CONTINUE', 0, length)
+
+    def stop_inst(self, flags, pulse, length):
+        return self._write_inst(flags, pulse, 'STOP', 0, length)
+
+    def loop_inst(self, flags, pulse, length, num_loops):
+        return self._write_inst(flags, pulse, 'LOOP', num_loops, length)
+
+    def end_loop_inst(self, flags, pulse, length, addr):
+        return self._write_inst(flags, pulse, 'END_LOOP', addr, length)
+
+    def jsr_inst(self, flags, pulse, length, addr):
+        return self._write_inst(flags, pulse, 'JSR', addr, length)
+
+    def rts_inst(self, flags, pulse, length):
+        return self._write_inst(flags, pulse, 'RTS', 0, length)
+
+    def branch_inst(self, flags, pulse, length, addr):
+        return self._write_inst(flags, pulse, 'BRANCH', addr, length)
+
+    def long_delay_inst(self, flags, pulse, length, delay):
+        return self._write_inst(flags, pulse, 'LONG_DELAY', delay, length)
+
+    def wait_inst(self, flags, pulse, length):
+        if not self.program:
+            raise InstrumentError(
+                    'WAIT cannot be the first instruction of a program.')
+        return self._write_inst(flags, pulse, 'WAIT', 0, length)
+
+    #############
+    ## Private ##
+    #############
+
+    def _write_inst(self, flags, pulse, inst, inst_data, length):
+        if not self._programming:
+            raise InstrumentError('{0} is not being programmed.'.format(self))
+        if pulse not in PulseBlasterESRPRO.pulses:
+            raise InstrumentError("Invalid pulse: '{0}'".format(pulse))
+        if pulse == 'OFF':
+            flags = 0
+        self.program.append((inst, flags, inst_data, length))
+        return len(self.program) - 1
+
+class SimulatedSR830(SR830):
+    """Simulated SR830 lock-in amplifier.
+
+    An `SR830` connected to its own `SimulatedSR830Resource`, so that the
+    SR830 driver itself is exercised.
+
+    Parameters:
+      - source (callable): Called with no arguments, returns the `(X, Y)`
+        signal currently measured.
+      - address (str):
+      - latency (float): See `SimulatedResource`.
+      - settle (float): See `SimulatedResource`.
+
+    Instance Attributes:
+      - resource (SimulatedSR830Resource): The simulated device.
+    """
+
+    def __init__(self, source=None, address='SIM::SR830', latency=0.0,
+            settle=0.0, **kwargs):
+        SR830.__init__(self, address=address, **kwargs)
+        self.resource = SimulatedSR830Resource(source, latency=latency,
+                settle=settle)
+        self.resource_manager_factory = partial(SimulatedResourceManager,
+                {address: self.resource})
+
+    @property
+    def buffers(self):
+        return self.resource.buffers
+
+    def trigger_input(self):
+        """Receives a hardware trigger."""
+        self.resource.trigger_input()
+
+class SimulatedSynth(MWFreqSynth):
+    """Simulated microwave frequency synthesizer.
+
+    Parameters:
+      - freq (float): Initial frequency.
+
+    Instance Attributes:
+      - freq (float): Current frequency.
+      - power (float): Current power.
+    """
+
+    supports_freq_steps = True
+
+    def __init__(self, freq=0.0, **kwargs):
+        MWFreqSynth.__init__(self, **kwargs)
+        self.freq = freq
+        self.power = 0.0
+        self._steps = []
+        self._step = 0
+
+    def trigger_input(self):
+        """Receives a hardware trigger, stepping to the next armed frequency.
+        """
+        if self._step + 1 < len(self._steps):
+            self._step += 1
+            self.freq = self._steps[self._step]
+
+    #######################
+    ## Overriden Methods ##
+    #######################
+
+    def _connect(self):
+        pass
+
+    def _disconnect(self):
+        pass
+
+    def _reset(self):
+        self._steps = []
+
+    def get_power(self):
+        return self.power
+
+    def set_power(self, power, unit=''):
+        self.power = power
+
+    def get_freq(self):
+        return self.freq
+
+    def set_freq(self, freq, unit=''):
+        self.freq = freq
+
+    def arm_freq_steps(self, freqs):
+        self._steps = list(freqs)
+        self._step = 0
+        self.freq = self._steps[0]
+
+#############
+## Private ##
+#############
+
+# Simulated resources of each VISA driver.
+_RESOURCES = [
+    (SR830, SimulatedSR830Resource),
+    (HP8664A, SimulatedHP8664AResource),
+    (HP8673C, SimulatedHP8673CResource),
+]
+
+_OPCODE_NAMES = {opcode: name for name, opcode in PulseBlaster.opcodes.items()}
+
+def _measure(signal, synth):
+    return signal(synth.freq)
+
+class _Function(object):
+    """A function of a simulated library. `restype` and `argtypes` can be set
+    on it, as on ctypes functions, but are ignored.
+    """
+
+    def __init__(self, api, fn):
+        self.restype = None
+        self.argtypes = ()
+        self._api = api
+        self._fn = fn
+
+    def __call__(self, *args):
+        # Arguments may be wrapped in ctypes types, e.g. `c_int(flags)`.
+        args = [getattr(arg, 'value', arg) for arg in args]
+        self._api.num_calls += 1
+        if self._api.latency > 0:
+            self._api._sleep(self._api.latency)
+        return self._fn(*args)
+
+class _PulseProgram(object):
+    """Interpreter of PulseBlaster programs.
+
+    Instance Attributes:
+      - program (list[tuple]): `(inst, flags, inst_data, length)`
+        instructions, where `inst` is the name of the opcode.
+      - time (float): Simulated time the program has been running, in
+        nanoseconds.
+
+    Class Attributes:
+      - max_steps (int): Maximum number of instructions executed per start,
+        so that programs that never stop don't hang the simulation.
+    """
+    max_steps = 10 ** 7
+
+    def __init__(self):
+        self.program = []
+        self.time = 0.0
+        self._outputs = []
+        self._flags = 0
+        self._pc = None
+        self._loops = {}
+        self._stack = []
+
+    def connect_output(self, flags, trigger):
+        self._outputs.append((flags, trigger))
+
+    def start(self):
+        if self._pc is None:
+            self._pc = 0
+            self._loops = {}
+            self._stack = []
+        self._execute()
+
+    def stop(self):
+        self._pc = None
+        self._set_flags(0)
+
+    def _execute(self):
+        """Runs the program until it stops, or waits for a trigger."""
+        for _ in range(self.max_steps):
+            inst, flags, inst_data, length = self.program[self._pc]
+            self._set_flags(flags)
+            if inst == 'LONG_DELAY':
+                self.time += length * inst_data
+            else:
+                self.time += length
+            pc = self._pc + 1
+            if inst == 'STOP':
+                self._pc = None
+                return
+            elif inst == 'WAIT':
+                self._pc = pc
+                return
+            elif inst == 'LOOP':
+                self._loops.setdefault(self._pc, inst_data)
+            elif inst == 'END_LOOP':
+                self._loops[inst_data] -= 1
+                if self._loops[inst_data] > 0:
+                    pc = inst_data
+                else:
+                    del self._loops[inst_data]
+            elif inst == 'JSR':
+                self._stack.append(pc)
+                pc = inst_data
+            elif inst == 'RTS':
+                pc = self._stack.pop()
+            elif inst == 'BRANCH':
+                pc = inst_data
+            self._pc = pc
+        raise InstrumentError('Program did not stop after {0} steps.'.format(
+                self.max_steps))
+
+    def _set_flags(self, flags):
+        rising = flags & ~self._flags
+        self._flags = flags
+        for output_flags, trigger in self._outputs:
+            if rising & output_flags:
+                trigger()
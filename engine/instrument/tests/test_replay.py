@@ -0,0 +1,129 @@
+from instrument import InstrumentError
+from instrument.daq.sr830 import SR830
+from instrument.lib.visainstrument import (TriggerGroup, VisaInstrument,
+        _srq_thread, visa)
+from instrument.mwfreqsynth.hp8664a import HP8664A
+from instrument.replay import *
+from instrument.simulated import simulate
+import unittest
+
+from collections import deque
+import os
+import shutil
+import tempfile
+import threading
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'transcript.jsonl')
+        self.daq = SR830(address='GPIB0::8::INSTR')
+        self.synth = HP8664A(address='GPIB0::19::INSTR')
+        # Records a session on simulated instruments.
+        with simulate([self.daq, self.synth]):
+            with record(self.path) as recording:
+                self.connect()
+                self.synth.set_freq(2.87e9)
+                self.values = self.daq.get_values(1, 2)
+                self.synth.set_freq_inst(2.88e9)
+                self.opc = self.synth._write_opc('FREQ 2.86 GHZ')
+                self.opc.result()
+                self.synth._wait_opc('FREQ 2.85 GHZ', timeout=1)
+                TriggerGroup([self.daq]).trigger()
+        self.num_commands = recording.transcript.num_commands
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        self.assertIsNone(VisaInstrument.resource_manager_factory)
+
+    def connect(self):
+        for instrument in (self.daq, self.synth):
+            instrument._connect()
+
+    def test_transcript(self):
+        entries = load_transcript(self.path)
+        self.assertEqual(len(entries), self.num_commands)
+        self.assertEqual(entries[0]['address'], 'GPIB0::19::INSTR')
+        self.assertEqual(entries[0]['op'], 'write')
+        self.assertIn('read_stb', [entry['op'] for entry in entries])
+        for entry in entries:
+            self.assertGreaterEqual(entry['dt'], 0)
+
+    def test_replay(self):
+        with replay(self.path) as session:
+            self.connect()
+            self.synth.set_freq(2.87e9)
+            self.assertEqual(self.daq.get_values(1, 2), self.values)
+            self.synth.set_freq_inst(2.88e9)
+            self.synth._write_opc('FREQ 2.86 GHZ').result()
+            self.synth._wait_opc('FREQ 2.85 GHZ', timeout=1)
+            TriggerGroup([self.daq]).trigger()
+        for resource in session.resources.values():
+            self.assertEqual(len(resource.entries), 0)
+            self.assertEqual(len(resource.srq_entries), 0)
+
+    def test_srq_channel(self):
+        entries = load_transcript(self.path)
+        srq_ops = {entry['op'] for entry in entries
+                if entry.get('channel') == 'srq'}
+        self.assertIn('wait_on_event', srq_ops)
+        self.assertIn('read_stb', srq_ops)
+        self.assertNotIn('wait_on_event', {entry['op'] for entry in entries
+                if 'channel' not in entry})
+
+    def test_replay_srq_out_of_order(self):
+        # The waiter's commands were recorded before the query, but are only
+        # replayed after it.
+        resource = ReplayResource('GPIB0::8::INSTR', deque([
+            {'op': 'write', 'data': 'TRIG;*OPC', 'dt': 0.0, 'response': None},
+            {'op': 'query', 'data': 'OUTP ? 1', 'dt': 0.0, 'response': '1.0'},
+        ]), srq_entries=deque([
+            {'op': 'wait_on_event', 'data': None, 'dt': 0.0, 'response': None,
+                'channel': 'srq'},
+            {'op': 'read_stb', 'data': None, 'dt': 0.0, 'response': 32,
+                'channel': 'srq'},
+        ]))
+        resource.write('TRIG;*OPC')
+        self.assertEqual(resource.query('OUTP ? 1'), '1.0')
+        responses = []
+        def wait():
+            _srq_thread.active = True
+            resource.wait_on_event(None, None)
+            responses.append(resource.read_stb())
+        thread = threading.Thread(target=wait)
+        thread.start()
+        thread.join()
+        self.assertEqual(responses, [32])
+        self.assertEqual(len(resource.srq_entries), 0)
+
+    def test_diverged(self):
+        with replay(self.path):
+            self.connect()
+            with self.assertRaisesRegex(InstrumentError, 'diverged'):
+                self.synth.set_freq(2.86e9)
+
+    def test_ended(self):
+        with replay(self.path):
+            self.connect()
+            self.synth.set_freq(2.87e9)
+            self.daq.get_values(1, 2)
+            with self.assertRaisesRegex(InstrumentError, 'ended'):
+                self.daq.get_values(1, 2)
+
+    def test_realtime(self):
+        slept = []
+        entries = load_transcript(self.path)
+        with replay(self.path, realtime=True) as session:
+            resource = session.resources['GPIB0::19::INSTR']
+            resource._sleep = slept.append
+            self.synth._connect()
+            self.synth.set_freq(2.87e9)
+        self.assertEqual(slept, [entry['dt'] for entry in entries[:2]])
+
+    def test_replay_error(self):
+        resource = ReplayResource('GPIB0::8::INSTR', deque([{
+            'op': 'query', 'data': 'OUTP ? 1', 'dt': 0.0, 'response': None,
+            'error': int(visa.constants.StatusCode.error_timeout),
+        }]))
+        with self.assertRaises(visa.VisaIOError):
+            resource.query('OUTP ? 1')
@@ -0,0 +1,180 @@
+from instrument import InstrumentError
+from instrument.daq.sr830 import SR830
+from instrument.lib.visainstrument import TriggerGroup, VisaInstrument, visa
+from instrument.mwfreqsynth.hp8664a import HP8664A
+from instrument.mwfreqsynth.hp8673c import HP8673C
+from instrument.pulseblaster import PulseBlaster
+from instrument.pulseblaster.pulseblasteresrpro import PulseBlasterESRPRO
+from instrument.simulated import *
+import unittest
+
+class TestSimulatedResource(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.synth = SimulatedHP8664AResource(latency=0.01, settle=0.5,
+                clock=self.clock, sleep=self.clock.sleep)
+
+    def test_latency_and_settle(self):
+        self.synth.write('FREQ 2.87 GHZ')
+        self.assertAlmostEqual(self.clock.time, 0.01)
+        # The next command waits for the frequency to settle.
+        self.assertEqual(float(self.synth.query('FREQ?')), 2.87e9)
+        self.assertAlmostEqual(self.clock.time, 0.52)
+        self.synth.write('FREQ:STEP:INCR 1 MHZ;FREQ UP')
+        self.assertEqual(float(self.synth.query('FREQ?')), 2.871e9)
+        self.assertEqual(self.synth.num_commands, 4)
+
+    def test_error_queue(self):
+        self.synth.write('FREQ 5 GHZ')
+        self.synth.write('FREQ:BOGUS 1')
+        self.assertEqual(self.synth.query('SYST:ERR? STR'),
+                '-222,"Data out of range"')
+        self.assertEqual(self.synth.query('SYST:ERR? NUM'), '-113')
+        self.assertEqual(self.synth.query('SYST:ERR? NUM'), '0')
+        self.assertEqual(float(self.synth.query('FREQ?')), 1500e6)
+        for _ in range(SimulatedResource.error_queue_size + 1):
+            self.synth.write('BOGUS')
+        self.assertEqual(len(self.synth.errors),
+                SimulatedResource.error_queue_size)
+        self.assertEqual(self.synth.errors[-1], (-350, 'Queue overflow'))
+
+    def test_operation_complete(self):
+        self.synth.write('*CLS;*ESE 1')
+        self.synth.write('FREQ 2 GHZ;*OPC')
+        self.assertEqual(self.synth.read_stb(), 0)
+        self.clock.sleep(0.5)
+        self.assertEqual(self.synth.read_stb(), 1 << 5)
+        self.assertEqual(self.synth.query('*ESR?'), '1')
+        self.assertEqual(self.synth.read_stb(), 0)
+
+    def test_service_request(self):
+        self.synth.enable_event(None, None)
+        self.synth.write('*CLS;*ESE 1;*SRE 32')
+        self.synth.write('FREQ 2 GHZ;*OPC')
+        start = self.clock.time
+        # Returns once the operation completes.
+        self.synth.wait_on_event(None, 1000)
+        self.assertAlmostEqual(self.clock.time - start, 0.5)
+        self.assertEqual(self.synth.read_stb(), (1 << 5) | (1 << 6))
+        self.synth.query('*ESR?')
+        with self.assertRaises(visa.VisaIOError):
+            self.synth.wait_on_event(None, 200)
+        self.assertAlmostEqual(self.clock.time - start, 0.72)
+
+class TestSimulate(unittest.TestCase):
+    def setUp(self):
+        self.daq = SR830(address='GPIB0::8::INSTR')
+        self.synth = HP8664A(address='GPIB0::19::INSTR')
+        self.pb = PulseBlasterESRPRO(clock_freq=100.0, board_num=0)
+        self.simulation = simulate([self.daq, self.synth, self.pb])
+        for instrument in (self.daq, self.synth, self.pb):
+            instrument._connect()
+
+    def tearDown(self):
+        self.simulation.close()
+
+    def test_drivers(self):
+        self.synth.set_freq(2.87, 'GHZ')
+        self.assertEqual(float(self.synth.get_freq()), 2.87e9)
+        self.assertEqual(self.daq.trigger_pipelined(1, 2).result(timeout=1),
+                list(resonance(2.87e9)))
+        with self.assertRaises(InstrumentError) as cm:
+            self.synth.set_freq(5, 'GHZ')
+        self.assertIn('Data out of range', str(cm.exception))
+
+    def test_wait_data_ready(self):
+        self.daq.set_sample_rate(14)
+        self.daq.start_buffer()
+        self.simulation.api.connect_output(1,
+                self.simulation.devices['GPIB0::8::INSTR'].trigger_input)
+        self.pb.start_programming('PULSE_PROGRAM')
+        self.pb.continue_inst(1, 'ON', 100)
+        self.pb.stop_inst(0, 'OFF', 100)
+        self.pb.stop_programming()
+        for num_points in (1, 2):
+            self.pb.start()
+            self.daq.wait_data_ready(timeout=1)
+            self.assertEqual(self.daq.get_num_points(), num_points)
+        with self.assertRaisesRegex(InstrumentError, 'did not request'):
+            self.daq.wait_data_ready(timeout=0.01)
+        self.synth._wait_opc('FREQ 2 GHZ', timeout=1)
+        self.assertEqual(float(self.synth.get_freq()), 2e9)
+
+    def test_pulseblaster(self):
+        triggers = []
+        self.simulation.api.connect_output(1, lambda: triggers.append(1))
+        self.pb.start_programming('PULSE_PROGRAM')
+        start = self.pb.loop_inst(1, 'ON', 100, 3)
+        self.pb.continue_inst(0, 'ON', 100)
+        self.pb.end_loop_inst(0, 'ON', 100, start)
+        self.pb.stop_inst(1, 'OFF', 100)
+        self.pb.stop_programming()
+        self.pb.start()
+        self.assertEqual(len(triggers), 3)
+        self.assertEqual(self.simulation.api.time, 1000)
+        self.assertEqual(self.simulation.api.clock_freq, 100.0)
+        with self.assertRaises(InstrumentError):
+            self.pb.continue_inst(0, 'ON', 100)
+
+    def test_close(self):
+        self.simulation.close()
+        self.assertIsNone(VisaInstrument.resource_manager_factory)
+        self.assertIsNone(PulseBlaster.dll_factory)
+        self.simulation = simulate([HP8673C(address='GPIB0::20::INSTR')])
+        with self.assertRaises(InstrumentError):
+            simulate([self.daq, SR830(address='GPIB0::8::INSTR')])
+
+class TestTriggerGroup(unittest.TestCase):
+    def setUp(self):
+        self.daqs = [SR830(address='GPIB0::{0}::INSTR'.format(address))
+                for address in (8, 9)]
+        self.synth = HP8664A(address='GPIB0::19::INSTR')
+        self.other = SR830(address='GPIB1::8::INSTR')
+        self.simulation = simulate(self.daqs + [self.synth, self.other])
+        for instrument in self.daqs + [self.synth, self.other]:
+            instrument._connect()
+
+    def tearDown(self):
+        self.simulation.close()
+
+    def test_trigger(self):
+        for daq in self.daqs:
+            daq.set_sample_rate(14)
+            daq.start_buffer()
+        group = TriggerGroup(self.daqs)
+        for _ in range(3):
+            group.trigger()
+        for daq in self.daqs:
+            self.assertEqual(daq.get_num_points(), 3)
+        self.assertEqual(group._interface.num_triggers, 3)
+        # Triggers don't send any commands to the devices.
+        for daq in self.daqs:
+            self.assertEqual(self.simulation.devices[daq.address].num_commands,
+                    6)
+        group.close()
+        self.assertIsNone(group._interface)
+
+    def test_invalid(self):
+        with self.assertRaisesRegex(InstrumentError, 'does not support'):
+            TriggerGroup([self.daqs[0], self.synth])
+        with self.assertRaisesRegex(InstrumentError, 'share a bus'):
+            TriggerGroup([self.daqs[0], self.other])
+        with self.assertRaises(InstrumentError):
+            TriggerGroup([])
+
+###############
+## Utilities ##
+###############
+
+class FakeClock(object):
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+    def sleep(self, seconds):
+        self.time += seconds
+
+if __name__ == '__main__':
+    unittest.main()
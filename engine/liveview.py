@@ -0,0 +1,230 @@
+"""
+Live View Module
+
+Live plotting of experiment data, rendered out of process so that plotting
+never slows down acquisition.
+
+The engine publishes each data point into a `SharedRingBuffer`, a ring buffer
+in shared memory. A separate viewer process polls the buffer at its own frame
+rate and plots the most recent points. Publishing is a single copy into shared
+memory and never waits on the viewer; if the viewer falls behind, it simply
+skips to the newest points, dropping frames rather than data.
+
+The buffer is only destroyed once the viewer has attached to it, so that the
+viewer still shows the points of runs that end before it has started.
+
+Importable:
+  - SharedRingBuffer
+  - LiveView
+"""
+
+import multiprocessing
+import time
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+__all__ = ['SharedRingBuffer', 'LiveView']
+
+# Header fields, stored as int64 at the start of the shared memory block.
+_COUNT = 0      # Total number of rows written.
+_COLUMNS = 1    # Number of columns in use. 0 until the first row is written.
+_CLOSED = 2     # Nonzero once the writer is done.
+_HEADER_SIZE = 3
+
+class SharedRingBuffer(object):
+    """A single-writer ring buffer of float rows in shared memory.
+
+    Readers never block the writer. A reader that falls more than `capacity`
+    rows behind loses the overwritten rows.
+
+    Parameters:
+      - capacity (int): Number of rows kept in the buffer.
+      - max_columns (int): Maximum number of columns per row. Extra columns are
+        dropped.
+      - name (str): Name of an existing buffer to attach to. If None, a new
+        buffer is created.
+
+    Instance Attributes:
+      - name (str): Name of the shared memory block, used to attach to it from
+        another process.
+      - capacity (int)
+      - max_columns (int)
+    """
+
+    def __init__(self, capacity=4096, max_columns=8, name=None):
+        self.capacity = capacity
+        self.max_columns = max_columns
+        size = 8 * (_HEADER_SIZE + capacity * max_columns)
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self._header = np.ndarray((_HEADER_SIZE,), dtype=np.int64,
+                buffer=self._shm.buf)
+        self._rows = np.ndarray((capacity, max_columns), dtype=np.float64,
+                buffer=self._shm.buf, offset=8 * _HEADER_SIZE)
+        if self._owner:
+            self._header[:] = 0
+
+    @property
+    def count(self):
+        """Total number of rows written."""
+        return int(self._header[_COUNT])
+
+    @property
+    def closed(self):
+        """Whether the writer has finished writing."""
+        return bool(self._header[_CLOSED])
+
+    def write(self, row):
+        """Writes a row, overwriting the oldest row if the buffer is full.
+
+        Parameters:
+          - row (sequence[float]): Row of values.
+        """
+        count = self._header[_COUNT]
+        num_columns = min(len(row), self.max_columns)
+        self._rows[count % self.capacity, :num_columns] = row[:num_columns]
+        if self._header[_COLUMNS] == 0:
+            self._header[_COLUMNS] = num_columns
+        # The count is only advanced once the row is written, so readers never
+        # see a partially written row.
+        self._header[_COUNT] = count + 1
+
+    def read(self, since=0):
+        """Reads the rows written since a given count.
+
+        Parameters:
+          - since (int): Count returned by the previous read, or 0.
+
+        Returns:
+          - tuple(np.ndarray, int): The rows that are still in the buffer, and
+            the count to pass to the next read.
+        """
+        count = self.count
+        start = max(since, count - self.capacity)
+        indices = np.arange(start, count) % self.capacity
+        rows = self._rows[indices, :int(self._header[_COLUMNS])]
+        # Rows may have been overwritten while they were being copied,
+        # including the row the writer is currently writing.
+        overwritten = self.count - self.capacity + 1
+        if overwritten > start:
+            rows = rows[overwritten - start:]
+        return rows, count
+
+    def close_writer(self):
+        """Marks the buffer as finished, so readers stop polling it."""
+        self._header[_CLOSED] = 1
+
+    def close(self):
+        """Detaches from the buffer. The buffer is destroyed once the process
+        that created it closes it.
+        """
+        # Views of the buffer must be released before it can be closed.
+        self._header = self._rows = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+class LiveView(object):
+    """Live plot of experiment data, rendered by a viewer process.
+
+    Rows are plotted in the `ExperimentData` format, i.e. each output column
+    against the input in the first column.
+
+    Parameters:
+      - capacity (int): Number of most recent points plotted.
+      - max_columns (int): Maximum number of columns per point.
+      - frame_interval (float): Time between frames in seconds.
+      - attach_timeout (float): Maximum time to wait for the viewer to attach
+        to the buffer when closing, in seconds.
+
+    Instance Attributes:
+      - buffer (SharedRingBuffer): Buffer points are published to.
+      - viewer (multiprocessing.Process): The viewer process.
+      - attach_timeout (float)
+
+    Class Attributes:
+      - viewer_target (callable): Entry point of the viewer process, called
+        with the buffer's name, capacity and max columns, the frame interval,
+        and a `multiprocessing.Event` to set once attached to the buffer.
+        Defaults to plotting with matplotlib.
+    """
+    viewer_target = None
+
+    def __init__(self, capacity=4096, max_columns=8, frame_interval=0.1,
+            attach_timeout=10.0):
+        self.buffer = SharedRingBuffer(capacity, max_columns)
+        self.attach_timeout = attach_timeout
+        self._attached = multiprocessing.Event()
+        self.viewer = multiprocessing.Process(
+                target=type(self).viewer_target or _run_viewer,
+                args=(self.buffer.name, capacity, max_columns, frame_interval,
+                        self._attached),
+                daemon=True,
+        )
+        self.viewer.start()
+
+    def publish(self, row):
+        """Publishes a point. Never waits for the viewer.
+
+        Parameters:
+          - row (sequence[float]): The point, as a row of values.
+        """
+        self.buffer.write(row)
+
+    def close(self):
+        """Stops publishing points. The viewer keeps showing the last frame
+        until its window is closed, or the engine exits.
+
+        Waits for the viewer to attach to the buffer before destroying it,
+        unless the viewer exits first or `attach_timeout` expires.
+        """
+        self.buffer.close_writer()
+        deadline = time.monotonic() + self.attach_timeout
+        while not self._attached.wait(0.05):
+            if not self.viewer.is_alive() or time.monotonic() >= deadline:
+                break
+        self.buffer.close()
+
+
+#############
+## Private ##
+#############
+
+def _run_viewer(name, capacity, max_columns, frame_interval, attached):
+    """Entry point of the viewer process."""
+    # Attaches before importing matplotlib, which can take seconds, so that
+    # the engine can destroy the buffer as soon as possible.
+    buffer = SharedRingBuffer(capacity, max_columns, name=name)
+    attached.set()
+    import matplotlib.pyplot as plt
+
+    # Keep a copy of the newest rows, since the buffer is destroyed once the
+    # engine closes it, although it stays mapped.
+    rows = np.empty((0, 0))
+    count = 0
+    lines = []
+    fig, ax = plt.subplots()
+    while plt.fignum_exists(fig.number):
+        new_rows, count = buffer.read(count)
+        if len(new_rows):
+            if rows.shape[1:] != new_rows.shape[1:]:
+                rows = new_rows[:0]
+            rows = np.concatenate([rows, new_rows])[-capacity:]
+            if not lines:
+                lines = ax.plot(rows[:, 0], rows[:, 1:])
+            for i, line in enumerate(lines):
+                line.set_data(rows[:, 0], rows[:, i + 1])
+            ax.relim()
+            ax.autoscale_view()
+        if buffer.closed:
+            break
+        plt.pause(frame_interval)
+    buffer.close()
+    if plt.fignum_exists(fig.number):
+        plt.show()
@@ -0,0 +1,213 @@
+"""
+Logger Module
+
+Structured binary event log of a run. Events are packed as fixed-size binary
+records into a preallocated ring buffer, without any string formatting, so
+that logging is cheap enough to leave on in the acquisition loop. A
+background thread flushes new records to a log file, and `decode` renders
+them as text afterwards:
+
+    python engine/logger.py RUN_DIR/events.log
+
+Each record holds a timestamp, the ID of the instrument it concerns (if
+any), an event code and a small payload: an integer `arg` and a float
+`value`, whose meaning depends on the event (see `EVENTS`).
+
+If the flush thread falls behind by more than the size of the buffer, the
+oldest records are overwritten, and counted as dropped, rather than stalling
+the acquisition loop.
+
+Importable:
+  - EngineLogger
+  - EVENTS
+  - decode
+  - format_record
+"""
+
+import struct
+import sys
+import threading
+import time
+
+__all__ = ['EngineLogger', 'EVENTS', 'decode', 'format_record']
+
+MAGIC = b'PEL1'
+# Magic, monotonic time (ns) and wall time (s) the log was started at.
+HEADER = struct.Struct('<4sqd')
+# Timestamp (ns), instrument ID, event code, arg, value.
+RECORD = struct.Struct('<qHHId')
+
+# Instrument ID of events that don't concern an instrument.
+NO_INSTRUMENT = 0xFFFF
+
+# Event codes.
+RUN_START = 1       # arg: resumed points.
+RUN_END = 2         # arg: 1 if the run completed, 0 if it failed.
+POINT = 3           # arg: number of points done.
+CHECKPOINT = 4      # arg: number of points done.
+READ = 5            # arg: bytes received, value: latency (s).
+WRITE = 6           # arg: bytes sent, value: latency (s).
+MESSAGE = 7         # arg and value are defined by the experiment.
+
+# Names of the event codes.
+EVENTS = {
+    RUN_START: 'RUN_START',
+    RUN_END: 'RUN_END',
+    POINT: 'POINT',
+    CHECKPOINT: 'CHECKPOINT',
+    READ: 'READ',
+    WRITE: 'WRITE',
+    MESSAGE: 'MESSAGE',
+}
+
+class EngineLogger(object):
+    """Experiment log.
+
+    A binary event log, for debugging and timing runs. Records are kept in a
+    ring buffer, and flushed to a file by a background thread if a path is
+    given.
+
+    Parameters:
+      - path (str): File to flush records to. If None, records are only kept
+        in the buffer.
+      - capacity (int): Number of records the buffer holds.
+      - flush_interval (float): Time between flushes, in seconds.
+
+    Instance Attributes:
+      - path (str)
+      - capacity (int)
+      - num_logged (int): Number of records logged.
+      - num_dropped (int): Number of records overwritten before they were
+        flushed.
+    """
+
+    def __init__(self, path=None, capacity=65536, flush_interval=0.1):
+        self.path = path
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.num_logged = 0
+        self.num_dropped = 0
+        self._buffer = bytearray(capacity * RECORD.size)
+        self._lock = threading.Lock()
+        self._flushed = 0
+        self._file = None
+        self._thread = None
+        self._closed = threading.Event()
+        if path is not None:
+            self._file = open(path, 'wb')
+            self._file.write(HEADER.pack(MAGIC, time.perf_counter_ns(),
+                    time.time()))
+            self._thread = threading.Thread(target=self._run,
+                    name='EngineLogger')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def log(self, event, instrument=NO_INSTRUMENT, arg=0, value=0.0):
+        """Logs an event.
+
+        Parameters:
+          - event (int): Event code, e.g. `logger.MESSAGE`.
+          - instrument (int): ID of the instrument, if any.
+          - arg (int): Unsigned 32 bit integer payload.
+          - value (float): Float payload.
+        """
+        with self._lock:
+            RECORD.pack_into(self._buffer,
+                    self.num_logged % self.capacity * RECORD.size,
+                    time.perf_counter_ns(), instrument, event, arg, value)
+            self.num_logged += 1
+
+    def records(self):
+        """Returns the records still in the buffer.
+
+        Returns:
+          - list[tuple]: `(timestamp, instrument, event, arg, value)` records,
+            oldest first. Timestamps are monotonic, in nanoseconds.
+        """
+        with self._lock:
+            first = max(self.num_logged - self.capacity, 0)
+            data = self._copy(first, self.num_logged)
+        return list(RECORD.iter_unpack(data))
+
+    def flush(self):
+        """Writes the records logged since the last flush to the file."""
+        if self._file is None:
+            return
+        with self._lock:
+            first = self._flushed
+            if self.num_logged - first > self.capacity:
+                self.num_dropped += self.num_logged - first - self.capacity
+                first = self.num_logged - self.capacity
+            data = self._copy(first, self.num_logged)
+            self._flushed = self.num_logged
+        self._file.write(data)
+        self._file.flush()
+
+    def close(self):
+        """Stops the flush thread, flushes the remaining records and closes
+        the file.
+        """
+        if self._thread is not None:
+            self._closed.set()
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    #############
+    ## Private ##
+    #############
+
+    def _copy(self, first, last):
+        """Copies records `[first, last)` out of the ring buffer."""
+        if first == last:
+            return b''
+        start = first % self.capacity * RECORD.size
+        end = last % self.capacity * RECORD.size
+        if start < end:
+            return bytes(self._buffer[start:end])
+        return bytes(self._buffer[start:]) + bytes(self._buffer[:end])
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+def decode(path):
+    """Reads the records of a log file.
+
+    Parameters:
+      - path (str): Path to a log file written by `EngineLogger`.
+
+    Returns:
+      - generator[tuple]: Yields `(time, instrument, event, arg, value)`
+        records, where `time` is the wall time of the event in seconds.
+    """
+    with open(path, 'rb') as f:
+        magic, start_ns, start_time = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("'{0}' is not an engine log.".format(path))
+        while True:
+            data = f.read(RECORD.size * 4096)
+            for timestamp, instrument, event, arg, value in RECORD.iter_unpack(
+                    data[:len(data) - len(data) % RECORD.size]):
+                yield (start_time + (timestamp - start_ns) * 1e-9,
+                        instrument, event, arg, value)
+            if len(data) < RECORD.size * 4096:
+                return
+
+def format_record(record):
+    """Renders a decoded record as a line of text."""
+    wall_time, instrument, event, arg, value = record
+    if instrument == NO_INSTRUMENT:
+        instrument = '-'
+    return '{0}.{1:06d} {2:>5} {3:<10} {4:>10} {5:.6g}'.format(
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(wall_time)),
+            int(wall_time % 1 * 1e6), instrument,
+            EVENTS.get(event, str(event)), arg, value)
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        for record in decode(path):
+            print(format_record(record))
@@ -0,0 +1,201 @@
+"""
+Profiling Module
+
+Per-phase CPU and memory profiling of a run. Each phase of a run (loading
+the experiment, connecting instruments, and the experiment's setup, run and
+analysis) is profiled separately with cProfile, and its allocations are
+traced with tracemalloc, so that the report shows which functions each phase
+spends its time in, and how much memory it allocates where.
+
+Profiling every sweep point of a long run is slow, so the profiler can
+instead sample only every Nth point of the run phase. Allocations are traced
+throughout.
+
+Run from the command line with `--profile`:
+
+    python engine experiment.py --profile --profile-every 10
+
+Importable:
+  - Profiler
+  - PHASES
+"""
+
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+__all__ = ['Profiler', 'PHASES']
+
+# Phases of a run, in the order they are reported.
+PHASES = ('load', 'connect', 'setup', 'run', 'analyze')
+
+# Allocations by the profiler itself, which aren't reported.
+_FILTERS = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+class Profiler(object):
+    """Profiles the phases of a run.
+
+    Parameters:
+      - sample_every (int): Profile every Nth sweep point of the run phase.
+        If 1, the whole run phase is profiled, including any time outside
+        of sweep points.
+      - top (int): Number of functions and allocation sites reported per
+        phase.
+
+    Instance Attributes:
+      - phases (dict[str -> _Phase]): Profile of each phase profiled so far.
+    """
+
+    def __init__(self, sample_every=1, top=15):
+        if sample_every < 1:
+            raise ValueError('sample_every must be at least 1.')
+        self.sample_every = sample_every
+        self.top = top
+        self.phases = {}
+        self._current = None
+        self._sampling = False
+
+    @contextmanager
+    def phase(self, name):
+        """Profiles a phase of the run.
+
+            with profiler.phase('setup'):
+                experiment.setup()
+
+        Parameters:
+          - name (str): Name of the phase, e.g. from `PHASES`.
+        """
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        phase = self.phases.setdefault(name, _Phase(name))
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        # The run phase is only profiled at sampled points.
+        sampled = name == 'run' and self.sample_every > 1
+        self._current = phase
+        start = time.perf_counter()
+        if not sampled:
+            phase.profile.enable()
+        try:
+            yield
+        finally:
+            if not sampled:
+                phase.profile.disable()
+            else:
+                self.stop_point()
+            phase.elapsed += time.perf_counter() - start
+            self._current = None
+            phase.peak = max(phase.peak,
+                    tracemalloc.get_traced_memory()[1] - baseline)
+            after = tracemalloc.take_snapshot()
+            phase.allocations = after.filter_traces(_FILTERS).compare_to(
+                    before.filter_traces(_FILTERS), 'lineno')[:self.top]
+            if started_tracing:
+                tracemalloc.stop()
+
+    def start_point(self, index):
+        """Starts profiling a sweep point of the run phase, if it is sampled.
+
+        Parameters:
+          - index (int): Index of the point in the run.
+        """
+        phase = self._current
+        if phase is None or phase.name != 'run' or self.sample_every == 1:
+            return
+        phase.num_points += 1
+        if index % self.sample_every == 0:
+            phase.num_sampled += 1
+            phase.profile.enable()
+            self._sampling = True
+
+    def stop_point(self):
+        """Stops profiling the current sweep point, if it is sampled."""
+        if self._sampling:
+            self._current.profile.disable()
+            self._sampling = False
+
+    def report(self):
+        """Returns a report of each phase profiled.
+
+        Returns:
+          - str: For each phase, its time, peak allocated memory, the
+            functions it spent the most time in and the lines that
+            allocated the most memory.
+        """
+        names = [name for name in PHASES if name in self.phases]
+        names += sorted(set(self.phases) - set(PHASES))
+        return '\n\n'.join(self.phases[name].report(self.top)
+                for name in names)
+
+class _Phase(object):
+    """Profile of a phase.
+
+    Instance Attributes:
+      - name (str)
+      - profile (cProfile.Profile)
+      - elapsed (float): Time spent in the phase, in seconds.
+      - peak (int): Peak memory allocated during the phase, in bytes.
+      - allocations (list[tracemalloc.StatisticDiff]): Lines that allocated
+        the most memory during the phase.
+      - num_points (int): Number of sweep points in the phase, if sampled.
+      - num_sampled (int): Number of sweep points profiled.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.elapsed = 0.0
+        self.peak = 0
+        self.allocations = []
+        self.num_points = 0
+        self.num_sampled = 0
+
+    def report(self, top):
+        header = '== {0} ({1:.3f}s, peak {2}'.format(self.name, self.elapsed,
+                _format_size(self.peak))
+        if self.num_points:
+            header += ', {0}/{1} points profiled'.format(self.num_sampled,
+                    self.num_points)
+        lines = [header + ') ==']
+
+        stream = io.StringIO()
+        try:
+            stats = pstats.Stats(self.profile, stream=stream)
+        except TypeError:
+            # Nothing was profiled.
+            lines.append('No functions profiled.')
+        else:
+            stats.sort_stats('cumulative').print_stats(top)
+            # Skips the summary lines before the table.
+            table = stream.getvalue().strip().splitlines()
+            lines.extend(line for line in table
+                    if line.strip() and 'function calls' not in line
+                    and not line.lstrip().startswith(('Ordered by',
+                            'List reduced')))
+
+        lines.append('Top allocations:')
+        for diff in self.allocations:
+            if diff.size_diff <= 0:
+                continue
+            frame = diff.traceback[0]
+            lines.append('  {0:>10} {1:>8} blocks  {2}:{3}'.format(
+                    _format_size(diff.size_diff), diff.count_diff,
+                    frame.filename, frame.lineno))
+        return '\n'.join(lines)
+
+def _format_size(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return '{0:.1f} {1}'.format(size, unit)
+        size /= 1024.0
+    return '{0:.1f} GiB'.format(size)
@@ -0,0 +1,251 @@
+"""
+Storage Module
+
+Utilities for persisting experiment runs to disk and loading them back.
+
+A stored run is a directory containing:
+  - `run.json`: Run metadata (experiment, parameters, number of rows and
+    columns, etc.).
+  - `data.bin`: Raw little-endian float64 rows, written in C order. Rows can be
+    appended as they are acquired, and the file can be memory-mapped without
+    reading it into memory.
+  - `checkpoint.json`: Optional. Progress of the run, written periodically by
+    the engine so that an interrupted run can be resumed.
+
+Importable:
+  - RunWriter
+  - StoredRun
+  - save_run
+  - load_run
+  - find_runs
+  - save_checkpoint
+  - load_checkpoint
+"""
+
+import json
+import os
+
+import numpy as np
+
+__all__ = [
+    'RunWriter',
+    'StoredRun',
+    'save_run',
+    'load_run',
+    'find_runs',
+    'save_checkpoint',
+    'load_checkpoint',
+]
+
+METADATA_FILE = 'run.json'
+DATA_FILE = 'data.bin'
+CHECKPOINT_FILE = 'checkpoint.json'
+DTYPE = np.dtype('<f8')
+
+class RunWriter(object):
+    """Writes an experiment run to a run directory.
+
+    Rows are appended to the data file as they are written, and the metadata
+    file is rewritten on `flush` and `close`, so that a partially written run
+    can still be loaded.
+
+    Parameters:
+      - path (str): Path to the run directory. Created if it does not exist.
+      - metadata (dict): JSON-serializable run metadata.
+      - resume_rows (int): If given, the run directory's existing data is
+        kept up to this many rows, and new rows are appended after them.
+        Used to resume an interrupted run.
+
+    Instance Attributes:
+      - path (str): Path to the run directory.
+      - metadata (dict): Run metadata.
+      - rows (int): Number of rows written.
+      - columns (int): Number of columns per row. None until the first row is
+        written.
+    """
+
+    def __init__(self, path, metadata=None, resume_rows=None):
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.rows = 0
+        self.columns = None
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        data_path = os.path.join(path, DATA_FILE)
+        if resume_rows is None:
+            self._file = open(data_path, 'wb')
+        else:
+            # Drop any rows written after the point we are resuming from.
+            with open(os.path.join(path, METADATA_FILE)) as f:
+                self.columns = json.load(f)['columns'] or None
+            self.rows = resume_rows
+            self._file = open(data_path, 'r+b')
+            self._file.truncate(self.offset)
+            self._file.seek(self.offset)
+        self._write_metadata()
+
+    @property
+    def offset(self):
+        """Size of the written data, in bytes."""
+        return self.rows * (self.columns or 0) * DTYPE.itemsize
+
+    def append(self, row):
+        """Appends a single row to the run.
+
+        Parameters:
+          - row (sequence[float]): A row of values.
+        """
+        self.extend(np.asarray(row, dtype=DTYPE).reshape(1, -1))
+
+    def extend(self, rows):
+        """Appends a block of rows to the run.
+
+        Parameters:
+          - rows (array-like): A 2D array of values, one row per data point.
+        """
+        rows = np.ascontiguousarray(rows, dtype=DTYPE)
+        if rows.ndim != 2:
+            raise ValueError('Expected a 2D block of rows, got shape {0}.'.format(
+                    rows.shape))
+        if self.columns is None:
+            self.columns = rows.shape[1]
+        elif rows.shape[1] != self.columns:
+            raise ValueError('Expected rows with {0} columns, got {1}.'.format(
+                    self.columns, rows.shape[1]))
+        self._file.write(rows.tobytes())
+        self.rows += rows.shape[0]
+
+    def flush(self):
+        """Flushes written rows to disk and updates the metadata file."""
+        self._file.flush()
+        self._write_metadata()
+
+    def close(self):
+        """Flushes and closes the run."""
+        if self._file.closed:
+            return
+        self._file.close()
+        self._write_metadata()
+
+    def _write_metadata(self):
+        metadata = dict(self.metadata)
+        metadata.update({
+            'rows': self.rows,
+            'columns': self.columns or 0,
+            'dtype': DTYPE.str,
+        })
+        _write_json(os.path.join(self.path, METADATA_FILE), metadata)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class StoredRun(object):
+    """A run loaded from a run directory.
+
+    Instance Attributes:
+      - path (str): Path to the run directory.
+      - metadata (dict): Run metadata.
+      - data (np.ndarray): A (rows, columns) array. Memory-mapped read-only
+        unless the run was loaded with `mmap=False`.
+    """
+
+    def __init__(self, path, metadata, data):
+        self.path = path
+        self.metadata = metadata
+        self.data = data
+
+    def __str__(self):
+        return 'StoredRun({0}, {1}x{2})'.format(
+                self.path, self.data.shape[0], self.data.shape[1])
+
+def save_run(path, data, metadata=None):
+    """Saves a 2D array of rows as a run.
+
+    Parameters:
+      - path (str): Path to the run directory.
+      - data (array-like): A 2D array, one row per data point.
+      - metadata (dict): JSON-serializable run metadata.
+    """
+    with RunWriter(path, metadata) as writer:
+        data = np.asarray(data, dtype=DTYPE)
+        if data.size:
+            writer.extend(data)
+
+def load_run(path, mmap=True):
+    """Loads a run from a run directory.
+
+    Only the rows recorded in the metadata file are loaded, so rows being
+    written by a concurrent `RunWriter` are ignored until it flushes.
+
+    Parameters:
+      - path (str): Path to the run directory.
+      - mmap (bool): Whether the data should be memory-mapped instead of read
+        into memory.
+
+    Returns:
+      - StoredRun: The loaded run.
+    """
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    shape = (metadata['rows'], metadata['columns'])
+    dtype = np.dtype(metadata.get('dtype', DTYPE.str))
+    data_path = os.path.join(path, DATA_FILE)
+    if shape[0] == 0 or shape[1] == 0:
+        data = np.empty(shape, dtype=dtype)
+    elif mmap:
+        data = np.memmap(data_path, dtype=dtype, mode='r', shape=shape)
+    else:
+        data = np.fromfile(data_path, dtype=dtype,
+                count=shape[0] * shape[1]).reshape(shape)
+    return StoredRun(path, metadata, data)
+
+def save_checkpoint(path, checkpoint):
+    """Saves the checkpoint of a run. The checkpoint is replaced atomically,
+    so an interruption never leaves a partially written checkpoint behind.
+
+    Parameters:
+      - path (str): Path to the run directory.
+      - checkpoint (dict): JSON-serializable checkpoint.
+    """
+    _write_json(os.path.join(path, CHECKPOINT_FILE), checkpoint)
+
+def load_checkpoint(path):
+    """Loads the checkpoint of a run.
+
+    Parameters:
+      - path (str): Path to the run directory.
+
+    Returns:
+      - dict: The checkpoint.
+    """
+    with open(os.path.join(path, CHECKPOINT_FILE)) as f:
+        return json.load(f)
+
+def find_runs(root):
+    """Finds all run directories under a directory.
+
+    Parameters:
+      - root (str): Directory to search.
+
+    Returns:
+      - list[str]: Sorted paths of run directories.
+    """
+    runs = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        if METADATA_FILE in filenames:
+            runs.append(dirpath)
+    return sorted(runs)
+
+
+#############
+## Private ##
+#############
+
+def _write_json(path, obj):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
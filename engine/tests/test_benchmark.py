@@ -0,0 +1,26 @@
+from benchmark import BENCHMARKS, compare, run_benchmarks
+import unittest
+
+class TestBenchmarks(unittest.TestCase):
+    def test_run_benchmarks(self):
+        results = run_benchmarks(['data_append', 'visa_io'], scale=0.001)
+        self.assertEqual(sorted(results['benchmarks']),
+                ['data_append', 'visa_io'])
+        for metrics in results['benchmarks'].values():
+            for value in metrics.values():
+                self.assertGreater(value, 0)
+        self.assertIn('engine_run', BENCHMARKS)
+
+    def test_compare(self):
+        baseline = {'benchmarks': {'a': {'read_us': 2.0, 'points_per_s': 10.0}}}
+        results = {'benchmarks': {
+            'a': {'read_us': 1.0, 'points_per_s': 5.0, 'new_us': 1.0},
+            'b': {'read_us': 1.0},
+        }}
+        self.assertEqual(sorted(compare(baseline, results)), [
+            ('a', 'points_per_s', 10.0, 5.0, 0.5),
+            ('a', 'read_us', 2.0, 1.0, 2.0),
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
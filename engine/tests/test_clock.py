@@ -0,0 +1,70 @@
+from clock import SweepClock, VirtualClock
+import unittest
+
+class TestSweepClock(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        self.sleeps = []
+        self.clock = SweepClock(0.2, clock=self.time, sleep=self.sleep)
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def test_no_drift(self):
+        # Each point takes 0.05s to acquire, which a fixed sleep would add to
+        # every period.
+        for _ in range(10):
+            self.clock.tick()
+            self.now += 0.05
+        self.assertAlmostEqual(self.now, 100.0 + 10 * 0.2 + 0.05)
+        for seconds in self.sleeps[1:]:
+            self.assertAlmostEqual(seconds, 0.15)
+        self.assertEqual(self.clock.stats()['max_lateness'], 0.0)
+
+    def test_late_point(self):
+        self.clock.tick()
+        self.now += 0.3
+        self.assertAlmostEqual(self.clock.tick(), 0.1)
+        self.assertEqual(self.sleeps[1:], [])
+        # The next point is due on the original schedule.
+        self.clock.tick()
+        self.assertAlmostEqual(self.now, 100.6)
+
+    def test_missed_deadlines(self):
+        self.clock.tick()
+        self.now += 0.75
+        self.clock.tick()
+        self.assertEqual(self.clock.num_missed, 2)
+        self.clock.tick()
+        # Missed deadlines are skipped, not caught up.
+        self.assertAlmostEqual(self.now, 101.0)
+        stats = self.clock.stats()
+        self.assertEqual(stats['ticks'], 3)
+        self.assertEqual(stats['missed'], 2)
+        self.assertAlmostEqual(stats['max_lateness'], 0.55)
+
+    def test_eta(self):
+        self.assertAlmostEqual(self.clock.eta(10), 2.0)
+        self.clock.tick()
+        self.now += 0.05
+        self.assertAlmostEqual(self.clock.eta(10), 1.95)
+
+if __name__ == '__main__':
+    unittest.main()
+
+class TestVirtualClock(unittest.TestCase):
+    def test_sleep(self):
+        now = [100.0]
+        virtual = VirtualClock(clock=lambda: now[0])
+        clock = SweepClock(0.2, clock=virtual.time, sleep=virtual.sleep)
+        for _ in range(10):
+            clock.tick()
+            now[0] += 0.05
+        # Only the time spent acquiring points passed.
+        self.assertAlmostEqual(now[0], 100.5)
+        self.assertAlmostEqual(virtual.time(), 100.0 + 10 * 0.2 + 0.05)
+        self.assertEqual(clock.num_missed, 0)
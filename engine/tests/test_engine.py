@@ -0,0 +1,475 @@
+from engine import Engine, ExperimentData
+from analysis.stream import BoxcarDecimator, Pipeline
+from experiment import ExperimentError, load_experiment
+from logger import EVENTS, decode
+from storage import load_checkpoint, load_run
+from tracing import TRACER
+import unittest
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+try:
+    import matplotlib.pylab as plt
+except ImportError:
+    # Experiments plotting their analysis can't be run.
+    plt = None
+
+class TestExperimentData(unittest.TestCase):
+    def test_points_to_rows(self):
+        data = ExperimentData()
+        data.append((1.0, [2.0, 3.0]))
+        data.append((2.0, 4.0))
+        self.assertEqual(len(data), 2)
+        self.assertEqual(list(data), [[1.0, 2.0, 3.0], [2.0, 4.0]])
+        self.assertEqual(ExperimentData().to_array().shape, (0, 0))
+
+    def test_streams(self):
+        data = ExperimentData(block_size=4)
+        data.append((-1.0, [0.0]))
+        decimator = Pipeline(BoxcarDecimator(2))
+        data.add_stream(decimator)
+        for i in range(5):
+            data.append((float(i), [i * 2.0]))
+        # Only a full block of 4 points has been passed to the stream.
+        np.testing.assert_allclose(decimator.to_array(), [[0.5, 1], [2.5, 5]])
+        data.flush_streams()
+        np.testing.assert_allclose(data.to_array()[1:, 1], np.arange(5) * 2)
+        np.testing.assert_allclose(decimator.to_array(),
+                [[0.5, 1], [2.5, 5], [4, 8]])
+
+    def test_streams_without_rows(self):
+        data = ExperimentData(block_size=2)
+        data.append((-1.0, [0.0]))
+        decimator = Pipeline(BoxcarDecimator(3))
+        data.add_stream(decimator, keep_rows=False)
+        for i in range(6):
+            data.append((float(i), [i * 3.0]))
+        data.flush_streams()
+        self.assertEqual(len(data), 7)
+        self.assertEqual(data.rows, [[-1.0, 0.0]])
+        np.testing.assert_allclose(decimator.to_array(), [[1, 3], [4, 12]])
+
+    def test_accumulate(self):
+        data = ExperimentData()
+        data.accumulate(3)
+        for scan in range(4):
+            for i in range(3):
+                if scan < 3 or i < 2:
+                    data.append((i, [scan * (i + 1)]))
+        self.assertEqual((len(data), data.num_scans), (11, 3))
+        self.assertEqual(data.rows, [])
+        np.testing.assert_allclose(data.to_array(), [[0, 1.5], [1, 3], [2, 3]])
+        np.testing.assert_allclose(data.std_error()[:, 0], 0)
+        np.testing.assert_allclose(data.std_error()[2, 1], np.sqrt(3))
+        with self.assertRaises(ExperimentError):
+            data.accumulate(3)
+
+    def test_accumulate_before_points(self):
+        data = ExperimentData()
+        self.assertEqual(data.num_scans, 0)
+        self.assertEqual(data.std_error().shape, (0, 0))
+        data.accumulate(3)
+        self.assertEqual(data.num_scans, 0)
+        self.assertEqual(data.std_error().shape, (0, 0))
+        data.append((0, [1.0]))
+        self.assertEqual(data.std_error().shape, (1, 2))
+
+class TestEngine(unittest.TestCase):
+    def test_run_experiment(self):
+        engine = Engine()
+        engine.run_experiment(SimpleExperiment, num_points='3')
+        self.assertEqual(SimpleExperiment.analyzed.shape, (3, 3))
+        np.testing.assert_allclose(SimpleExperiment.analyzed[:, 0], [0, 1, 2])
+
+    def test_run_experiment_saves_run(self):
+        run_dir = tempfile.mkdtemp()
+        try:
+            engine = Engine(run_dir=run_dir, queue_size=2, backpressure='spill')
+            engine.run_experiment(SimpleExperiment, num_points='50')
+            events = [EVENTS[record[2]]
+                    for record in decode(os.path.join(run_dir, 'events.log'))]
+            self.assertEqual((events[0], events[-1]), ('RUN_START', 'RUN_END'))
+            run = load_run(run_dir)
+            np.testing.assert_array_equal(run.data, SimpleExperiment.analyzed)
+            self.assertEqual(run.metadata['parameters'], {'num_points': '50'})
+            self.assertEqual(engine.writer.stats()['written'], 50)
+        finally:
+            shutil.rmtree(run_dir)
+
+    def test_drop_oldest_without_checkpoints(self):
+        run_dir = tempfile.mkdtemp()
+        try:
+            engine = Engine(run_dir=run_dir, backpressure='drop_oldest')
+            with self.assertRaises(ExperimentError):
+                engine.run_experiment(SimpleExperiment, num_points='3')
+            engine = Engine(run_dir=run_dir, backpressure='drop_oldest',
+                    checkpoint_interval=None)
+            engine.run_experiment(SimpleExperiment, num_points='3')
+            self.assertEqual(len(load_run(run_dir).data), 3)
+            self.assertFalse(os.path.exists(os.path.join(run_dir,
+                    'checkpoint.json')))
+        finally:
+            shutil.rmtree(run_dir)
+
+    def test_failure_before_run_closes_writer(self):
+        failures = (
+            (SimpleExperiment, {'num_points': '0'}, ParameterError),
+            (UnreachableExperiment, {}, InstrumentError),
+        )
+        for experiment, parameters, error in failures:
+            run_dir = tempfile.mkdtemp()
+            try:
+                engine = Engine(run_dir=run_dir)
+                with self.assertRaises(error):
+                    engine.run_experiment(experiment, **parameters)
+                self.assertFalse(engine.writer._thread.is_alive())
+                self.assertTrue(engine._run_writer._file.closed)
+                checkpoint = load_checkpoint(run_dir)
+                self.assertEqual((checkpoint['points'], checkpoint['rows']),
+                        (0, 0))
+                self.assertFalse(checkpoint['complete'])
+            finally:
+                shutil.rmtree(run_dir)
+
+class TestSimulatedRun(unittest.TestCase):
+    def test_run_simulated_experiment(self):
+        engine = Engine(simulate=True)
+        report = engine.run_experiment(SimulatedLockInExperiment,
+                num_points='5')
+        data = SimulatedLockInExperiment.analyzed
+        np.testing.assert_allclose(data[:, 0], np.linspace(2.86e9, 2.88e9, 5))
+        # The simulated lock-in measures a resonance at 2.87 GHz.
+        self.assertEqual(np.argmax(data[:, 1]), 2)
+        self.assertEqual(SimulatedLockInExperiment.num_triggers, 5)
+        self.assertIsNone(VisaInstrument.resource_manager_factory)
+        self.assertIs(report, engine.latency_report)
+        commands = {stat['command']: stat for stat in report['commands']}
+        self.assertEqual(commands['pb_start']['round_trips'], 5)
+        self.assertGreater(report['elapsed'], 0)
+
+    def test_trigger_group(self):
+        engine = Engine(simulate=True)
+        engine.run_experiment(TriggerGroupExperiment, num_points='4')
+        np.testing.assert_array_equal(TriggerGroupExperiment.analyzed[:, 1:],
+                [[4, 4]])
+        self.assertIsNone(TriggerGroupExperiment.group._interface)
+
+    def test_replay_recorded_run(self):
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, 'transcript.jsonl')
+            Engine(simulate=True, record_path=path).run_experiment(
+                    SimulatedLockInExperiment, num_points='5')
+            recorded = SimulatedLockInExperiment.analyzed
+            Engine(replay_path=path).run_experiment(
+                    SimulatedLockInExperiment, num_points='5')
+        finally:
+            shutil.rmtree(root)
+        np.testing.assert_array_equal(SimulatedLockInExperiment.analyzed,
+                recorded)
+        self.assertIsNone(VisaInstrument.resource_manager_factory)
+
+    @unittest.skipIf(plt is None, 'matplotlib is not installed')
+    def test_fast_replay(self):
+        from experiment.lock_in import LockInExperiment
+        parameters = {'lower_freq': '1000', 'upper_freq': '2000',
+                'num_samples': '20'}
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, 'transcript.jsonl')
+            Engine(simulate=True, record_path=path).run_experiment(
+                    LockInExperiment, **parameters)
+            start = time.monotonic()
+            engine = Engine(replay_path=path)
+            engine.run_experiment(LockInExperiment, **parameters)
+            elapsed = time.monotonic() - start
+        finally:
+            shutil.rmtree(root)
+        # The sweep clock paces points 0.2s apart when not replaying.
+        self.assertLess(elapsed, 20 * 0.2 / 4)
+        self.assertEqual(engine.clock.num_ticks, 20)
+        self.assertEqual(engine.clock.num_missed, 0)
+
+    def test_trace_simulated_run(self):
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, 'trace.json')
+            Engine(simulate=True, trace_path=path).run_experiment(
+                    SimulatedLockInExperiment, num_points='5')
+            with open(path) as f:
+                events = json.load(f)['traceEvents']
+        finally:
+            shutil.rmtree(root)
+        names = [event['name'] for event in events if event['ph'] == 'X']
+        for name in ('connect_instruments', 'setup', 'run', 'analyze',
+                'pb_start', 'FREQ', 'SNAP?'):
+            self.assertIn(name, names)
+        self.assertEqual(names.count('point'), 5)
+        self.assertFalse(TRACER.enabled)
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.run_dir = os.path.join(self.root, 'run')
+        self.experiment_path = os.path.join(self.root, 'experiment.py')
+        with open(self.experiment_path, 'w') as f:
+            f.write(FAILING_EXPERIMENT_SRC)
+        # The experiment fails once, while this file exists.
+        self.fail_path = os.path.join(self.root, 'fail')
+        open(self.fail_path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_resume(self):
+        engine = Engine(run_dir=self.run_dir, checkpoint_interval=0)
+        experiment = load_experiment(self.experiment_path)
+        with self.assertRaises(RuntimeError):
+            engine.run_experiment(experiment, num_points='10',
+                    fail_path=self.fail_path)
+        checkpoint = load_checkpoint(self.run_dir)
+        self.assertEqual((checkpoint['points'], checkpoint['rows']), (6, 6))
+        self.assertFalse(checkpoint['complete'])
+
+        engine = Engine(checkpoint_interval=0)
+        engine.resume(self.run_dir)
+        self.assertEqual(engine.points_done, 10)
+        self.assertTrue(load_checkpoint(self.run_dir)['complete'])
+        data = load_run(self.run_dir).data
+        np.testing.assert_array_equal(data[:, 0], np.arange(10))
+        # The experiment was reloaded, its setup was replayed, and the
+        # analysis saw every point.
+        resumed = sys.modules['experiment_src'].__experiment__
+        self.assertIsNot(resumed, experiment)
+        self.assertEqual(resumed.num_setups, 1)
+        np.testing.assert_array_equal(resumed.analyzed, data)
+        with self.assertRaises(ExperimentError):
+            engine.resume(self.run_dir)
+
+    def test_resume_nested_sweeps(self):
+        sources = (
+            # 3x3 nested sweeps, interrupted at (1, 1).
+            (NESTED_EXPERIMENT_SRC, (5, 4, [[0, 1], [0, 1]]),
+                    [0, 1, 2, 3, 4, 5, 6, 7, 8], 12),
+            # Sweeps run one after another, interrupted in the second one.
+            (SEQUENTIAL_EXPERIMENT_SRC, (4, 4, [[1, 1]]),
+                    [0, 1, 2, 10, 11, 12], 6),
+        )
+        for source, interrupted, rows, num_points in sources:
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+            open(self.fail_path, 'w').close()
+            with open(self.experiment_path, 'w') as f:
+                f.write(source)
+            engine = Engine(run_dir=self.run_dir, checkpoint_interval=0)
+            with self.assertRaises(RuntimeError):
+                engine.run_experiment(load_experiment(self.experiment_path),
+                        fail_path=self.fail_path)
+            checkpoint = load_checkpoint(self.run_dir)
+            self.assertEqual((checkpoint['points'], checkpoint['rows'],
+                    checkpoint['sweeps']), interrupted)
+
+            engine = Engine(checkpoint_interval=0)
+            engine.resume(self.run_dir)
+            self.assertEqual(engine.points_done, num_points)
+            self.assertTrue(load_checkpoint(self.run_dir)['complete'])
+            np.testing.assert_array_equal(
+                    load_run(self.run_dir).data[:, 0], rows)
+
+
+###############
+## Utilities ##
+###############
+
+from experiment import Experiment, IntParameter, ParameterError
+from instrument import Instrument, InstrumentError
+from instrument.daq.sr830 import SR830
+from instrument.lib.visainstrument import VisaInstrument
+from instrument.mwfreqsynth.hp8664a import HP8664A
+from instrument.pulseblaster import PulseBlaster
+from instrument.pulseblaster.pulseblasteresrpro import PulseBlasterESRPRO
+
+class SimpleExperiment(Experiment):
+    instruments = {}
+    parameters = {
+        'num_points': IntParameter('Number of Points', min=1),
+    }
+    analyzed = None
+
+    def setup(self):
+        pass
+
+    def run(self):
+        for i in range(self.num_points):
+            self.engine.data.append((i, [i * 2, i * 3]))
+
+    @staticmethod
+    def analyze(data):
+        SimpleExperiment.analyzed = data
+
+class UnreachableInstrument(Instrument):
+    def _connect(self):
+        raise InstrumentError('No listener at address.')
+
+class UnreachableExperiment(Experiment):
+    instruments = {'daq': UnreachableInstrument()}
+
+    def run(self):
+        raise AssertionError('Run without connected instruments.')
+
+class SimulatedLockInExperiment(Experiment):
+    instruments = {
+        'daq': SR830(address='GPIB0::8::INSTR'),
+        'mwfs': HP8664A(address='GPIB0::19::INSTR'),
+        'pb': PulseBlasterESRPRO(clock_freq=100.0, board_num=0),
+    }
+    parameters = {
+        'num_points': IntParameter('Number of Points', min=1),
+    }
+    analyzed = None
+    num_triggers = 0
+
+    def setup(self):
+        self.daq.set_trigger_mode(1)
+        self.pb.start_programming('PULSE_PROGRAM')
+        self.pb.continue_inst(1, 'ON', 1e3)
+        self.pb.stop_inst(0, 'OFF', 1e3)
+        self.pb.stop_programming()
+        SimulatedLockInExperiment.num_triggers = 0
+        PulseBlaster._lib.connect_output(1, self.count_trigger)
+
+    def run(self):
+        for freq in self.sweep(np.linspace(2.86e9, 2.88e9, self.num_points)):
+            self.mwfs.set_freq(freq)
+            self.pb.start()
+            values = self.daq.trigger_pipelined(1, 2).result()
+            self.engine.data.append((freq, values))
+            self.pb.stop()
+
+    @staticmethod
+    def count_trigger():
+        SimulatedLockInExperiment.num_triggers += 1
+
+    @staticmethod
+    def analyze(data):
+        SimulatedLockInExperiment.analyzed = data
+
+class TriggerGroupExperiment(Experiment):
+    instruments = {
+        'daq': SR830(address='GPIB0::8::INSTR'),
+        'daq2': SR830(address='GPIB0::9::INSTR'),
+    }
+    parameters = {
+        'num_points': IntParameter('Number of Points', min=1),
+    }
+    analyzed = None
+    group = None
+
+    def setup(self):
+        for daq in (self.daq, self.daq2):
+            daq.set_sample_rate(14)
+            daq.start_buffer()
+        TriggerGroupExperiment.group = self.engine.trigger_group(self.daq,
+                self.daq2)
+
+    def run(self):
+        for i in self.sweep(range(self.num_points)):
+            self.group.trigger()
+        self.engine.data.append((0, [self.daq.get_num_points(),
+                self.daq2.get_num_points()]))
+
+    @staticmethod
+    def analyze(data):
+        TriggerGroupExperiment.analyzed = data
+
+FAILING_EXPERIMENT_SRC = '''
+import os
+from experiment import Experiment, IntParameter, StringParameter
+
+class FailingExperiment(Experiment):
+    instruments = {}
+    parameters = {
+        'num_points': IntParameter('Number of Points', min=1),
+        'fail_path': StringParameter('Fail Path', '.*'),
+    }
+    num_setups = 0
+    analyzed = None
+
+    def setup(self):
+        FailingExperiment.num_setups += 1
+
+    def run(self):
+        for i in self.sweep(range(self.num_points)):
+            self.engine.data.append((i, [i * 2]))
+            if i == 6 and os.path.exists(self.fail_path):
+                os.remove(self.fail_path)
+                raise RuntimeError('GPIB timeout')
+
+    @staticmethod
+    def analyze(data):
+        FailingExperiment.analyzed = data
+
+__experiment__ = FailingExperiment
+'''
+
+NESTED_EXPERIMENT_SRC = '''
+import os
+from experiment import Experiment, StringParameter
+
+class NestedExperiment(Experiment):
+    instruments = {}
+    parameters = {
+        'fail_path': StringParameter('Fail Path', '.*'),
+    }
+
+    def setup(self):
+        pass
+
+    def run(self):
+        for i in self.sweep(range(3)):
+            for j in self.sweep(range(3)):
+                self.engine.data.append((i * 3 + j, [0]))
+                if (i, j) == (1, 1) and os.path.exists(self.fail_path):
+                    os.remove(self.fail_path)
+                    raise RuntimeError('GPIB timeout')
+
+    @staticmethod
+    def analyze(data):
+        pass
+
+__experiment__ = NestedExperiment
+'''
+
+SEQUENTIAL_EXPERIMENT_SRC = '''
+import os
+from experiment import Experiment, StringParameter
+
+class SequentialExperiment(Experiment):
+    instruments = {}
+    parameters = {
+        'fail_path': StringParameter('Fail Path', '.*'),
+    }
+
+    def setup(self):
+        pass
+
+    def run(self):
+        for i in self.sweep(range(3)):
+            self.engine.data.append((i, [0]))
+        for j in self.sweep(range(3)):
+            self.engine.data.append((10 + j, [0]))
+            if j == 1 and os.path.exists(self.fail_path):
+                os.remove(self.fail_path)
+                raise RuntimeError('GPIB timeout')
+
+    @staticmethod
+    def analyze(data):
+        pass
+
+__experiment__ = SequentialExperiment
+'''
@@ -0,0 +1,179 @@
+from engine import Engine
+from estimate import DryRun, LATENCIES, load_latencies
+from experiment import Experiment, IntParameter
+from instrument.daq.sr830 import SR830
+from instrument.lib.metrics import Metrics
+from instrument.mwfreqsynth.hp8664a import HP8664A
+from instrument.pulseblaster.pulseblasteresrpro import PulseBlasterESRPRO
+import unittest
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+class TestDryRun(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.dry_run = DryRun({'FREQ': 0.01}, metrics=self.metrics)
+
+    def test_estimate(self):
+        for _ in range(10):
+            self.metrics.record('HP8664A', 'FREQ', 0.0)
+            self.metrics.record('SR830', 'OUTP?', 0.0, bytes_received=10)
+            self.metrics.record('PulseBlaster', 'pb_inst_pbonly', 0.0)
+        self.dry_run.sleep(0.5)
+        estimate = self.dry_run.estimate()
+        commands = 10 * (0.01 + LATENCIES['VISA'] + LATENCIES['SPINAPI'] +
+                10 * LATENCIES['VISA_BYTE'])
+        self.assertAlmostEqual(estimate['commands'], commands)
+        self.assertAlmostEqual(estimate['total'], commands + 0.5)
+        self.assertAlmostEqual(self.dry_run.time(), commands + 0.5)
+        self.assertEqual((estimate['transactions'], estimate['calls'],
+                estimate['uploads'], estimate['sleeps']), (20, 10, 10, 1))
+        top = estimate['cost_centers'][0]
+        self.assertEqual((top['instrument'], top['command']),
+                ('SweepClock', 'sleep'))
+        self.assertAlmostEqual(sum(stat['share']
+                for stat in estimate['cost_centers']), 1.0)
+        self.assertIn('Estimated runtime: 0:00:01', self.dry_run.report())
+
+class TestLoadLatencies(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_json(self):
+        path = os.path.join(self.root, 'latencies.json')
+        with open(path, 'w') as f:
+            json.dump({'FREQ': 0.05, 'VISA': 0.001}, f, indent=2)
+        self.assertEqual(load_latencies(path), {'FREQ': 0.05, 'VISA': 0.001})
+
+    def test_transcript(self):
+        path = os.path.join(self.root, 'transcript.jsonl')
+        entries = [
+            {'op': 'write', 'data': 'FREQ 2 GHZ', 'dt': 0.01},
+            {'op': 'write', 'data': 'FREQ 3 GHZ', 'dt': 0.03},
+            {'op': 'read_stb', 'data': None, 'dt': 0.001},
+        ]
+        with open(path, 'w') as f:
+            f.write(json.dumps({'version': 1, 'time': 0.0}) + '\n')
+            for entry in entries:
+                entry.update(t=0.0, address='GPIB0::19::INSTR',
+                        response=None)
+                f.write(json.dumps(entry) + '\n')
+        latencies = load_latencies(path)
+        self.assertAlmostEqual(latencies['FREQ'], 0.02)
+        self.assertAlmostEqual(latencies['STB'], 0.001)
+        self.assertEqual(latencies['VISA_BYTE'], 0.0)
+
+class TestEngineDryRun(unittest.TestCase):
+    def test_dry_run(self):
+        run_dir = tempfile.mkdtemp()
+        shutil.rmtree(run_dir)
+        engine = Engine(run_dir=run_dir, dry_run=True,
+                latencies={'VISA': 0.1, 'VISA_BYTE': 0.0})
+        engine.run_experiment(PacedExperiment, num_points='100')
+        self.assertFalse(os.path.exists(run_dir))
+        self.assertFalse(PacedExperiment.analyzed)
+        estimate = engine.estimate.estimate()
+        # Each point takes the longer of the period and its commands.
+        self.assertEqual(estimate['sleeps'], 100)
+        self.assertAlmostEqual(estimate['total'], 100 * 1.0, delta=1.0)
+        self.assertEqual(estimate['uploads'], 4)
+
+    def test_pipelined_operations(self):
+        engine = Engine(dry_run=True)
+        engine.run_experiment(PipelinedExperiment, num_points='200')
+        counts = {command: histogram.count for (instrument, command),
+                histogram in engine.metrics.histograms.items()
+                if instrument.startswith('SR830')}
+        # A single serial poll per operation, once it requests service.
+        self.assertEqual(counts['TRIG;*OPC'], 200)
+        self.assertEqual(counts['STB'], 200)
+        self.assertEqual(counts['*ESR?'], 200)
+
+    def test_settle_sleeps(self):
+        sleep = time.sleep
+        start = time.monotonic()
+        engine = Engine(dry_run=True, latencies={'VISA': 0.0,
+                'VISA_BYTE': 0.0})
+        engine.run_experiment(SettleExperiment, num_points='20')
+        self.assertLess(time.monotonic() - start, 20 * 0.5 / 4)
+        estimate = engine.estimate.estimate()
+        self.assertEqual(estimate['sleeps'], 20)
+        self.assertAlmostEqual(estimate['total'], 20 * 0.5)
+        self.assertIs(time.sleep, sleep)
+
+###############
+## Utilities ##
+###############
+
+class PacedExperiment(Experiment):
+    instruments = {
+        'mwfs': HP8664A(address='GPIB0::19::INSTR'),
+        'pb': PulseBlasterESRPRO(clock_freq=100.0, board_num=0),
+    }
+    parameters = {
+        'num_points': IntParameter('Number of Points', min=1),
+    }
+    analyzed = False
+
+    def setup(self):
+        self.pb.start_programming('PULSE_PROGRAM')
+        self.pb.continue_inst(1, 'ON', 1e3)
+        self.pb.stop_inst(0, 'OFF', 1e3)
+        self.pb.stop_programming()
+        self.clock = self.engine.sweep_clock(1.0)
+
+    def run(self):
+        for i in self.sweep(range(self.num_points)):
+            self.mwfs.set_freq(2.8e9 + i * 1e6)
+            self.clock.tick()
+            self.engine.data.append((i, [0.0]))
+
+    @staticmethod
+    def analyze(data):
+        PacedExperiment.analyzed = True
+
+class PipelinedExperiment(Experiment):
+    instruments = {
+        'daq': SR830(address='GPIB0::8::INSTR'),
+        'mwfs': HP8664A(address='GPIB0::19::INSTR'),
+    }
+    parameters = {
+        'num_points': IntParameter('Number of Points', min=1),
+    }
+
+    def setup(self):
+        pass
+
+    def run(self):
+        for i in self.sweep(range(self.num_points)):
+            values = self.daq.trigger_pipelined(1, 2).result()
+            self.engine.data.append((i, values))
+
+    @staticmethod
+    def analyze(data):
+        pass
+
+class SettleExperiment(Experiment):
+    instruments = {
+        'mwfs': HP8664A(address='GPIB0::19::INSTR'),
+    }
+    parameters = {
+        'num_points': IntParameter('Number of Points', min=1),
+    }
+
+    def setup(self):
+        pass
+
+    def run(self):
+        for i in self.sweep(range(self.num_points)):
+            self.mwfs.set_freq(2.8e9 + i * 1e6)
+            # Lets the synthesizer settle.
+            time.sleep(0.5)
+            self.engine.data.append((i, [0.0]))
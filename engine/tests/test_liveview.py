@@ -0,0 +1,80 @@
+from liveview import LiveView, SharedRingBuffer
+import unittest
+
+import sys
+import time
+
+import numpy as np
+
+class TestSharedRingBuffer(unittest.TestCase):
+    def setUp(self):
+        self.writer = SharedRingBuffer(capacity=8, max_columns=3)
+        self.reader = SharedRingBuffer(capacity=8, max_columns=3,
+                name=self.writer.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def test_read_new_rows(self):
+        rows, count = self.reader.read()
+        self.assertEqual((len(rows), count), (0, 0))
+        for i in range(3):
+            self.writer.write([i, i * 2])
+        rows, count = self.reader.read()
+        np.testing.assert_array_equal(rows, [[0, 0], [1, 2], [2, 4]])
+        self.writer.write([3, 6])
+        rows, count = self.reader.read(count)
+        np.testing.assert_array_equal(rows, [[3, 6]])
+        self.assertEqual(count, 4)
+
+    def test_slow_reader_drops_rows(self):
+        for i in range(20):
+            self.writer.write([i, i, i, i])
+        rows, count = self.reader.read()
+        self.assertEqual(count, 20)
+        # Only the newest rows are kept, and extra columns are dropped.
+        np.testing.assert_array_equal(rows[:, 0], np.arange(13, 20))
+        self.assertEqual(rows.shape[1], 3)
+        self.assertFalse(self.reader.closed)
+        self.writer.close_writer()
+        self.assertTrue(self.reader.closed)
+
+class TestLiveView(unittest.TestCase):
+    def test_buffer_outlives_short_run(self):
+        # The viewer attaches after the run has already ended.
+        view = SlowLiveView(capacity=8, max_columns=2)
+        view.publish([1.0, 2.0])
+        view.close()
+        view.viewer.join(10)
+        self.assertEqual(view.viewer.exitcode, 0)
+
+    def test_dead_viewer(self):
+        view = DeadLiveView(capacity=8, max_columns=2, attach_timeout=10)
+        view.viewer.join(10)
+        start = time.monotonic()
+        view.close()
+        self.assertLess(time.monotonic() - start, 1)
+
+
+###############
+## Utilities ##
+###############
+
+def slow_viewer(name, capacity, max_columns, frame_interval, attached):
+    time.sleep(0.2)
+    buffer = SharedRingBuffer(capacity, max_columns, name=name)
+    attached.set()
+    rows, count = buffer.read()
+    closed = buffer.closed
+    buffer.close()
+    sys.exit(0 if closed and rows.tolist() == [[1.0, 2.0]] else 1)
+
+def dead_viewer(name, capacity, max_columns, frame_interval, attached):
+    pass
+
+class SlowLiveView(LiveView):
+    viewer_target = slow_viewer
+
+class DeadLiveView(LiveView):
+    viewer_target = dead_viewer
@@ -0,0 +1,52 @@
+from logger import EngineLogger, MESSAGE, NO_INSTRUMENT, decode, format_record
+import unittest
+
+import os
+import shutil
+import tempfile
+
+class TestEngineLogger(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'events.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_ring_buffer(self):
+        logger = EngineLogger(capacity=4)
+        for i in range(6):
+            logger.log(MESSAGE, 3, i, i * 0.5)
+        records = logger.records()
+        self.assertEqual([record[3] for record in records], [2, 3, 4, 5])
+        self.assertEqual(records[-1][1:], (3, MESSAGE, 5, 2.5))
+        self.assertLessEqual(records[0][0], records[-1][0])
+
+    def test_flush_and_decode(self):
+        logger = EngineLogger(self.path, capacity=4, flush_interval=60)
+        for i in range(3):
+            logger.log(MESSAGE, arg=i)
+        logger.flush()
+        # Overwrites records before they are flushed.
+        for i in range(3, 9):
+            logger.log(MESSAGE, arg=i)
+        logger.close()
+        self.assertEqual(logger.num_dropped, 2)
+        records = list(decode(self.path))
+        self.assertEqual([record[3] for record in records],
+                [0, 1, 2, 5, 6, 7, 8])
+        self.assertEqual(records[0][1], NO_INSTRUMENT)
+        self.assertIn('MESSAGE', format_record(records[0]))
+
+    def test_flush_thread(self):
+        logger = EngineLogger(self.path, flush_interval=0.001)
+        logger.log(MESSAGE, arg=1)
+        for _ in range(1000):
+            if os.path.getsize(self.path) > 20:
+                break
+            logger._closed.wait(0.001)
+        self.assertEqual([record[3] for record in decode(self.path)], [1])
+        logger.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+from engine import Engine
+from experiment import Experiment, IntParameter
+from profiling import Profiler
+import unittest
+
+import tracemalloc
+
+class TestProfiler(unittest.TestCase):
+    def test_phase(self):
+        profiler = Profiler()
+        with profiler.phase('setup'):
+            data = [list(range(100)) for _ in range(100)]
+        phase = profiler.phases['setup']
+        self.assertGreater(phase.peak, 0)
+        self.assertTrue(phase.allocations)
+        self.assertFalse(tracemalloc.is_tracing())
+        report = profiler.report()
+        self.assertIn('== setup', report)
+        self.assertIn('Top allocations:', report)
+
+    def test_sample_points(self):
+        profiler = Profiler(sample_every=4)
+        Engine(profiler=profiler).run_experiment(SweepExperiment,
+                num_points='10')
+        self.assertEqual(list(profiler.phases),
+                ['connect', 'setup', 'run', 'analyze'])
+        run = profiler.phases['run']
+        self.assertEqual((run.num_sampled, run.num_points), (3, 10))
+        self.assertIn('3/10 points profiled', profiler.report())
+
+    def test_no_functions_profiled(self):
+        profiler = Profiler(sample_every=2)
+        with profiler.phase('run'):
+            pass
+        self.assertIn('No functions profiled.', profiler.report())
+
+###############
+## Utilities ##
+###############
+
+class SweepExperiment(Experiment):
+    instruments = {}
+    parameters = {
+        'num_points': IntParameter('Number of Points', min=1),
+    }
+
+    def setup(self):
+        pass
+
+    def run(self):
+        for i in self.sweep(range(self.num_points)):
+            self.engine.data.append((i, [i * 2]))
+
+    @staticmethod
+    def analyze(data):
+        pass
@@ -0,0 +1,52 @@
+from tracing import Tracer
+import unittest
+
+import threading
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.tracer = Tracer(clock=lambda: self.now)
+
+    def test_disabled(self):
+        self.tracer.add('read', 'visa', 0.0, 1.0)
+        with self.tracer.span('setup', 'experiment'):
+            pass
+        self.assertEqual(self.tracer.spans, [])
+
+    def test_span(self):
+        self.now = 1.0
+        self.tracer.start()
+        self.now = 1.5
+        with self.tracer.span('setup', 'experiment', instrument='SR830'):
+            self.now = 2.0
+        self.tracer.add('OUTP?', 'visa', 2.0, 2.25)
+        self.tracer.stop()
+        self.tracer.add('OUTP?', 'visa', 3.0, 3.25)
+
+        events = self.tracer.to_chrome()['traceEvents']
+        self.assertEqual(events[0]['ph'], 'M')
+        self.assertEqual(events[0]['args']['name'],
+                threading.current_thread().name)
+        setup, read = events[1:]
+        self.assertEqual((setup['name'], setup['cat'], setup['ph']),
+                ('setup', 'experiment', 'X'))
+        self.assertAlmostEqual(setup['ts'], 0.5e6)
+        self.assertAlmostEqual(setup['dur'], 0.5e6)
+        self.assertEqual(setup['args'], {'instrument': 'SR830'})
+        self.assertAlmostEqual(read['dur'], 0.25e6)
+        self.assertNotIn('args', read)
+        self.assertEqual(setup['tid'], read['tid'])
+
+    def test_threads(self):
+        self.tracer.start()
+        thread = threading.Thread(target=self.tracer.add,
+                args=('write', 'visa', 0.0, 1.0), name='Writer')
+        thread.start()
+        thread.join()
+        self.tracer.add('read', 'visa', 0.0, 1.0)
+        names = {event['tid']: event['args']['name']
+                for event in self.tracer.to_chrome()['traceEvents']
+                if event['ph'] == 'M'}
+        self.assertEqual(len(names), 2)
+        self.assertIn('Writer', names.values())
@@ -0,0 +1,138 @@
+from writer import BoundedQueue, DataWriter
+import unittest
+
+import threading
+
+class TestBoundedQueue(unittest.TestCase):
+    def test_drop_oldest(self):
+        queue = BoundedQueue(3, 'drop_oldest')
+        for i in range(5):
+            queue.put(i)
+        self.assertEqual(queue.get_batch(10), [2, 3, 4])
+        self.assertEqual(queue.num_dropped, 2)
+        self.assertEqual(queue.max_depth, 3)
+
+    def test_drop_oldest_keeps_items(self):
+        queue = BoundedQueue(3, 'drop_oldest', keep=lambda item: item < 0)
+        for i in (-1, 1, -2, 2, 3, 4):
+            queue.put(i)
+        self.assertEqual(queue.get_batch(10), [-1, -2, 4])
+        self.assertEqual(queue.num_dropped, 3)
+
+    def test_spill_only_pickles_spilled_items(self):
+        queue = BoundedQueue(1, 'spill')
+        # Functions defined in functions can't be pickled.
+        unpicklable = lambda: None
+        queue.put(unpicklable)
+        self.assertIs(queue.get_batch(1)[0], unpicklable)
+        queue.close()
+
+    def test_spill_preserves_order(self):
+        queue = BoundedQueue(2, 'spill')
+        for i in range(5):
+            queue.put(i)
+        self.assertEqual(queue.depth, 5)
+        self.assertEqual(queue.num_spilled, 3)
+        self.assertEqual(queue.get_batch(10), [0, 1])
+        # Items keep spilling until the spill file is drained.
+        queue.put(5)
+        self.assertEqual(queue.get_batch(2), [2, 3])
+        self.assertEqual(queue.get_batch(10), [4, 5])
+        queue.put(6)
+        self.assertEqual(queue.num_spilled, 4)
+        queue.put(7)
+        queue.close()
+        self.assertEqual(queue.get_batch(10), [6, 7])
+        # The spill file is deleted once the closed queue is drained.
+        self.assertTrue(queue._spill._writer.closed)
+        self.assertEqual(queue.get_batch(10), [])
+
+    def test_spill_without_blocking_on_reads(self):
+        queue = BoundedQueue(1, 'spill')
+        for i in range(3):
+            queue.put(i)
+        self.assertEqual(queue.get_batch(1), [0])
+        # Points can be spilled while spilled points are being read.
+        records = queue._spill.claim(1)
+        producer = threading.Thread(target=queue.put, args=(3,))
+        producer.start()
+        producer.join(1)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(queue._spill.read(records), [1])
+        queue._spill.release()
+        self.assertEqual(queue.get_batch(10), [2, 3])
+        queue.close()
+
+    def test_block(self):
+        queue = BoundedQueue(2, 'block')
+        queue.put(0)
+        queue.put(1)
+        producer = threading.Thread(target=queue.put, args=(2,))
+        producer.start()
+        producer.join(0.05)
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(queue.get_batch(1), [0])
+        producer.join(1)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(queue.get_batch(10), [1, 2])
+
+    def test_closed_queue(self):
+        queue = BoundedQueue(2)
+        queue.close()
+        self.assertEqual(queue.get_batch(10), [])
+        with self.assertRaises(ValueError):
+            BoundedQueue(2, 'drop_newest')
+
+class TestDataWriter(unittest.TestCase):
+    def test_write_all_points(self):
+        written = []
+        flushes = []
+        writer = DataWriter(written.extend, lambda: flushes.append(True),
+                max_size=4, batch_size=3)
+        writer.start()
+        for i in range(100):
+            writer.put([i])
+        writer.close()
+        self.assertEqual(written, [[i] for i in range(100)])
+        self.assertTrue(flushes)
+        stats = writer.stats()
+        self.assertEqual((stats['written'], stats['depth']), (100, 0))
+        self.assertLessEqual(stats['max_depth'], 4)
+
+    def test_call_when_written(self):
+        written = []
+        calls = []
+        writer = DataWriter(written.extend, max_size=2, policy='spill')
+        for i in range(10):
+            writer.put(i)
+            if i % 3 == 2:
+                writer.call_when_written(lambda: calls.append(len(written)))
+        writer.start()
+        writer.close()
+        self.assertEqual(written, list(range(10)))
+        self.assertEqual(calls, [3, 6, 9])
+        self.assertEqual(writer.stats()['written'], 10)
+
+    def test_drop_oldest_keeps_callbacks(self):
+        written = []
+        calls = []
+        writer = DataWriter(written.extend, max_size=2, policy='drop_oldest')
+        for i in range(10):
+            writer.put(i)
+            if i % 3 == 2:
+                writer.call_when_written(lambda: calls.append(len(written)))
+        writer.start()
+        writer.close()
+        # Callbacks are kept even once they fill the queue.
+        self.assertEqual(written, [9])
+        self.assertEqual(calls, [0, 0, 0])
+
+    def test_consumer_error(self):
+        def consume(points):
+            raise IOError('disk full')
+        writer = DataWriter(consume, max_size=1)
+        writer.start()
+        with self.assertRaises(IOError):
+            for i in range(100):
+                writer.put([i])
+            writer.close()
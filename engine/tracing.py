@@ -0,0 +1,133 @@
+"""
+Tracing Module
+
+Timeline tracing of engine and instrument activity, exported in the Chrome
+trace event format, which can be opened in chrome://tracing or Perfetto.
+
+Spans are recorded around the phases of a run (connecting instruments, and
+the experiment's setup, run and analysis), every sweep point, every VISA
+transaction and SpinCore call, time spent waiting for a shared bus, and time
+slept by a `SweepClock`. Each span is tagged with the thread it ran on, and
+with its instrument if any, so that timelines show which operations actually
+overlap, idle gaps between commands, bus contention and sleep time per
+point.
+
+Spans are recorded to `TRACER`, which only records while tracing is started
+(e.g. by `Engine(trace_path=...)`), so that tracing costs a single attribute
+check otherwise.
+
+Importable:
+  - Tracer
+  - TRACER
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+__all__ = ['Tracer', 'TRACER']
+
+class Tracer(object):
+    """Records spans, and exports them as a Chrome trace.
+
+    Parameters:
+      - clock (callable): Clock spans are timed with, in seconds.
+
+    Instance Attributes:
+      - enabled (bool): Whether spans are being recorded.
+      - spans (list[tuple]): Recorded `(name, category, start, end, thread
+        ID, args)` spans, with times in seconds.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.enabled = False
+        self.spans = []
+        self._clock = clock
+        self._threads = {}
+        self._origin = clock()
+
+    def start(self):
+        """Clears any recorded spans, and starts recording."""
+        self.spans = []
+        self._threads = {}
+        self._origin = self._clock()
+        self.enabled = True
+
+    def stop(self):
+        """Stops recording."""
+        self.enabled = False
+
+    def add(self, name, category, start, end=None, args=None):
+        """Records a span, if recording.
+
+        Parameters:
+          - name (str): Name of the span.
+          - category (str): Category of the span, e.g. 'visa'.
+          - start (float): Start time, from the tracer's clock.
+          - end (float): End time, from the tracer's clock. Defaults to now.
+          - args (dict): Tags of the span, e.g. its instrument.
+        """
+        if not self.enabled:
+            return
+        if end is None:
+            end = self._clock()
+        thread = threading.get_ident()
+        if thread not in self._threads:
+            self._threads[thread] = threading.current_thread().name
+        self.spans.append((name, category, start, end, thread, args))
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """Records a span around a block, if recording.
+
+            with TRACER.span('setup', 'experiment'):
+                experiment.setup()
+        """
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, args=args or None)
+
+    def to_chrome(self):
+        """Returns the recorded spans as a Chrome trace.
+
+        Returns:
+          - dict: A trace, in the Chrome trace event JSON format, with one
+            complete ('X') event per span, and the name of each thread.
+        """
+        pid = 1
+        events = [{
+            'name': 'thread_name',
+            'ph': 'M',
+            'pid': pid,
+            'tid': thread,
+            'args': {'name': name},
+        } for thread, name in list(self._threads.items())]
+        for name, category, start, end, thread, args in list(self.spans):
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (start - self._origin) * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': pid,
+                'tid': thread,
+            }
+            if args:
+                event['args'] = args
+            events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, path):
+        """Saves the recorded spans as a Chrome trace JSON file.
+
+        Parameters:
+          - path (str): Path to the trace file.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome(), f)
+
+# Tracer all spans are recorded to.
+TRACER = Tracer()
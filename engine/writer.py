@@ -0,0 +1,417 @@
+"""
+Writer Module
+
+Decouples acquiring data from persisting it. Data points are put on a bounded
+queue by the acquisition thread, and consumed (e.g. written to disk) by a
+separate writer thread, so that slow writes never stall the instrument loop.
+
+When the queue is full, a backpressure policy decides what happens:
+  - 'block': The acquisition thread waits for the writer to catch up.
+  - 'drop_oldest': The oldest queued point is dropped. Callbacks queued with
+    `DataWriter.call_when_written` are never dropped.
+  - 'spill': Points overflow to a temporary file on disk, and are consumed
+    from there, in order, once the writer catches up. Spilled points are
+    written and read without holding the queue's lock, so that the
+    acquisition thread never waits on the writer thread reading them back.
+
+Importable:
+  - BoundedQueue
+  - DataWriter
+"""
+
+import collections
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+__all__ = ['BoundedQueue', 'DataWriter']
+
+POLICIES = ('block', 'drop_oldest', 'spill')
+
+class BoundedQueue(object):
+    """A bounded, thread-safe FIFO queue with a configurable backpressure
+    policy.
+
+    Parameters:
+      - max_size (int): Maximum number of items held in memory.
+      - policy (str): Backpressure policy ('block', 'drop_oldest' or 'spill').
+      - spill_dir (str): Directory for the spill file. Defaults to the system
+        temporary directory.
+      - keep (callable): Returns whether an item must never be dropped by the
+        'drop_oldest' policy. By default, any item can be dropped. Kept items
+        count towards `max_size`, but are queued even if the queue is full of
+        them.
+
+    Instance Attributes:
+      - max_size (int)
+      - policy (str)
+      - max_depth (int): Largest depth the queue has reached.
+      - num_dropped (int): Number of items dropped.
+      - num_spilled (int): Number of items spilled to disk.
+    """
+
+    def __init__(self, max_size, policy='block', spill_dir=None, keep=None):
+        if policy not in POLICIES:
+            raise ValueError("Invalid backpressure policy: '{0}'".format(policy))
+        self.max_size = max_size
+        self.policy = policy
+        self.max_depth = 0
+        self.num_dropped = 0
+        self.num_spilled = 0
+        self._items = collections.deque()
+        self._spill = _SpillFile(spill_dir) if policy == 'spill' else None
+        self._keep = keep
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+    @property
+    def depth(self):
+        """Number of items in the queue, including spilled items."""
+        with self._lock:
+            return self._depth()
+
+    def put(self, item):
+        """Puts an item on the queue, applying the backpressure policy if the
+        queue is full.
+        """
+        if self.policy == 'spill':
+            self._put_or_spill(item)
+            return
+        with self._lock:
+            if self.policy == 'block':
+                while len(self._items) >= self.max_size:
+                    self._not_full.wait()
+            elif len(self._items) >= self.max_size:
+                self._drop_oldest()
+            self._items.append(item)
+            self.max_depth = max(self.max_depth, self._depth())
+            self._not_empty.notify()
+
+    def get_batch(self, max_items, timeout=None):
+        """Removes up to `max_items` items from the queue, waiting up to
+        `timeout` seconds for at least one item.
+
+        Returns:
+          - list: Removed items, oldest first. Empty if the wait timed out, or
+            the queue is closed and empty.
+        """
+        with self._lock:
+            if not self._num_available() and not self._closed:
+                self._not_empty.wait(timeout)
+            if self._items:
+                num_items = min(max_items, len(self._items))
+                batch = [self._items.popleft() for _ in range(num_items)]
+                self._not_full.notify_all()
+                return batch
+            if self._spill is None or not self._spill.readable:
+                self._close_spill()
+                return []
+            records = self._spill.claim(max_items)
+        try:
+            return self._spill.read(records)
+        finally:
+            with self._lock:
+                self._spill.release()
+                self._close_spill()
+
+    def close(self):
+        """Closes the queue, waking up any consumer waiting on it. The spill
+        file, if any, is deleted once it is drained.
+        """
+        with self._lock:
+            self._closed = True
+            self._close_spill()
+            self._not_empty.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _depth(self):
+        spilled = self._spill.pending if self._spill is not None else 0
+        return len(self._items) + spilled
+
+    def _num_available(self):
+        """Number of items that can be removed right away."""
+        spilled = self._spill.readable if self._spill is not None else 0
+        return len(self._items) + spilled
+
+    def _drop_oldest(self):
+        """Drops the oldest item that isn't kept, if any. Called with the lock
+        held.
+        """
+        for index, item in enumerate(self._items):
+            if self._keep is None or not self._keep(item):
+                del self._items[index]
+                self.num_dropped += 1
+                return
+
+    def _put_or_spill(self, item):
+        with self._lock:
+            # Once spilling, keep spilling until the spill file is drained
+            # so that items stay in order.
+            if len(self._items) < self.max_size and not self._spill.pending:
+                self._items.append(item)
+                self.max_depth = max(self.max_depth, self._depth())
+                self._not_empty.notify()
+                return
+        # Only spilled items are pickled, without holding the lock.
+        data = pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            record = self._spill.reserve(len(data))
+            self.num_spilled += 1
+        try:
+            self._spill.write(record, data)
+        finally:
+            with self._lock:
+                self._spill.commit(record)
+                self._not_empty.notify()
+
+    def _close_spill(self):
+        """Deletes the spill file, once the queue is closed and the file is
+        drained. Called with the lock held.
+        """
+        if self._closed and self._spill is not None and self._spill.idle:
+            self._spill.close()
+
+class DataWriter(object):
+    """Consumes data points on a writer thread.
+
+    Points put on the writer are queued, and passed in batches to a consumer
+    function on the writer thread. If the consumer raises, the error is
+    re-raised on the acquisition thread by the next `put` or by `close`.
+
+    Parameters:
+      - consume (callable): Called with a list of points on the writer thread.
+      - flush (callable): Called periodically on the writer thread, e.g. to
+        flush written data to disk.
+      - max_size (int): Maximum number of queued points held in memory.
+      - policy (str): Backpressure policy ('block', 'drop_oldest' or 'spill').
+      - spill_dir (str): Directory for the spill file.
+      - batch_size (int): Maximum number of points consumed at once.
+      - flush_interval (float): Time between flushes, in seconds.
+
+    Instance Attributes:
+      - queue (BoundedQueue): Queue of points waiting to be consumed.
+      - num_written (int): Number of points consumed.
+      - lag (float): Time the last consumed point spent in the queue, in
+        seconds.
+      - max_lag (float): Largest lag so far, in seconds.
+    """
+
+    def __init__(self, consume, flush=None, max_size=4096, policy='block',
+            spill_dir=None, batch_size=256, flush_interval=1.0):
+        self.queue = BoundedQueue(max_size, policy, spill_dir, keep=_is_marker)
+        self.num_written = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._consume = consume
+        self._flush = flush
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._error = None
+        self._callbacks = {}
+        self._num_markers = 0
+        self._thread = threading.Thread(target=self._run, name='DataWriter')
+        self._thread.daemon = True
+
+    def start(self):
+        """Starts the writer thread."""
+        self._thread.start()
+
+    def put(self, point):
+        """Queues a point to be consumed. Called from the acquisition thread.
+        """
+        if self._error is not None:
+            raise self._error
+        self.queue.put((time.monotonic(), point))
+
+    def close(self):
+        """Waits for all queued points to be consumed, and stops the writer
+        thread.
+        """
+        self.queue.close()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def stats(self):
+        """Returns writer statistics. Safe to call while acquiring.
+
+        Returns:
+          - dict: Current and maximum queue depth, current and maximum lag in
+            seconds, and the number of written, dropped and spilled points.
+        """
+        return {
+            'depth': self.queue.depth,
+            'max_depth': self.queue.max_depth,
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+            'written': self.num_written,
+            'dropped': self.queue.num_dropped,
+            'spilled': self.queue.num_spilled,
+        }
+
+    def call_when_written(self, fn):
+        """Calls a function on the writer thread once every point queued so
+        far has been consumed. Called from the acquisition thread.
+
+        The function is skipped if the consumer fails. It is never dropped by
+        the 'drop_oldest' policy, but the points queued before it may be.
+
+        Parameters:
+          - fn (callable): Function called with no arguments.
+        """
+        marker = _Marker(self._num_markers)
+        self._num_markers += 1
+        self._callbacks[marker.id] = fn
+        self.put(marker)
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            batch = self.queue.get_batch(self._batch_size, self._flush_interval)
+            if not batch and self.queue.closed:
+                break
+            now = time.monotonic()
+            points = []
+            for queued_time, item in batch:
+                if isinstance(item, _Marker):
+                    self._call(self._consume_points, points, now)
+                    self._call(self._callbacks.pop(item.id))
+                    points = []
+                else:
+                    points.append((queued_time, item))
+            self._call(self._consume_points, points, now)
+            if self._flush is not None and now - last_flush >= self._flush_interval:
+                self._call(self._flush)
+                last_flush = now
+        if self._flush is not None:
+            self._call(self._flush)
+
+    def _consume_points(self, points, now):
+        if not points:
+            return
+        self._consume([point for _, point in points])
+        self.num_written += len(points)
+        self.lag = now - points[-1][0]
+        self.max_lag = max(self.max_lag, now - points[0][0])
+
+    def _call(self, fn, *args):
+        # Once the consumer fails, keep draining the queue without consuming
+        # anything, so that a blocked acquisition thread wakes up and sees the
+        # error.
+        if self._error is not None:
+            return
+        try:
+            fn(*args)
+        except Exception as e:
+            self._error = e
+
+
+#############
+## Private ##
+#############
+
+class _Marker(object):
+    """Queued in place of a `call_when_written` callback, which may not be
+    picklable if it has to be spilled to disk.
+    """
+
+    def __init__(self, id):
+        self.id = id
+
+def _is_marker(queued):
+    """Returns whether a queued `(time, point)` pair holds a `_Marker`."""
+    return isinstance(queued[1], _Marker)
+
+class _SpillFile(object):
+    """A FIFO of pickled items in a temporary file.
+
+    Space for each item is reserved in order, and items are then written and
+    read through separate handles, so that writes and reads don't wait on
+    each other. The methods that update the FIFO's bookkeeping (`reserve`,
+    `commit`, `claim` and `release`) are called with the queue's lock held,
+    while `write` and `read` are called without it.
+
+    Instance Attributes:
+      - pending (int): Number of items reserved and not yet claimed.
+      - readable (int): Number of items written and not yet claimed, in
+        order.
+      - idle (bool): Whether there are no items pending or being read.
+    """
+
+    def __init__(self, spill_dir):
+        fd, self._path = tempfile.mkstemp(prefix='spill', dir=spill_dir)
+        self._writer = os.fdopen(fd, 'wb')
+        self._reader = open(self._path, 'rb')
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        # Reserved items, in order, as [offset, size, written] records.
+        self._records = collections.deque()
+        self._end = 0
+        self._num_reading = 0
+        self.readable = 0
+
+    @property
+    def pending(self):
+        return len(self._records)
+
+    @property
+    def idle(self):
+        return not self._records and not self._num_reading
+
+    def reserve(self, size):
+        if self.idle:
+            # Reuse the file from the start once it is drained.
+            self._end = 0
+        record = [self._end, size, False]
+        self._end += size
+        self._records.append(record)
+        return record
+
+    def write(self, record, data):
+        offset, size, _ = record
+        with self._write_lock:
+            self._writer.seek(offset)
+            self._writer.write(data)
+            self._writer.flush()
+
+    def commit(self, record):
+        record[2] = True
+        # Items written out of order only become readable once the items
+        # before them are written.
+        while (self.readable < len(self._records) and
+                self._records[self.readable][2]):
+            self.readable += 1
+
+    def claim(self, max_items):
+        num_items = min(max_items, self.readable)
+        records = [self._records.popleft() for _ in range(num_items)]
+        self.readable -= num_items
+        self._num_reading += 1
+        return records
+
+    def read(self, records):
+        # Claimed items are contiguous in the file.
+        start = records[0][0]
+        end = records[-1][0] + records[-1][1]
+        with self._read_lock:
+            self._reader.seek(start)
+            data = self._reader.read(end - start)
+        return [pickle.loads(data[offset - start:offset - start + size])
+                for offset, size, _ in records]
+
+    def release(self):
+        self._num_reading -= 1
+
+    def close(self):
+        if self._writer.closed:
+            return
+        self._writer.close()
+        self._reader.close()
+        os.remove(self._path)
@@ -0,0 +1,30 @@
+import argparse
+import json
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        'engine'))
+
+from benchmark import BENCHMARKS, compare, run_benchmarks
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the engine benchmarks.')
+    parser.add_argument('-b', '--benchmark', action='append', choices=list(BENCHMARKS), help='Benchmark to run. Runs all of them if not given.')
+    parser.add_argument('-o', '--output', metavar='FILE', type=str, help='File to write the JSON results to.')
+    parser.add_argument('--scale', type=float, default=1.0, help='Scale factor of the number of iterations of each benchmark.')
+    parser.add_argument('--compare', metavar='BASELINE', type=str, help='JSON results of a previous version to compare to.')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.benchmark, args.scale)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for name, metric, base, value, speedup in compare(baseline, results):
+            print('{0}.{1}: {2:.4g} -> {3:.4g} ({4:.2f}x)'.format(
+                    name, metric, base, value, speedup))